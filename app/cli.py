@@ -0,0 +1,121 @@
+"""
+Tarefas de manutenção do cache de respostas, fora do servidor:
+
+    uv run python -m app.cli warm --top 500
+    uv run python -m app.cli warm --top 500 --dry-run
+    uv run python -m app.cli invalidate --model gpt-4o-mini
+    uv run python -m app.cli invalidate --user user-123
+"""
+
+import argparse
+import asyncio
+import json
+
+import motor.motor_asyncio
+import redis.asyncio as redis
+
+from app.core.config import PersistenceBackend, settings
+from app.core.logging import configure_logging
+from app.services.cache_service import CacheService
+from app.services.cache_warmer import CacheWarmer
+
+
+async def warm(args: argparse.Namespace) -> None:
+    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    mongo = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        warmer = CacheWarmer(
+            mongo.chat_db.chat_interactions,
+            CacheService(redis_client),
+            window_days=args.window_days,
+            half_life_hours=args.half_life,
+            batch_size=args.batch_size,
+            rate=args.rate,
+        )
+        report = await warmer.warm(
+            args.top, model=args.model, ttl=args.ttl, dry_run=args.dry_run
+        )
+        print(json.dumps(report.as_dict(), indent=2))
+    finally:
+        await redis_client.aclose()
+        mongo.close()
+
+
+async def clear_semantic_cache(model: str, redis_client) -> None:
+    """Apaga o índice semântico persistido; os workers no ar descartam o deles."""
+    # Importado só aqui: o módulo traz o numpy (opcional)
+    from app.services.semantic_cache import clear_persisted
+
+    persistence = settings.SEMANTIC_CACHE_PERSISTENCE
+    await clear_persisted(
+        model,
+        redis_client=redis_client if persistence == PersistenceBackend.REDIS else None,
+        persist_path=(
+            settings.SEMANTIC_CACHE_PATH if persistence == PersistenceBackend.DISK else None
+        ),
+    )
+
+
+async def invalidate(args: argparse.Namespace) -> None:
+    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        cache = CacheService(redis_client)
+        if args.model:
+            await cache.invalidate_model(args.model)
+            await clear_semantic_cache(args.model, redis_client)
+        if args.user:
+            await cache.invalidate_user(args.user)
+    finally:
+        await redis_client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    warm_parser = commands.add_parser(
+        "warm", help="pré-carrega no cache os prompts mais pedidos do histórico"
+    )
+    warm_parser.add_argument("--top", type=int, default=settings.CACHE_WARMUP_TOP)
+    warm_parser.add_argument("--model", default=settings.OPENAI_MODEL)
+    warm_parser.add_argument("--ttl", type=int, default=settings.CACHE_TTL)
+    warm_parser.add_argument(
+        "--window-days", type=float, default=settings.CACHE_WARMUP_WINDOW_DAYS
+    )
+    warm_parser.add_argument(
+        "--half-life",
+        type=float,
+        default=settings.CACHE_WARMUP_HALF_LIFE_HOURS,
+        help="meia-vida (horas) do peso de um pedido no ranking",
+    )
+    warm_parser.add_argument(
+        "--batch-size", type=int, default=settings.CACHE_WARMUP_BATCH_SIZE
+    )
+    warm_parser.add_argument(
+        "--rate",
+        type=float,
+        default=settings.CACHE_WARMUP_RATE,
+        help="respostas gravadas por segundo (0 = sem limite)",
+    )
+    warm_parser.add_argument(
+        "--dry-run", action="store_true", help="só calcula o relatório"
+    )
+    warm_parser.set_defaults(handler=warm)
+
+    invalidate_parser = commands.add_parser(
+        "invalidate", help="remove do cache as respostas de um modelo ou usuário"
+    )
+    invalidate_parser.add_argument("--model")
+    invalidate_parser.add_argument("--user")
+    invalidate_parser.set_defaults(handler=invalidate)
+
+    args = parser.parse_args()
+    if args.command == "invalidate" and not (args.model or args.user):
+        parser.error("informe --model e/ou --user")
+
+    configure_logging()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""Registro de clientes compartilhados pelo processo (OpenAI, Redis e MongoDB)."""
+
+import asyncio
+import importlib
+import importlib.util
+import os
+from typing import Dict, List
+
+import httpx
+import motor.motor_asyncio
+import redis.asyncio as redis
+from fastapi import HTTPException, Request
+from loguru import logger
+from pymongo import monitoring
+
+from app.core.config import AppConfig, EmbedderBackend, PersistenceBackend, settings
+from app.core.metrics import (
+    CLIENT_POOL_IDLE,
+    CLIENT_POOL_IN_USE,
+    CLIENT_POOL_MAX,
+    CLIENT_POOL_SATURATION,
+)
+from app.services.cache_service import CacheService
+from app.services.cache_warmer import CacheWarmer
+from app.services.circuit_breaker import EVENTS_CHANNEL, CircuitBreaker
+from app.services.llm_dispatcher import LLMDispatcher
+from app.services.llm_providers import (
+    AnthropicProvider,
+    LLMProvider,
+    MockProvider,
+    OpenAIProvider,
+)
+from app.services.db_service import MongoDBService
+from app.services.health_monitor import HealthMonitor
+from app.services.llm_router import LLMRouter
+from app.services.quota_service import QuotaService
+from app.services.local_cache import LocalCache
+from app.services.pubsub import PubSubListener
+from app.services.redis_batcher import RedisBatcher
+from app.services.single_flight import SingleFlight
+
+# Trava do aquecimento do cache no startup: com vários workers, só um carrega
+WARMUP_LOCK_KEY = "llm_cache_warmup:lock"
+WARMUP_LOCK_TTL = 300
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Contabiliza conexões do pool do MongoDB para as métricas de saturação."""
+
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+
+    def connection_created(self, event):
+        self.open_connections += 1
+
+    def connection_closed(self, event):
+        self.open_connections = max(self.open_connections - 1, 0)
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out = max(self.checked_out - 1, 0)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
+class ClientRegistry:
+    """
+    Clientes de rede compartilhados por todas as requisições do processo.
+
+    Criado uma única vez no ``lifespan`` e exposto via ``app.state.clients``.
+    Cada cliente mantém seu próprio pool de conexões (keep-alive HTTP para a
+    OpenAI, ``ConnectionPool`` do Redis e pool do Motor), dimensionados pelo
+    ``AppConfig``. Também guarda o estado compartilhado entre requisições que
+    depende desses clientes: o cache L1 em memória, o single-flight das
+    chamadas ao LLM, os circuit breakers e o listener pub/sub que sincroniza
+    os workers.
+
+    ``start`` só cria os objetos, sem I/O, para o worker começar a atender
+    (liveness) logo. As conexões, os índices do MongoDB e o cliente da
+    OpenAI (o import mais pesado) ficam para ``warm_up``, em segundo plano
+    e em paralelo; ``readiness`` diz o que já está pronto.
+    """
+
+    def __init__(self, config: AppConfig = settings):
+        self.config = config
+        self.http_client = None
+        self.openai = None
+        self.redis_pool = None
+        self.redis = None
+        self.mongo = None
+        self.mongo_listener = MongoPoolListener()
+        self.local_cache = LocalCache(
+            max_items=config.CACHE_L1_MAX_ITEMS, max_bytes=config.CACHE_L1_MAX_BYTES
+        )
+        self.single_flight = SingleFlight("llm")
+        self.llm_dispatcher = LLMDispatcher(
+            initial_limit=config.LLM_DISPATCH_INITIAL_CONCURRENCY,
+            min_limit=config.LLM_DISPATCH_MIN_CONCURRENCY,
+            max_limit=config.LLM_DISPATCH_MAX_CONCURRENCY,
+            latency_target=config.LLM_DISPATCH_LATENCY_TARGET,
+            max_queue=config.LLM_DISPATCH_MAX_QUEUE,
+            max_wait=config.LLM_DISPATCH_MAX_WAIT,
+        )
+        self.circuit_breakers = {}
+        self.llm_router = None
+        self.write_queue = None
+        self.pubsub = None
+        self.semantic_cache = None
+        self.quota = None
+        self.redis_batcher = None
+        self._semantic_persist_task = None
+        self._pool_metrics_task = None
+        self._warm_up_task = None
+        self.readiness: Dict[str, bool] = {"redis": False, "mongo": False, "llm": False}
+        self.health = HealthMonitor(
+            self,
+            interval=config.HEALTH_PROBE_INTERVAL,
+            timeout=config.HEALTH_PROBE_TIMEOUT,
+            lag_interval=config.HEALTH_LOOP_LAG_INTERVAL,
+            max_loop_lag=config.HEALTH_MAX_LOOP_LAG,
+            max_pool_saturation=config.HEALTH_MAX_POOL_SATURATION,
+            max_write_queue_fill=config.HEALTH_MAX_WRITE_QUEUE_FILL,
+        )
+
+    @property
+    def ready(self) -> bool:
+        return all(self.readiness.values())
+
+    async def start(self) -> None:
+        """Cria os clientes (sem I/O) e agenda o aquecimento das dependências."""
+        config = self.config
+
+        http2 = config.OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None
+        if config.OPENAI_HTTP2 and not http2:
+            logger.warning("⚠️ Pacote 'h2' não instalado, usando HTTP/1.1 para a OpenAI")
+        self.http_client = httpx.AsyncClient(
+            http2=http2,
+            timeout=config.OPENAI_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=config.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.OPENAI_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+        self.redis = self._create_redis()
+        self.mongo = self._create_mongo()
+        if config.REDIS_BATCH_ENABLED:
+            self.redis_batcher = RedisBatcher(
+                self.redis, window=config.REDIS_BATCH_WINDOW, max_batch=config.REDIS_BATCH_MAX
+            )
+
+        # Invalidações do cache L1 feitas por outros workers
+        self.pubsub = PubSubListener(self.redis)
+        self.pubsub.subscribe(config.CACHE_INVALIDATION_CHANNEL, self.local_cache.delete)
+        self.pubsub.subscribe(
+            config.SEMANTIC_CACHE_INVALIDATION_CHANNEL, self._on_semantic_invalidation
+        )
+        # Transições de estado dos circuit breakers de outros workers
+        self.pubsub.subscribe(EVENTS_CHANNEL, self._on_circuit_event)
+        self.pubsub.start()
+
+        self.quota = QuotaService(
+            self.redis,
+            self.mongo.chat_db.usage_rollups,
+            limits={
+                "daily": {
+                    "tokens": config.QUOTA_DAILY_TOKENS,
+                    "cost_usd": config.QUOTA_DAILY_COST_USD,
+                },
+                "monthly": {
+                    "tokens": config.QUOTA_MONTHLY_TOKENS,
+                    "cost_usd": config.QUOTA_MONTHLY_COST_USD,
+                },
+            },
+            overrides=config.QUOTA_USER_OVERRIDES,
+            pricing=config.LLM_PRICING,
+            completion_estimate=config.QUOTA_COMPLETION_ESTIMATE,
+            flush_interval=config.QUOTA_FLUSH_INTERVAL,
+            rollup_interval=config.QUOTA_ROLLUP_INTERVAL,
+            sync_interval=config.QUOTA_SYNC_INTERVAL,
+        )
+        self.quota.start()
+
+        self._pool_metrics_task = asyncio.create_task(self._export_pool_metrics())
+        self._warm_up_task = asyncio.create_task(self.warm_up())
+        self.health.start()
+
+    async def warm_up(self) -> None:
+        """Conecta Redis, MongoDB e o LLM em paralelo, cada um até conseguir."""
+        await asyncio.gather(self._warm_redis(), self._warm_mongo(), self._warm_llm())
+        logger.info("✅ Dependências prontas, worker apto a receber tráfego")
+        if self.config.CACHE_WARMUP_ON_START:
+            await self._warm_cache()
+
+    async def _warm_cache(self) -> None:
+        """Recarrega o cache de respostas do histórico (só um worker por deploy)."""
+        config = self.config
+        try:
+            acquired = await self.redis.set(
+                WARMUP_LOCK_KEY, os.getpid(), nx=True, ex=WARMUP_LOCK_TTL
+            )
+        except Exception as e:
+            logger.error(f"Erro ao reservar o aquecimento do cache: {str(e)}")
+            return
+        if not acquired:
+            return
+        warmer = CacheWarmer(
+            self.mongo.chat_db.chat_interactions,
+            CacheService(self.redis),
+            window_days=config.CACHE_WARMUP_WINDOW_DAYS,
+            half_life_hours=config.CACHE_WARMUP_HALF_LIFE_HOURS,
+            batch_size=config.CACHE_WARMUP_BATCH_SIZE,
+            rate=config.CACHE_WARMUP_RATE,
+        )
+        await warmer.warm(config.CACHE_WARMUP_TOP, ttl=config.CACHE_TTL)
+
+    async def _retry(self, name: str, step) -> None:
+        # Intervalo dobra a cada falha, até 10x o configurado
+        interval = self.config.WARMUP_RETRY_INTERVAL
+        while True:
+            try:
+                await asyncio.wait_for(step(), self.config.WARMUP_TIMEOUT)
+                self.readiness[name] = True
+                return
+            except Exception as e:
+                logger.error(
+                    "❌ Falha ao preparar {} ({}), nova tentativa em {}s",
+                    name,
+                    str(e) or type(e).__name__,
+                    interval,
+                )
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, self.config.WARMUP_RETRY_INTERVAL * 10)
+
+    async def _warm_redis(self) -> None:
+        async def ping():
+            await self.redis.ping()
+            logger.info("✅ Redis conectado com sucesso!")
+
+        await self._retry("redis", ping)
+
+    async def _warm_mongo(self) -> None:
+        async def ping():
+            await self.mongo.admin.command("ping")
+            logger.info("✅ MongoDB conectado com sucesso!")
+            if not await MongoDBService(client=self.mongo).ensure_indexes():
+                raise RuntimeError("índices não criados")
+
+        await self._retry("mongo", ping)
+
+    async def _warm_llm(self) -> None:
+        config = self.config
+        if "openai" in config.LLM_PROVIDERS:
+            # O SDK da OpenAI leva centenas de ms para importar: fora do event loop
+            await asyncio.to_thread(importlib.import_module, "openai")
+            self.openai = self._create_openai()
+
+        providers = self._create_providers()
+        self.llm_router = LLMRouter(
+            providers,
+            {
+                provider.name: self.circuit_breaker(provider.breaker_name)
+                for provider in providers
+            },
+            self.llm_dispatcher,
+            hedge=config.LLM_HEDGE_ENABLED,
+            hedge_min_delay=config.LLM_HEDGE_MIN_DELAY,
+            hedge_quantile=config.LLM_HEDGE_QUANTILE,
+        )
+        self.readiness["llm"] = True
+
+        await asyncio.gather(
+            *(breaker.sync_from_redis() for breaker in self.llm_router.breakers.values()),
+            self._preconnect(),
+        )
+        if config.SEMANTIC_CACHE_ENABLED:
+            await self._start_semantic_cache()
+
+    def _create_openai(self):
+        """Cliente da OpenAI sobre o pool HTTP compartilhado."""
+        from openai import AsyncOpenAI, OpenAIError
+
+        try:
+            return AsyncOpenAI(
+                api_key=self.config.OPENAI_API_KEY,
+                base_url=self.config.OPENAI_BASE_URL,
+                max_retries=self.config.OPENAI_MAX_RETRIES,
+                http_client=self.http_client,
+            )
+        except OpenAIError as e:
+            logger.error(f"❌ Erro ao criar cliente da OpenAI: {str(e)}")
+            return None
+
+    async def _preconnect(self) -> None:
+        """Abre conexões (TCP + TLS) com a OpenAI antes da primeira requisição."""
+        if self.openai is None or not self.config.OPENAI_PRECONNECT:
+            return
+        url = str(self.openai.base_url)
+        results = await asyncio.gather(
+            *(
+                self.http_client.head(url, timeout=self.config.WARMUP_TIMEOUT)
+                for _ in range(self.config.OPENAI_PRECONNECT)
+            ),
+            return_exceptions=True,
+        )
+        # Qualquer status serve: o que importa é a conexão aberta no pool
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning(f"⚠️ Pré-conexão com a OpenAI falhou: {str(errors[0])}")
+
+    def _create_providers(self) -> List[LLMProvider]:
+        """Provedores de ``LLM_PROVIDERS`` que têm credenciais configuradas."""
+        config = self.config
+        providers = []
+        for name in config.LLM_PROVIDERS:
+            if name == "openai" and self.openai is not None:
+                providers.append(OpenAIProvider(self.openai, config.OPENAI_MODEL))
+            elif name == "anthropic" and config.ANTHROPIC_API_KEY:
+                providers.append(
+                    AnthropicProvider(
+                        self.http_client,
+                        config.ANTHROPIC_API_KEY,
+                        config.ANTHROPIC_MODEL,
+                        base_url=config.ANTHROPIC_BASE_URL,
+                        max_tokens=config.ANTHROPIC_MAX_TOKENS,
+                    )
+                )
+            elif name == "mock":
+                providers.append(
+                    MockProvider(
+                        latency=config.MOCK_LLM_LATENCY,
+                        error_rate=config.MOCK_LLM_ERROR_RATE,
+                    )
+                )
+            else:
+                logger.warning(f"⚠️ Provedor de LLM ignorado (sem credenciais ou desconhecido): {name}")
+        return providers
+
+    def _create_redis(self) -> redis.Redis:
+        """Cliente Redis sobre um ``ConnectionPool`` limitado."""
+        self.redis_pool = redis.ConnectionPool.from_url(
+            self.config.REDIS_URL or "redis://redis:6379",
+            max_connections=self.config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=self.config.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True,
+        )
+        return redis.Redis(connection_pool=self.redis_pool)
+
+    def _create_mongo(self) -> motor.motor_asyncio.AsyncIOMotorClient:
+        """Cliente Motor com o pool dimensionado pelo ``AppConfig``."""
+        return motor.motor_asyncio.AsyncIOMotorClient(
+            self.config.MONGODB_URL,
+            maxPoolSize=self.config.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=self.config.MONGODB_MIN_POOL_SIZE,
+            event_listeners=[self.mongo_listener],
+        )
+
+    async def _start_semantic_cache(self) -> None:
+        """Cria o cache semântico e carrega os índices persistidos."""
+        # Importado só quando habilitado (traz o numpy)
+        from app.services import semantic_cache
+
+        config = self.config
+        if semantic_cache.np is None:
+            logger.warning("⚠️ numpy não instalado, cache semântico desabilitado")
+            return
+
+        if config.SEMANTIC_CACHE_EMBEDDER == EmbedderBackend.OPENAI and self.openai:
+            embedder = semantic_cache.OpenAIEmbedder(
+                self.openai, dim=config.SEMANTIC_CACHE_DIM
+            )
+        else:
+            embedder = semantic_cache.HashingEmbedder(dim=config.SEMANTIC_CACHE_DIM)
+
+        persistence = config.SEMANTIC_CACHE_PERSISTENCE
+        self.semantic_cache = semantic_cache.SemanticCache(
+            embedder,
+            threshold=config.SEMANTIC_CACHE_THRESHOLD,
+            capacity=config.SEMANTIC_CACHE_CAPACITY,
+            ttl=config.CACHE_TTL,
+            redis_client=self.redis if persistence == PersistenceBackend.REDIS else None,
+            persist_path=(
+                config.SEMANTIC_CACHE_PATH
+                if persistence == PersistenceBackend.DISK
+                else None
+            ),
+        )
+        await self.semantic_cache.load([config.OPENAI_MODEL])
+        if persistence != PersistenceBackend.NONE:
+            self._semantic_persist_task = asyncio.create_task(
+                self._persist_semantic_cache()
+            )
+
+    async def _persist_semantic_cache(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.SEMANTIC_CACHE_PERSIST_INTERVAL)
+            await self.semantic_cache.save()
+
+    async def _export_pool_metrics(self) -> None:
+        # Gauges em vez de um Collector customizado: só assim os valores
+        # entram na agregação entre workers do modo multiprocesso
+        while True:
+            for pool, stats in self.pool_stats().items():
+                CLIENT_POOL_IN_USE.labels(pool=pool).set(stats["in_use"])
+                CLIENT_POOL_IDLE.labels(pool=pool).set(stats["idle"])
+                CLIENT_POOL_MAX.labels(pool=pool).set(stats["max"])
+                CLIENT_POOL_SATURATION.labels(pool=pool).set(
+                    stats["in_use"] / stats["max"] if stats["max"] else 0.0
+                )
+            await asyncio.sleep(self.config.POOL_METRICS_INTERVAL)
+
+    async def close(self) -> None:
+        """Fecha os pools de conexão."""
+        await self.health.stop()
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            await asyncio.gather(self._warm_up_task, return_exceptions=True)
+        if self._pool_metrics_task is not None:
+            self._pool_metrics_task.cancel()
+            await asyncio.gather(self._pool_metrics_task, return_exceptions=True)
+            self._pool_metrics_task = None
+        if self.pubsub is not None:
+            await self.pubsub.stop()
+        if self.quota is not None:
+            await self.quota.stop()
+        if self.redis_batcher is not None:
+            await self.redis_batcher.close()
+        if self._semantic_persist_task is not None:
+            self._semantic_persist_task.cancel()
+            await asyncio.gather(self._semantic_persist_task, return_exceptions=True)
+            await self.semantic_cache.save()
+        if self.openai is not None:
+            await self.openai.close()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+        if self.redis is not None:
+            await self.redis.aclose()
+        if self.redis_pool is not None:
+            await self.redis_pool.disconnect()
+        if self.mongo is not None:
+            self.mongo.close()
+
+    def circuit_breaker(self, service_name: str) -> CircuitBreaker:
+        """Circuit breaker do processo para um serviço externo."""
+        if service_name not in self.circuit_breakers:
+            self.circuit_breakers[service_name] = CircuitBreaker(
+                service_name,
+                failure_threshold=self.config.CIRCUIT_FAILURE_THRESHOLD,
+                recovery_timeout=self.config.CIRCUIT_RECOVERY_TIMEOUT,
+                redis_client=self.redis,
+                failure_rate_threshold=self.config.CIRCUIT_FAILURE_RATE_THRESHOLD,
+                window_seconds=self.config.CIRCUIT_WINDOW_SECONDS,
+                minimum_calls=self.config.CIRCUIT_MINIMUM_CALLS,
+                half_open_max_calls=self.config.CIRCUIT_HALF_OPEN_MAX_CALLS,
+            )
+        return self.circuit_breakers[service_name]
+
+    def _on_circuit_event(self, data: str) -> None:
+        for breaker in self.circuit_breakers.values():
+            breaker.apply_remote_event(data)
+
+    def _on_semantic_invalidation(self, model: str) -> None:
+        if self.semantic_cache is not None and self.semantic_cache.drop(model):
+            logger.info(f"🗑️ Cache semântico descartado ({model})")
+
+    def pool_stats(self) -> dict:
+        """
+        Conexões em uso e capacidade de cada pool.
+
+        O redis-py e o httpx não expõem contadores públicos do pool: os
+        atributos internos são lidos com ``getattr`` e, se mudarem numa
+        versão nova, a métrica zera em vez de derrubar o export.
+        """
+        stats = {}
+
+        if self.redis_pool is not None:
+            stats["redis"] = {
+                "in_use": len(getattr(self.redis_pool, "_in_use_connections", ())),
+                "idle": len(getattr(self.redis_pool, "_available_connections", ())),
+                "max": getattr(
+                    self.redis_pool, "max_connections", self.config.REDIS_MAX_CONNECTIONS
+                ),
+            }
+
+        if self.mongo is not None:
+            stats["mongo"] = {
+                "in_use": self.mongo_listener.checked_out,
+                "idle": max(
+                    self.mongo_listener.open_connections
+                    - self.mongo_listener.checked_out,
+                    0,
+                ),
+                "max": self.config.MONGODB_MAX_POOL_SIZE,
+            }
+
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        if pool is not None:
+            connections = list(getattr(pool, "connections", ()))
+            idle = sum(
+                1
+                for connection in connections
+                if getattr(connection, "is_idle", lambda: False)()
+            )
+            stats["openai_http"] = {
+                "in_use": len(connections) - idle,
+                "idle": idle,
+                "max": self.config.OPENAI_MAX_CONNECTIONS,
+            }
+
+        return stats
+
+
+def get_clients(request: Request) -> ClientRegistry:
+    """Dependência FastAPI que entrega o registro de clientes do processo."""
+    return request.app.state.clients
+
+
+def get_llm_clients(request: Request) -> ClientRegistry:
+    """Como ``get_clients``, mas responde 503 enquanto o LLM não está pronto."""
+    clients = request.app.state.clients
+    if clients.llm_router is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Serviço iniciando, tente novamente",
+            headers={"Retry-After": "1"},
+        )
+    return clients
@@ -1,5 +1,5 @@
 import enum
-from typing import Union
+from typing import Dict, List, Union
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -29,6 +29,21 @@ class RateLimitBackend(str, enum.Enum):
     LOCAL = "local"
 
 
+class EmbedderBackend(str, enum.Enum):
+    """Supported embedding backends for the semantic cache."""
+
+    HASHING = "hashing"
+    OPENAI = "openai"
+
+
+class PersistenceBackend(str, enum.Enum):
+    """Where in-memory indexes are persisted."""
+
+    REDIS = "redis"
+    DISK = "disk"
+    NONE = "none"
+
+
 class AppEnvs(str, enum.Enum):
     """Application envs"""
 
@@ -50,30 +65,246 @@ class AppConfig(BaseSettings):
     ENVIRONMENT: AppEnvs = AppEnvs.DEVELOPMENT
     HOST: str = "0.0.0.0"
     PORT: int = 8002
+    # Sem valor, um worker por CPU disponível (respeitando a cota do cgroup)
     WORKER_COUNT: Union[int, None] = None
+    # "auto" usa uvloop/httptools quando instalados (extra "performance")
+    UVICORN_LOOP: str = "auto"
+    UVICORN_HTTP: str = "auto"
+    # Atrás de um load balancer, maior que o idle timeout dele (senão o
+    # uvicorn fecha conexões que o balanceador ainda vai reutilizar)
+    UVICORN_TIMEOUT_KEEP_ALIVE: int = 5
+    UVICORN_BACKLOG: int = 2048
+    # Conexões/requisições simultâneas por worker antes de responder 503
+    UVICORN_LIMIT_CONCURRENCY: Union[int, None] = None
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+    # Diretório das métricas compartilhadas entre workers (modo multiprocesso)
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/prometheus_multiproc"
+    POOL_METRICS_INTERVAL: float = 5.0
 
     # Redis
     REDIS_HOST: str = ""
     REDIS_PORT: str = ""
     REDIS_PASSWORD: str = ""
     REDIS_URL: str = "redis://redis:6379"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    # Escritas de requisições diferentes agrupadas num pipeline por janela
+    REDIS_BATCH_ENABLED: bool = True
+    REDIS_BATCH_WINDOW: float = 0.002  # segundos
+    REDIS_BATCH_MAX: int = 128  # escritas por pipeline
 
     # Cache settings
     CACHE_TTL: int = 3600  # 1 hora
     SESSION_TTL: int = 7200  # 2 horas
+    CACHE_L1_MAX_ITEMS: int = 1024
+    CACHE_L1_MAX_BYTES: int = 16 * 1024 * 1024  # 16 MB
+    CACHE_L1_TTL: int = 60  # 1 minuto
+    CACHE_INVALIDATION_CHANNEL: str = "llm_cache:invalidate"
+
+    # Compressão das respostas (brotli e zstd só com os pacotes instalados)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ALGORITHMS: List[str] = ["zstd", "br", "gzip"]  # preferência
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes
+    COMPRESSION_GZIP_LEVEL: int = 5
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # Aquecimento do cache a partir do histórico (python -m app.cli warm)
+    CACHE_WARMUP_ON_START: bool = False  # um worker aquece no startup
+    CACHE_WARMUP_TOP: int = 500
+    CACHE_WARMUP_WINDOW_DAYS: float = 7.0
+    CACHE_WARMUP_HALF_LIFE_HOURS: float = 24.0
+    CACHE_WARMUP_BATCH_SIZE: int = 100
+    CACHE_WARMUP_RATE: float = 500.0  # respostas gravadas por segundo
+
+    # Semantic cache
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_EMBEDDER: EmbedderBackend = EmbedderBackend.HASHING
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_CAPACITY: int = 10000
+    SEMANTIC_CACHE_DIM: int = 256
+    SEMANTIC_CACHE_PERSISTENCE: PersistenceBackend = PersistenceBackend.REDIS
+    SEMANTIC_CACHE_PATH: str = "data/semantic_cache"
+    SEMANTIC_CACHE_PERSIST_INTERVAL: int = 300  # 5 minutos
+    # Invalidações por modelo feitas por outros workers (ou pela CLI)
+    SEMANTIC_CACHE_INVALIDATION_CHANNEL: str = "semantic_cache:invalidate"
+
+    # Conversation context
+    CONTEXT_MAX_MESSAGES: int = 50
+    CONTEXT_TOKEN_BUDGET: int = 2000
+    CONTEXT_SUMMARY_MAX_TOKENS: int = 300
 
     # Rate limiting
     RATE_LIMIT_REQUESTS: int = 10
     RATE_LIMIT_WINDOW: int = 60  # 1 minuto
+    RATE_LIMIT_BACKEND: RateLimitBackend = RateLimitBackend.REDIS
+    # Limites por rota, ex.: {"POST /api/v1/chat": "10/60"}
+    RATE_LIMIT_RULES: Dict[str, str] = {}
+    # Rotas (prefixos) que recebem o limite padrão quando não há regra: as que
+    # chamam o LLM (/chat e /chat/batch). As demais rotas não são limitadas
+    RATE_LIMIT_DEFAULT_PATHS: List[str] = ["POST /api/v1/chat"]
+    # Rotas em lote: cada item de ``prompts`` no corpo conta como uma requisição
+    RATE_LIMIT_BATCH_PATHS: List[str] = ["POST /api/v1/chat/batch"]
+    # Limites por usuário (ou IP), ex.: {"user-123": "100/60"}
+    RATE_LIMIT_USER_OVERRIDES: Dict[str, str] = {}
+    RATE_LIMIT_USER_HEADER: str = "X-User-Id"
+    # Só ligue atrás de um gateway que autentica e preenche o header: sem isso
+    # o cliente é identificado pelo IP
+    RATE_LIMIT_TRUST_USER_HEADER: bool = False
+    RATE_LIMIT_EXEMPT_PATHS: List[str] = [
+        "/metrics",
+        "/api/v1/health",
+        "/api/v1/livez",
+        "/api/v1/readyz",
+        "/docs",
+        "/redoc",
+        "/openapi.json",
+    ]
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100_000
+
+    # Circuit breaker
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_TIMEOUT: int = 60
+    CIRCUIT_FAILURE_RATE_THRESHOLD: float = 0.5
+    CIRCUIT_WINDOW_SECONDS: int = 60
+    CIRCUIT_MINIMUM_CALLS: int = 10
+    CIRCUIT_HALF_OPEN_MAX_CALLS: int = 3
 
     # MongoDB
     MONGODB_URL: str = "mongodb://mongo:27017"
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+
+    # Chat history
+    CHAT_HISTORY_PAGE_SIZE: int = 50
+    CHAT_HISTORY_MAX_PAGE_SIZE: int = 200
+    CHAT_EXPORT_BATCH_SIZE: int = 500
+    # POST /chat/batch: prompts por requisição e chamadas ao LLM em paralelo
+    CHAT_BATCH_MAX_SIZE: int = 100
+    CHAT_BATCH_CONCURRENCY: int = 8
+
+    # Write-behind persistence
+    WRITE_BEHIND_MAX_SIZE: int = 10_000
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 1.0
+    WRITE_BEHIND_MAX_RETRIES: int = 3
+    WRITE_BEHIND_ENQUEUE_TIMEOUT: float = 0.5
+    WRITE_BEHIND_DEAD_LETTER_PATH: str = "data/dead_letter/chat_interactions.jsonl"
 
     # OPENAI Model
     OPENAI_API_KEY: str = ""
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    OPENAI_BASE_URL: Union[str, None] = None
+    # Requer o h2 (extra "performance"); sem ele o cliente usa HTTP/1.1
+    OPENAI_HTTP2: bool = True
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0
+    OPENAI_TIMEOUT: float = 60.0
+    # Retentativas do SDK; sob sobrecarga cada retentativa é carga extra
+    OPENAI_MAX_RETRIES: int = 1
+    # Conexões abertas com a OpenAI no aquecimento do worker (0 = nenhuma)
+    OPENAI_PRECONNECT: int = 2
+
+    # Provedores de LLM, em ordem de preferência: "openai", "anthropic", "mock"
+    LLM_PROVIDERS: List[str] = ["openai"]
+    # Dispara o próximo provedor se o atual passar do seu p95
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_MIN_DELAY: float = 0.5
+    LLM_HEDGE_QUANTILE: float = 0.95
+
+    # Anthropic
+    ANTHROPIC_API_KEY: str = ""
+    ANTHROPIC_MODEL: str = "claude-3-5-haiku-latest"
+    ANTHROPIC_BASE_URL: str = "https://api.anthropic.com"
+    ANTHROPIC_MAX_TOKENS: int = 1024
+
+    # Provedor mock (testes locais e benchmarks)
+    MOCK_LLM_LATENCY: float = 0.05
+    MOCK_LLM_ERROR_RATE: float = 0.0
+
+    # Dispatcher das chamadas ao LLM (concorrência adaptativa por modelo)
+    LLM_DISPATCH_INITIAL_CONCURRENCY: int = 16
+    LLM_DISPATCH_MIN_CONCURRENCY: int = 1
+    LLM_DISPATCH_MAX_CONCURRENCY: int = 64
+    # Latência acima do alvo reduz o limite de concorrência
+    LLM_DISPATCH_LATENCY_TARGET: float = 15.0
+    LLM_DISPATCH_MAX_QUEUE: int = 1000
+    # Espera máxima na fila quando o cliente não informa um prazo
+    LLM_DISPATCH_MAX_WAIT: float = 30.0
+    # Header com o prazo do cliente em segundos (ex.: "X-Request-Timeout: 10")
+    REQUEST_TIMEOUT_HEADER: str = "X-Request-Timeout"
+
+    # Aquecimento das dependências em segundo plano ao iniciar o worker
+    WARMUP_TIMEOUT: float = 5.0
+    WARMUP_RETRY_INTERVAL: float = 2.0
+
+    # Health checks: probes em segundo plano, endpoints leem o último resultado
+    HEALTH_PROBE_INTERVAL: float = 5.0
+    HEALTH_PROBE_TIMEOUT: float = 1.0
+    HEALTH_LOOP_LAG_INTERVAL: float = 0.5
+    # Limites acima dos quais /readyz responde 503
+    HEALTH_MAX_LOOP_LAG: float = 0.5
+    HEALTH_MAX_POOL_SATURATION: float = 0.95
+    HEALTH_MAX_WRITE_QUEUE_FILL: float = 0.9
+
+    # Controle de admissão: requisições simultâneas por worker (0 = desligado)
+    ADMISSION_MAX_INFLIGHT: int = 256
+    ADMISSION_MAX_QUEUE: int = 512
+    ADMISSION_MAX_QUEUE_WAIT: float = 2.0
+    # CoDel: espera alvo na fila e janela acima dela que ativa o descarte
+    ADMISSION_TARGET_DELAY: float = 0.1
+    ADMISSION_INTERVAL: float = 1.0
+    ADMISSION_MAX_LOOP_LAG: float = 0.25
+    ADMISSION_RETRY_AFTER: int = 1
+    ADMISSION_EXEMPT_PATHS: List[str] = [
+        "/metrics",
+        "/api/v1/health",
+        "/api/v1/livez",
+        "/api/v1/readyz",
+        "/api/v1/admin",
+        "/docs",
+        "/redoc",
+        "/openapi.json",
+    ]
+
+    # Cotas de uso por usuário (0 = sem limite); custo em USD
+    QUOTA_DAILY_TOKENS: int = 0
+    QUOTA_MONTHLY_TOKENS: int = 0
+    QUOTA_DAILY_COST_USD: float = 0.0
+    QUOTA_MONTHLY_COST_USD: float = 0.0
+    # Por usuário, ex.: {"user-123": {"daily": {"tokens": 2000000}}}
+    QUOTA_USER_OVERRIDES: Dict[str, Dict[str, Dict[str, float]]] = {}
+    # Tokens de resposta assumidos na estimativa feita antes da chamada
+    QUOTA_COMPLETION_ESTIMATE: int = 500
+    QUOTA_FLUSH_INTERVAL: float = 1.0
+    QUOTA_ROLLUP_INTERVAL: float = 60.0
+    QUOTA_SYNC_INTERVAL: float = 30.0
+    # USD por 1M de tokens [entrada, saída], pelo prefixo do nome do modelo
+    LLM_PRICING: Dict[str, List[float]] = {
+        "gpt-4o-mini": [0.15, 0.60],
+        "gpt-4o": [2.50, 10.00],
+        "claude-3-5-haiku": [0.80, 4.00],
+        "claude-3-5-sonnet": [3.00, 15.00],
+    }
+
+    # Observabilidade
+    # Spans OpenTelemetry nas etapas do chat (requer opentelemetry-api)
+    OTEL_ENABLED: bool = False
+    # Token do header X-Admin-Token dos endpoints /admin (vazio = desabilitados)
+    ADMIN_TOKEN: str = ""
+    PROFILER_MAX_SECONDS: int = 60
 
     # LOKI
     LOKI_URL: str = ""
+    LOKI_BATCH_SIZE: int = 500
+    LOKI_FLUSH_INTERVAL: float = 2.0
+    LOKI_QUEUE_SIZE: int = 10_000
+    LOKI_TIMEOUT: float = 5.0
+    # Após uma falha de envio os logs vão direto para o fallback por N segundos
+    LOKI_RETRY_AFTER: float = 30.0
+    # Arquivo usado quando o Loki está fora (padrão: stderr)
+    LOG_FALLBACK_PATH: Union[str, None] = None
 
 
 # Initialize configuration settings
@@ -1,10 +1,17 @@
 """Application lifecycle management."""
 
+import asyncio
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from loguru import logger
+from prometheus_client import multiprocess
+from app.core.clients import ClientRegistry
+from app.core.config import settings
+from app.core.logging import flush_logs
 from app.services.db_service import MongoDBService
+from app.services.write_behind import WriteBehindQueue
 
 
 @asynccontextmanager
@@ -12,21 +19,45 @@ async def lifespan(app: FastAPI):
     """Handle application startup and shutdown events."""
     logger.info("🚀 Application starting up...")
 
-    # Inicializa e conecta ao MongoDB
-    db_service = MongoDBService()
-    connected = await db_service.connect()
-    if connected:
-        logger.info("✅ MongoDB conectado com sucesso!")
-    else:
-        logger.error("❌ Falha ao conectar ao MongoDB")
+    # Cria os clientes compartilhados (OpenAI, Redis e MongoDB) do processo.
+    # As conexões e os índices do MongoDB ficam para o aquecimento em segundo
+    # plano: o worker atende /livez na hora e /readyz quando tudo estiver pronto
+    clients = ClientRegistry()
+    await clients.start()
+    app.state.clients = clients
+
+    # Serviço do MongoDB sobre o cliente compartilhado
+    db_service = MongoDBService(client=clients.mongo)
 
     # Armazena o serviço no estado da aplicação para uso posterior
     app.state.db_service = db_service
 
+    # Fila write-behind: as requisições só enfileiram os chats a salvar
+    write_queue = WriteBehindQueue(
+        db_service.db.chat_interactions,
+        max_size=settings.WRITE_BEHIND_MAX_SIZE,
+        batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+        max_retries=settings.WRITE_BEHIND_MAX_RETRIES,
+        enqueue_timeout=settings.WRITE_BEHIND_ENQUEUE_TIMEOUT,
+        dead_letter_path=settings.WRITE_BEHIND_DEAD_LETTER_PATH,
+    )
+    write_queue.start()
+    clients.write_queue = write_queue
+
     yield
 
-    # Desconecta do MongoDB
-    if hasattr(app.state, "db_service"):
-        await app.state.db_service.disconnect()
+    # Drena a fila antes de fechar a conexão com o MongoDB
+    await write_queue.stop()
+
+    # Fecha os pools de conexão
+    await app.state.clients.close()
+
+    # Remove os gauges "live" deste worker da agregação multiprocesso
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
 
     logger.info("👋 Application shutting down...")
+
+    # Envia os logs pendentes ao Loki sem bloquear o event loop
+    await asyncio.to_thread(flush_logs)
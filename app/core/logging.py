@@ -0,0 +1,221 @@
+"""Configuração dos logs: envio em lote ao Loki fora do event loop."""
+
+import atexit
+import gzip
+import json
+import queue
+import sys
+import threading
+import time
+from typing import List, Tuple, Union
+
+import httpx
+from loguru import logger
+from loki_logger_handler.formatters.loguru_formatter import LoguruFormatter
+
+from app.core.config import AppConfig, LogLevel, settings
+from app.core.metrics import LOG_PUSH_LATENCY, LOG_RECORDS_DROPPED, LOG_RECORDS_FALLBACK
+
+LOKI_PUSH_PATH = "/loki/api/v1/push"
+LOKI_LABELS = {"application": "Test", "environment": "Develop"}
+
+# Com a fila acima desta fração, registros abaixo de WARNING são descartados
+SHED_WATERMARK = 0.8
+SHED_BELOW_LEVEL = 30  # WARNING
+
+# Níveis do AppConfig sem equivalente direto no loguru
+LOGURU_LEVELS = {LogLevel.NOTSET: 0, LogLevel.FATAL: "CRITICAL"}
+
+_loki_sink = None
+
+
+class LokiSink:
+    """
+    Sink do loguru que envia os logs ao Loki em lotes comprimidos com gzip.
+
+    Quem loga só formata o registro e o coloca numa fila limitada; uma thread
+    de background junta até ``batch_size`` registros (ou espera
+    ``flush_interval`` segundos) e faz o push. Com a fila acima de 80% os
+    registros abaixo de WARNING são descartados e com a fila cheia qualquer
+    registro é descartado, ambos contabilizados em ``log_records_dropped_total``.
+    Se o push falha, o lote vai para o fallback (arquivo ou stderr) e o Loki
+    só é tentado de novo após ``retry_after`` segundos.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        labels: dict,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        max_queue: int = 10_000,
+        timeout: float = 5.0,
+        retry_after: float = 30.0,
+        fallback_path: Union[str, None] = None,
+    ):
+        self.url = push_url(url)
+        self.labels = labels
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_after = retry_after
+        self.fallback_path = fallback_path
+        self.formatter = LoguruFormatter()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._shed_at = int(max_queue * SHED_WATERMARK)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._loki_retry_at = 0.0
+        self._client = httpx.Client(timeout=timeout)
+        self._thread = threading.Thread(target=self._run, name="loki-sink", daemon=True)
+        self._thread.start()
+
+    def __call__(self, message) -> None:
+        record = message.record
+        if (
+            record["level"].no < SHED_BELOW_LEVEL
+            and self._queue.qsize() >= self._shed_at
+        ):
+            LOG_RECORDS_DROPPED.labels(reason="shed").inc()
+            return
+
+        formatted, _ = self.formatter.format(record)
+        timestamp = int(record["time"].timestamp() * 1e9)
+        try:
+            self._queue.put_nowait((timestamp, formatted))
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(reason="overflow").inc()
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Espera a fila ser enviada (bloqueante, até ``timeout`` segundos)."""
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Envia o que restou e encerra a thread."""
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._client.close()
+
+    def _run(self) -> None:
+        while not (self._stopping and self._queue.empty()):
+            if self._queue.qsize() < self.batch_size and not self._stopping:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+            while not self._queue.empty():
+                batch = self._take()
+                try:
+                    self._ship(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def _take(self) -> List[Tuple[int, dict]]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _ship(self, batch: List[Tuple[int, dict]]) -> None:
+        values = [
+            [str(timestamp), json.dumps(formatted, default=str, ensure_ascii=False)]
+            for timestamp, formatted in batch
+        ]
+        if time.monotonic() >= self._loki_retry_at:
+            payload = json.dumps({"streams": [{"stream": self.labels, "values": values}]})
+            started_at = time.perf_counter()
+            try:
+                response = self._client.post(
+                    self.url,
+                    content=gzip.compress(payload.encode("utf-8")),
+                    headers={
+                        "Content-Type": "application/json",
+                        "Content-Encoding": "gzip",
+                    },
+                )
+                response.raise_for_status()
+                LOG_PUSH_LATENCY.observe(time.perf_counter() - started_at)
+                return
+            except httpx.HTTPError as e:
+                self._loki_retry_at = time.monotonic() + self.retry_after
+                self._write_fallback(
+                    [
+                        json.dumps(
+                            {
+                                "level": "WARNING",
+                                "message": f"Loki indisponível, usando fallback: {e}",
+                            }
+                        )
+                    ]
+                )
+        LOG_RECORDS_FALLBACK.inc(len(values))
+        self._write_fallback([line for _, line in values])
+
+    def _write_fallback(self, lines: List[str]) -> None:
+        # Não usa o logger aqui: o registro voltaria para esta mesma fila
+        try:
+            if self.fallback_path:
+                with open(self.fallback_path, "a", encoding="utf-8") as file:
+                    file.write("\n".join(lines) + "\n")
+            else:
+                sys.stderr.write("\n".join(lines) + "\n")
+                sys.stderr.flush()
+        except (OSError, ValueError):
+            pass
+
+
+def push_url(url: str) -> str:
+    """Aceita tanto a URL base do Loki quanto a do endpoint de push."""
+    url = url.rstrip("/")
+    return url if url.endswith(LOKI_PUSH_PATH) else url + LOKI_PUSH_PATH
+
+
+def loguru_level(level: LogLevel) -> Union[str, int]:
+    return LOGURU_LEVELS.get(level, level.value)
+
+
+def configure_logging(config: AppConfig = settings) -> None:
+    """
+    Instala os sinks do loguru no nível ``LOG_LEVEL``.
+
+    Com ``LOKI_URL`` os logs vão para o ``LokiSink``; sem ele, para o stderr.
+    Níveis abaixo do configurado são descartados pelo loguru antes de formatar
+    a mensagem, desde que o log use argumentos (``logger.info("x {}", y)``)
+    em vez de f-strings.
+    """
+    global _loki_sink
+
+    level = loguru_level(config.LOG_LEVEL)
+    if config.LOKI_URL:
+        if _loki_sink is None:
+            _loki_sink = LokiSink(
+                config.LOKI_URL,
+                labels=LOKI_LABELS,
+                batch_size=config.LOKI_BATCH_SIZE,
+                flush_interval=config.LOKI_FLUSH_INTERVAL,
+                max_queue=config.LOKI_QUEUE_SIZE,
+                timeout=config.LOKI_TIMEOUT,
+                retry_after=config.LOKI_RETRY_AFTER,
+                fallback_path=config.LOG_FALLBACK_PATH,
+            )
+            atexit.register(_loki_sink.stop)
+        handlers = [{"sink": _loki_sink, "level": level}]
+    else:
+        handlers = [{"sink": sys.stderr, "level": level}]
+
+    logger.configure(handlers=handlers)
+
+
+def flush_logs(timeout: float = 5.0) -> None:
+    """Envia os logs pendentes (chamado no shutdown)."""
+    if _loki_sink is not None:
+        _loki_sink.flush(timeout)
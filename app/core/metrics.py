@@ -0,0 +1,252 @@
+"""
+Métricas Prometheus customizadas da aplicação.
+
+Com vários workers (``PROMETHEUS_MULTIPROC_DIR`` definido) cada processo grava
+suas métricas em arquivos compartilhados e o ``/metrics`` agrega todos eles.
+Gauges precisam declarar ``multiprocess_mode`` para dizer como agregar.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Tempo entre o envio da requisição ao LLM e o primeiro token recebido
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Tempo até o primeiro token de uma completion em streaming.",
+    ["model"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0),
+)
+
+# Cache L1 (memória do processo) na frente do Redis
+L1_CACHE_REQUESTS = Counter(
+    "llm_cache_l1_requests_total",
+    "Consultas ao cache L1 em memória, por resultado (hit/miss).",
+    ["result"],
+)
+L1_CACHE_EVICTIONS = Counter(
+    "llm_cache_l1_evictions_total",
+    "Entradas removidas do cache L1, por motivo (capacity/bytes/expired).",
+    ["reason"],
+)
+
+# Chamadas concorrentes idênticas que aguardaram uma execução em andamento
+SINGLE_FLIGHT_COALESCED = Counter(
+    "single_flight_coalesced_total",
+    "Chamadas atendidas por uma execução single-flight já em andamento.",
+    ["name"],
+)
+
+# Cache semântico (similaridade de embeddings)
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "llm_semantic_cache_lookups_total",
+    "Consultas ao cache semântico, por modelo e resultado (hit/miss).",
+    ["model", "result"],
+)
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "llm_semantic_cache_best_similarity",
+    "Similaridade do vizinho mais próximo encontrado no cache semântico.",
+    ["model"],
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.95, 0.97, 0.99, 1.0),
+)
+
+# Fila write-behind de persistência no MongoDB
+WRITE_BEHIND_QUEUE_DEPTH = Gauge(
+    "write_behind_queue_depth",
+    "Documentos aguardando gravação na fila write-behind.",
+    multiprocess_mode="livesum",
+)
+WRITE_BEHIND_FLUSH_LATENCY = Histogram(
+    "write_behind_flush_latency_seconds",
+    "Duração de cada flush (insert_many com retentativas).",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+WRITE_BEHIND_FLUSH_SIZE = Histogram(
+    "write_behind_flush_size",
+    "Documentos gravados por flush.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+WRITE_BEHIND_DROPPED = Counter(
+    "write_behind_dropped_total",
+    "Documentos descartados por fila cheia (backpressure esgotado).",
+)
+WRITE_BEHIND_DEAD_LETTERS = Counter(
+    "write_behind_dead_letters_total",
+    "Documentos gravados no arquivo dead-letter após esgotar as retentativas.",
+)
+
+# Transições de estado dos circuit breakers
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "Transições de estado dos circuit breakers, por serviço e novo estado.",
+    ["service", "state"],
+)
+
+# Envio de logs ao Loki
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Registros de log descartados antes do envio (shed: pressão na fila; overflow: fila cheia).",
+    ["reason"],
+)
+LOG_RECORDS_FALLBACK = Counter(
+    "log_records_fallback_total",
+    "Registros de log gravados no fallback local por falha no Loki.",
+)
+LOG_PUSH_LATENCY = Histogram(
+    "log_push_latency_seconds",
+    "Duração de cada push de lote ao Loki.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Ocupação dos pools de conexão, atualizada periodicamente pelo ClientRegistry
+CLIENT_POOL_IN_USE = Gauge(
+    "client_pool_connections_in_use",
+    "Conexões em uso por pool de cliente.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CLIENT_POOL_IDLE = Gauge(
+    "client_pool_connections_idle",
+    "Conexões ociosas por pool de cliente.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CLIENT_POOL_MAX = Gauge(
+    "client_pool_connections_max",
+    "Capacidade máxima configurada por pool de cliente.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CLIENT_POOL_SATURATION = Gauge(
+    "client_pool_saturation_ratio",
+    "Fração da capacidade do pool em uso (0 a 1); o maior valor entre os workers.",
+    ["pool"],
+    multiprocess_mode="livemax",
+)
+
+# Dispatcher das chamadas ao LLM (fila com prioridade e concorrência adaptativa)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_dispatch_queue_wait_seconds",
+    "Tempo de espera na fila do dispatcher até obter uma vaga para chamar o LLM.",
+    ["model", "priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+LLM_DISPATCH_DROPPED = Counter(
+    "llm_dispatch_dropped_total",
+    "Chamadas ao LLM descartadas na fila (queue_full ou deadline).",
+    ["model", "reason"],
+)
+LLM_INFLIGHT = Gauge(
+    "llm_dispatch_inflight",
+    "Chamadas ao LLM em andamento.",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "llm_dispatch_concurrency_limit",
+    "Limite de concorrência adaptativo (AIMD) das chamadas ao LLM.",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+
+# Roteamento entre provedores de LLM
+LLM_PROVIDER_FAILOVERS = Counter(
+    "llm_provider_failovers_total",
+    "Chamadas redirecionadas para outro provedor após falha do anterior.",
+    ["provider"],
+)
+LLM_HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total",
+    "Chamadas hedged disparadas porque o provedor anterior passou do p95.",
+    ["provider"],
+)
+
+# Latência por etapa do caminho de chat (cache, LLM, contexto, MongoDB...)
+STAGE_LATENCY = Histogram(
+    "chat_stage_latency_seconds",
+    "Duração de cada etapa do processamento de uma requisição de chat.",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total",
+    "Consultas ao cache de respostas do LLM, por camada (redis/semantic) e resultado.",
+    ["layer", "result"],
+)
+LLM_PROVIDER_LATENCY = Histogram(
+    "llm_provider_latency_seconds",
+    "Duração das chamadas a cada provedor de LLM, por resultado.",
+    ["provider", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Estado do circuit breaker (0 = closed, 1 = half_open, 2 = open).",
+    ["service"],
+    multiprocess_mode="livemax",
+)
+
+# Saúde do worker (probes em segundo plano)
+DEPENDENCY_UP = Gauge(
+    "dependency_up",
+    "Resultado do último probe de cada dependência (1 = ok); o menor entre os workers.",
+    ["dependency"],
+    multiprocess_mode="livemin",
+)
+HEALTH_PROBE_LATENCY = Histogram(
+    "health_probe_latency_seconds",
+    "Duração dos pings de health check nas dependências.",
+    ["dependency"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "Atraso do event loop (média móvel); o maior entre os workers.",
+    multiprocess_mode="livemax",
+)
+HTTP_INFLIGHT = Gauge(
+    "http_requests_inflight",
+    "Requisições HTTP em andamento.",
+    multiprocess_mode="livesum",
+)
+
+# Controle de admissão
+ADMISSION_SHED = Counter(
+    "admission_shed_total",
+    "Requisições rejeitadas com 503 pelo controle de admissão, por motivo.",
+    ["reason"],
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Tempo na fila de admissão das requisições que precisaram esperar.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+ADMISSION_CACHE_BYPASS = Counter(
+    "admission_cache_bypass_total",
+    "Requisições admitidas sob pressão por terem resposta no cache L1.",
+)
+
+# Uso e cotas
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens consumidos nas chamadas ao LLM, por modelo e tipo (prompt/completion).",
+    ["model", "kind"],
+)
+LLM_COST = Counter(
+    "llm_cost_usd_total",
+    "Custo estimado das chamadas ao LLM em USD (pela tabela LLM_PRICING).",
+    ["model"],
+)
+QUOTA_REJECTIONS = Counter(
+    "quota_rejections_total",
+    "Chamadas ao LLM recusadas por cota de uso, por período.",
+    ["period"],
+)
+REDIS_BATCH_COMMANDS = Histogram(
+    "redis_batch_commands",
+    "Comandos Redis enviados por ida ao servidor nos pipelines do batcher.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+HTTP_COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total",
+    "Bytes das respostas comprimidas, antes (original) e depois (compressed).",
+    ["encoding", "kind"],
+)
@@ -0,0 +1,22 @@
+"""Proteção dos endpoints administrativos."""
+
+import secrets
+
+from fastapi import Header, HTTPException
+
+from app.core.config import settings
+
+
+def require_admin_token(x_admin_token: str = Header("", alias="X-Admin-Token")) -> None:
+    """
+    Dependência dos endpoints ``/admin``.
+
+    Sem ``ADMIN_TOKEN`` configurado os endpoints nem aparecem (404); com ele,
+    o header ``X-Admin-Token`` precisa bater (comparação em tempo constante).
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token:
+        raise HTTPException(status_code=401, detail="Header X-Admin-Token ausente")
+    if not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
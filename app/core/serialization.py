@@ -0,0 +1,64 @@
+"""
+Serialização no caminho quente (respostas HTTP, cache e streaming).
+
+Usa ``orjson`` e ``msgpack`` quando instalados (extra "performance") e cai
+para o ``json`` da biblioteca padrão caso contrário, com a mesma interface.
+"""
+
+import json
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependência opcional
+    msgpack = None
+
+# Prefixo dos valores msgpack no Redis; os valores JSON antigos começam com "{"
+MSGPACK_MARKER = b"\x01"
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON compacto em UTF-8."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(
+        obj, default=str, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def pack(obj: Any) -> bytes:
+    """Valor compacto para o Redis: msgpack com marcador ou, sem ele, JSON."""
+    if msgpack is not None:
+        return MSGPACK_MARKER + msgpack.packb(obj, use_bin_type=True, default=str)
+    return dumps(obj)
+
+
+def unpack(data: Union[bytes, str]) -> Any:
+    """Lê valores gravados por ``pack`` e também os JSON de versões anteriores."""
+    if isinstance(data, str):
+        return loads(data)
+    if data[:1] == MSGPACK_MARKER:
+        if msgpack is None:
+            raise ValueError("Valor em msgpack, mas o pacote msgpack não está instalado")
+        return msgpack.unpackb(data[1:], raw=False)
+    return loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` serializada com ``dumps`` (orjson quando disponível)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,48 @@
+"""
+Medição das etapas do caminho quente.
+
+``stage(nome)`` registra a duração do bloco em ``chat_stage_latency_seconds``.
+Com ``OTEL_ENABLED`` e o pacote ``opentelemetry-api`` instalado, o bloco
+também vira um span, e o trace id vai como exemplar no histograma para ligar
+a métrica ao trace. Os spans são exportados pelo SDK configurado no processo
+(ex.: ``opentelemetry-instrument uv run python main.py``).
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+from app.core.config import settings
+from app.core.metrics import STAGE_LATENCY
+
+try:
+    from opentelemetry import trace
+except ImportError:  # pragma: no cover - dependência opcional
+    trace = None
+
+_tracer = (
+    trace.get_tracer("desafio-itau") if trace is not None and settings.OTEL_ENABLED else None
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Mede a duração do bloco como a etapa ``name``."""
+    started_at = time.perf_counter()
+    span_context = _tracer.start_as_current_span(name) if _tracer else nullcontext()
+    with span_context as span:
+        try:
+            yield
+        finally:
+            STAGE_LATENCY.labels(stage=name).observe(
+                time.perf_counter() - started_at, _exemplar(span)
+            )
+
+
+def _exemplar(span) -> Optional[dict]:
+    if span is None:
+        return None
+    context = span.get_span_context()
+    if not context.is_valid:
+        return None
+    return {"trace_id": format(context.trace_id, "032x")}
@@ -0,0 +1,187 @@
+import asyncio
+import collections
+import json
+import time
+from typing import Optional
+
+from loguru import logger
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_CACHE_BYPASS, ADMISSION_QUEUE_WAIT, ADMISSION_SHED
+from app.middleware.body import buffer_body
+from app.services.cache_keys import cache_key
+from app.services.llm_providers import generation_params
+
+
+class AdmissionControlMiddleware:
+    """
+    Controle de admissão do worker: rejeita cedo em vez de acumular latência.
+
+    Até ``ADMISSION_MAX_INFLIGHT`` requisições rodam ao mesmo tempo; as
+    seguintes esperam numa fila FIFO por até ``ADMISSION_MAX_QUEUE_WAIT``.
+    A fila segue a ideia do CoDel: se o tempo de espera fica acima de
+    ``ADMISSION_TARGET_DELAY`` por um ``ADMISSION_INTERVAL`` inteiro, a fila
+    virou "fila em pé" e novas requisições que precisariam esperar são
+    rejeitadas na hora, até uma espera voltar abaixo do alvo. Com o event
+    loop atrasado além de ``ADMISSION_MAX_LOOP_LAG`` também rejeita direto.
+
+    Rejeições são 503 com ``Retry-After``. Rotas isentas (health, métricas)
+    nunca são barradas e, sob pressão, um ``POST /chat`` cuja resposta já
+    está no cache L1 passa na frente: custa quase nada servi-lo.
+    """
+
+    def __init__(self, app: ASGIApp, config=settings):
+        self.app = app
+        self.config = config
+        self.max_inflight = config.ADMISSION_MAX_INFLIGHT
+        self.cache_params = generation_params(config)
+        self.inflight = 0
+        self._waiters: collections.deque = collections.deque()
+        # CoDel: instante em que a espera passou do alvo e se a fila está descartando
+        self._above_target_since: Optional[float] = None
+        self._dropping = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.max_inflight
+            or self._is_exempt(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._overload_reason(scope)
+        if reason is None and self.inflight < self.max_inflight and not self._waiters:
+            await self._run(scope, receive, send)
+            return
+
+        # Sob pressão: respostas do cache L1 não disputam a vaga
+        body, receive = await buffer_body(receive)
+        if self._served_from_cache(scope, body):
+            ADMISSION_CACHE_BYPASS.inc()
+            await self.app(scope, receive, send)
+            return
+
+        if reason is None:
+            reason = await self._wait_for_slot()
+        if reason is not None:
+            ADMISSION_SHED.labels(reason=reason).inc()
+            await self._reject(send, reason)
+            return
+
+        # A vaga já foi transferida por quem liberou (sem passar pelo contador)
+        await self._run(scope, receive, send, acquired=True)
+
+    def _is_exempt(self, path: str) -> bool:
+        return any(
+            path.startswith(prefix) for prefix in self.config.ADMISSION_EXEMPT_PATHS
+        )
+
+    def _overload_reason(self, scope: Scope) -> Optional[str]:
+        health = getattr(getattr(scope["app"].state, "clients", None), "health", None)
+        if health is not None and health.loop_lag > self.config.ADMISSION_MAX_LOOP_LAG:
+            return "loop_lag"
+        return None
+
+    async def _run(
+        self, scope: Scope, receive: Receive, send: Send, acquired: bool = False
+    ) -> None:
+        if not acquired:
+            self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        # Passa a vaga direto para o próximo da fila, em ordem de chegada
+        while self._waiters:
+            enqueued_at, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._update_codel(time.monotonic() - enqueued_at)
+            future.set_result(True)
+            return
+        self.inflight -= 1
+        self._above_target_since = None
+        self._dropping = False
+
+    def _update_codel(self, sojourn: float) -> None:
+        now = time.monotonic()
+        if sojourn < self.config.ADMISSION_TARGET_DELAY:
+            self._above_target_since = None
+            if self._dropping:
+                logger.info("✅ Fila de admissão normalizada")
+            self._dropping = False
+        elif self._above_target_since is None:
+            self._above_target_since = now
+        elif (
+            not self._dropping
+            and now - self._above_target_since >= self.config.ADMISSION_INTERVAL
+        ):
+            self._dropping = True
+            logger.warning(
+                "⚠️ Fila de admissão acima de {}s há {}s, rejeitando novas requisições",
+                self.config.ADMISSION_TARGET_DELAY,
+                self.config.ADMISSION_INTERVAL,
+            )
+
+    async def _wait_for_slot(self) -> Optional[str]:
+        """Espera uma vaga; retorna o motivo da rejeição ou None se admitido."""
+        if self._dropping:
+            return "codel"
+        if len(self._waiters) >= self.config.ADMISSION_MAX_QUEUE:
+            return "queue_full"
+
+        enqueued_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((enqueued_at, future))
+        try:
+            await asyncio.wait_for(future, self.config.ADMISSION_MAX_QUEUE_WAIT)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # A vaga pode ter sido concedida no mesmo ciclo do cancelamento
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            ADMISSION_QUEUE_WAIT.observe(time.monotonic() - enqueued_at)
+        return None
+
+    def _served_from_cache(self, scope: Scope, body: bytes) -> bool:
+        if scope["method"] != "POST" or not scope["path"].endswith("/chat") or not body:
+            return False
+        clients = getattr(scope["app"].state, "clients", None)
+        if clients is None:
+            return False
+        try:
+            request = json.loads(body)
+            prompt = request["prompt"]
+        except (ValueError, KeyError, TypeError):
+            return False
+        # Com contexto a resposta depende da conversa e não vem do cache
+        if request.get("useContext") or not isinstance(prompt, str):
+            return False
+        return clients.local_cache.contains(
+            cache_key(prompt, self.config.OPENAI_MODEL, params=self.cache_params)
+        )
+
+    async def _reject(self, send: Send, reason: str) -> None:
+        retry_after = self.config.ADMISSION_RETRY_AFTER
+        body = json.dumps(
+            {"detail": f"Service overloaded ({reason}), retry in {retry_after} seconds"}
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"retry-after", str(retry_after).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,35 @@
+"""Leitura antecipada do corpo da requisição em middlewares ASGI."""
+
+from typing import Optional, Tuple
+
+from starlette.types import Message, Receive
+
+# Corpo máximo lido antes de a rota consumir a requisição
+MAX_PEEK_BODY = 64 * 1024
+
+
+async def buffer_body(
+    receive: Receive, max_size: int = MAX_PEEK_BODY
+) -> Tuple[Optional[bytes], Receive]:
+    """
+    Lê o corpo (até ``max_size``) e devolve um ``receive`` que o repete.
+
+    Corpo maior que o limite volta como ``None``: não é analisado.
+    """
+    messages = []
+    body = b""
+    more_body = True
+    while more_body and len(body) <= max_size:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+    async def replay() -> Message:
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    return (body if not more_body else None), replay
@@ -0,0 +1,180 @@
+"""Compressão das respostas HTTP (gzip, brotli e zstd) negociada por ``Accept-Encoding``."""
+
+import asyncio
+import gzip
+from typing import Callable, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import HTTP_COMPRESSION_BYTES
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependência opcional
+    zstandard = None
+
+# Corpos a partir deste tamanho são comprimidos fora do event loop
+THREAD_THRESHOLD = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+# Respostas em streaming: cada pedaço precisa sair assim que fica pronto
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def available_encoders(config=settings) -> Dict[str, Callable[[bytes], bytes]]:
+    """Compressores instalados, na ordem de preferência de ``COMPRESSION_ALGORITHMS``."""
+    encoders = {
+        "gzip": lambda body: gzip.compress(
+            body, compresslevel=config.COMPRESSION_GZIP_LEVEL, mtime=0
+        ),
+    }
+    if brotli is not None:
+        encoders["br"] = lambda body: brotli.compress(
+            body, quality=config.COMPRESSION_BROTLI_QUALITY
+        )
+    if zstandard is not None:
+        # Um compressor por chamada: o objeto não pode ser usado por duas threads
+        encoders["zstd"] = lambda body: zstandard.ZstdCompressor(
+            level=config.COMPRESSION_ZSTD_LEVEL
+        ).compress(body)
+    return {
+        name: encoders[name] for name in config.COMPRESSION_ALGORITHMS if name in encoders
+    }
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """Codificações aceitas pelo cliente com o peso ``q`` de cada uma."""
+    accepted = {}
+    for item in value.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        accepted[name.strip().lower()] = weight
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Comprime respostas completas a partir de ``COMPRESSION_MIN_SIZE`` bytes.
+
+    A codificação é a primeira de ``COMPRESSION_ALGORITHMS`` (com as
+    dependências instaladas) que o cliente aceita; com pesos ``q`` iguais
+    vale a ordem configurada. A decisão começa nos headers: SSE, NDJSON,
+    respostas que já têm ``Content-Encoding``, tipos que não comprimem bem e
+    ``Content-Length`` abaixo do mínimo passam direto, sem segurar o início
+    da resposta. As demais esperam o primeiro pedaço do corpo, e só são
+    comprimidas se ele for o único.
+    """
+
+    def __init__(self, app: ASGIApp, config=settings):
+        self.app = app
+        self.min_size = config.COMPRESSION_MIN_SIZE
+        self.encoders = available_encoders(config) if config.COMPRESSION_ENABLED else {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = self._negotiate(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if not self._compressible_start(message):
+                    # Streams, corpos já codificados ou pequenos saem na hora
+                    passthrough = True
+                    await send(message)
+                    return
+                # Segura o início até saber se o corpo será comprimido
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            passthrough = True
+            body = message.get("body", b"")
+            if message.get("more_body") or len(body) < self.min_size:
+                await send(start)
+                await send(message)
+                return
+
+            compressed = await self._compress(encoding, body)
+            if len(compressed) >= len(body):
+                await send(start)
+                await send(message)
+                return
+
+            HTTP_COMPRESSION_BYTES.labels(encoding=encoding, kind="original").inc(len(body))
+            HTTP_COMPRESSION_BYTES.labels(encoding=encoding, kind="compressed").inc(
+                len(compressed)
+            )
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _negotiate(self, scope: Scope) -> Optional[str]:
+        if not self.encoders:
+            return None
+        accepted = parse_accept_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not accepted:
+            return None
+        wildcard = accepted.get("*", 0.0)
+        best, best_weight = None, 0.0
+        for name in self.encoders:
+            weight = accepted.get(name, wildcard)
+            if weight > best_weight:
+                best, best_weight = name, weight
+        return best
+
+    def _compressible_start(self, start: Message) -> bool:
+        """Se os headers permitem comprimir (o tamanho do corpo é visto depois)."""
+        headers = Headers(raw=start["headers"])
+        if "content-encoding" in headers:
+            return False
+        content_length = headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) < self.min_size:
+            return False
+        content_type = headers.get("content-type", "")
+        if content_type.startswith(STREAMING_TYPES):
+            return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def _compress(self, encoding: str, body: bytes) -> bytes:
+        encoder = self.encoders[encoding]
+        if len(body) >= THREAD_THRESHOLD:
+            return await asyncio.to_thread(encoder, body)
+        return encoder(body)
@@ -0,0 +1,32 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.services.llm_dispatcher import set_deadline
+
+
+class DeadlineMiddleware:
+    """
+    Propaga o prazo do cliente para as chamadas ao LLM.
+
+    Lê ``REQUEST_TIMEOUT_HEADER`` (segundos) e grava o prazo num ContextVar
+    que o ``LLMDispatcher`` consulta: se a requisição ainda estiver na fila
+    quando o prazo acabar, a chamada ao provedor nem é feita.
+    """
+
+    def __init__(self, app: ASGIApp, config=settings):
+        self.app = app
+        self.header = config.REQUEST_TIMEOUT_HEADER.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == self.header:
+                    try:
+                        timeout = float(value)
+                    except ValueError:
+                        break
+                    if timeout > 0:
+                        set_deadline(timeout)
+                    break
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,33 @@
+"""Contagem de requisições HTTP em andamento no worker."""
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.metrics import HTTP_INFLIGHT
+
+_inflight = 0
+
+
+def inflight_requests() -> int:
+    """Requisições HTTP em andamento neste worker (inclui streams abertos)."""
+    return _inflight
+
+
+class InFlightMiddleware:
+    """Mantém ``inflight_requests()`` e o gauge ``http_requests_inflight``."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _inflight
+        _inflight += 1
+        HTTP_INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _inflight -= 1
+            HTTP_INFLIGHT.dec()
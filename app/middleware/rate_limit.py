@@ -1,49 +1,297 @@
+import json
+import math
 import time
-from fastapi import HTTPException
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
 
 from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app.services.cache_service import CacheService
+from app.core.config import RateLimitBackend, settings
+from app.middleware.body import buffer_body
+
+# GCRA (Generic Cell Rate Algorithm) numa única ida ao Redis. Guarda apenas o
+# "theoretical arrival time" (TAT) por chave e usa o relógio do próprio Redis,
+# então é atômico entre workers e não depende do relógio de cada processo.
+GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local emission = period / limit
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission * cost
+local diff = now - (new_tat - period)
+if diff < 0 then
+    return {0, 0, tostring(-diff), tostring(tat - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, math.floor(diff / emission), '0', tostring(new_tat - now)}
+"""
+
+
+class RateLimitDecision(NamedTuple):
+    """Resultado de uma verificação de rate limit."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+    reset_after: float
+
+
+class LocalTokenBucket:
+    """
+    Rate limit em memória do processo (token bucket).
+
+    Cada chave tem um balde com ``limit`` fichas que reabastece a
+    ``limit / window`` fichas por segundo. Os baldes ficam num LRU limitado a
+    ``max_keys`` para não crescer sem controle. Os limites valem por worker.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+
+    async def hit(
+        self, key: str, limit: int, window: int, cost: int = 1
+    ) -> RateLimitDecision:
+        return self.hit_sync(key, limit, window, cost)
+
+    def hit_sync(
+        self, key: str, limit: int, window: int, cost: int = 1
+    ) -> RateLimitDecision:
+        now = time.monotonic()
+        rate = limit / window
+        tokens, updated_at = self._buckets.get(key, (float(limit), now))
+        tokens = min(float(limit), tokens + (now - updated_at) * rate)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        retry_after = 0.0 if allowed else (cost - tokens) / rate
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=limit,
+            remaining=int(tokens),
+            retry_after=retry_after,
+            reset_after=(limit - tokens) / rate,
+        )
+
+
+class RedisGCRALimiter:
+    """Rate limit compartilhado entre workers via script Lua (GCRA) no Redis."""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        # register_script usa EVALSHA e recarrega o script se o Redis não o tiver
+        self._script = redis_client.register_script(GCRA_SCRIPT)
+
+    async def hit(
+        self, key: str, limit: int, window: int, cost: int = 1
+    ) -> RateLimitDecision:
+        allowed, remaining, retry_after, reset_after = await self._script(
+            keys=[key], args=[limit, window, cost]
+        )
+        return RateLimitDecision(
+            allowed=bool(int(allowed)),
+            limit=limit,
+            remaining=int(remaining),
+            retry_after=float(retry_after),
+            reset_after=float(reset_after),
+        )
+
+
+def parse_rule(rule: str) -> Tuple[str, str]:
+    """Converte ``"MÉTODO /prefixo"`` (ou só ``"/prefixo"``) em ``(método, prefixo)``."""
+    method, _, prefix = rule.strip().rpartition(" ")
+    return (method.upper() or "*"), prefix
+
+
+def parse_limit(value: str) -> Tuple[int, int]:
+    """Converte ``"<requisições>/<segundos>"`` em ``(limit, window)``."""
+    requests, _, window = value.partition("/")
+    return int(requests), int(window or 60)
 
 
 class RateLimitMiddleware:
-    """Middleware para rate limiting usando Redis."""
+    """
+    Middleware ASGI de rate limiting por usuário e por rota.
 
-    def __init__(self, cache_service: CacheService):
-        self.cache = cache_service
+    O cliente é identificado pelo IP. O header ``RATE_LIMIT_USER_HEADER`` só
+    é usado com ``RATE_LIMIT_TRUST_USER_HEADER`` ligado, quando um gateway
+    autenticado o preenche: sem isso qualquer cliente escolheria a própria
+    chave (e os limites de ``RATE_LIMIT_USER_OVERRIDES`` de outro usuário).
+    Cada regra de ``RATE_LIMIT_RULES`` (``"MÉTODO /prefixo"``) tem seu
+    próprio limite; as rotas de ``RATE_LIMIT_DEFAULT_PATHS`` (as que chamam o
+    LLM) sem regra usam ``RATE_LIMIT_REQUESTS`` por ``RATE_LIMIT_WINDOW``, e
+    as demais não são limitadas. ``RATE_LIMIT_USER_OVERRIDES`` define limites
+    por usuário (ou IP). Nas rotas de ``RATE_LIMIT_BATCH_PATHS`` cada prompt
+    do lote conta como uma requisição (no máximo o limite inteiro). O backend
+    vem de ``RATE_LIMIT_BACKEND``: com Redis a decisão é
+    um único EVALSHA; se o Redis falhar, o balde local assume.
+    """
 
-    async def check_rate_limit(
-        self, user_id: str, endpoint: str, max_requests: int = 10, window: int = 60
-    ):
-        """Verifica se usuário excedeu rate limit."""
-        try:
-            current_time = int(time.time())
-            window_start = current_time - window
+    def __init__(self, app: ASGIApp, config=settings):
+        self.app = app
+        self.config = config
+        self.default_limit = (config.RATE_LIMIT_REQUESTS, config.RATE_LIMIT_WINDOW)
+        self.rules = sorted(
+            (
+                (*parse_rule(rule), parse_limit(limit))
+                for rule, limit in config.RATE_LIMIT_RULES.items()
+            ),
+            key=lambda rule: len(rule[1]),
+            reverse=True,
+        )
+        self.user_overrides: Dict[str, Tuple[int, int]] = {
+            user_id: parse_limit(limit)
+            for user_id, limit in config.RATE_LIMIT_USER_OVERRIDES.items()
+        }
+        self.default_paths = [parse_rule(rule) for rule in config.RATE_LIMIT_DEFAULT_PATHS]
+        self.batch_paths = [parse_rule(rule) for rule in config.RATE_LIMIT_BATCH_PATHS]
+        self.user_header = (
+            config.RATE_LIMIT_USER_HEADER.lower().encode()
+            if config.RATE_LIMIT_TRUST_USER_HEADER
+            else None
+        )
+        self.local = LocalTokenBucket(config.RATE_LIMIT_LOCAL_MAX_KEYS)
+        self._redis_limiter: Optional[RedisGCRALimiter] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or self._is_exempt(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        match = self._match_rule(scope["method"], scope["path"])
+        if match is None:
+            await self.app(scope, receive, send)
+            return
+
+        route, (limit, window) = match
+        user_id = self._identify(scope)
+        limit, window = self.user_overrides.get(user_id, (limit, window))
 
-            rate_key = f"rate_limit:{user_id}:{endpoint}"
+        cost = 1
+        if self._matches(self.batch_paths, scope["method"], scope["path"]):
+            body, receive = await buffer_body(receive)
+            cost = min(self._batch_size(body), limit)
 
-            # Remove requests antigas
-            await self.cache.redis_client.zremrangebyscore(rate_key, 0, window_start)
+        decision = await self._hit(
+            scope, f"rate_limit:{user_id}:{route}", limit, window, cost
+        )
+        headers = self._headers(decision)
+
+        if not decision.allowed:
+            await self._reject(send, decision, headers)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _is_exempt(self, path: str) -> bool:
+        return any(
+            path.startswith(prefix) for prefix in self.config.RATE_LIMIT_EXEMPT_PATHS
+        )
+
+    def _match_rule(
+        self, method: str, path: str
+    ) -> Optional[Tuple[str, Tuple[int, int]]]:
+        for rule_method, prefix, limit in self.rules:
+            if rule_method in (method, "*") and path.startswith(prefix):
+                return f"{rule_method}:{prefix}", limit
+        if self._matches(self.default_paths, method, path):
+            return "default", self.default_limit
+        return None
+
+    @staticmethod
+    def _matches(rules, method: str, path: str) -> bool:
+        return any(
+            rule_method in (method, "*") and path.startswith(prefix)
+            for rule_method, prefix in rules
+        )
+
+    def _batch_size(self, body: Optional[bytes]) -> int:
+        """Prompts no corpo do lote; corpo grande demais conta como lote cheio."""
+        if body is None:
+            return self.config.CHAT_BATCH_MAX_SIZE
+        try:
+            prompts = json.loads(body)["prompts"]
+        except (ValueError, KeyError, TypeError):
+            # Corpo inválido: a rota responde 422 sem chamar o LLM
+            return 1
+        return max(len(prompts), 1) if isinstance(prompts, list) else 1
 
-            # Conta requests na janela atual
-            current_requests = await self.cache.redis_client.zcard(rate_key)
+    def _identify(self, scope: Scope) -> str:
+        if self.user_header is not None:
+            for name, value in scope.get("headers", []):
+                if name == self.user_header and value:
+                    return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "anonymous"
 
-            if current_requests >= max_requests:
-                raise HTTPException(
-                    status_code=429,
-                    detail=f"Rate limit exceeded. Max {max_requests} requests per {window} seconds",
+    async def _hit(
+        self, scope: Scope, key: str, limit: int, window: int, cost: int = 1
+    ) -> RateLimitDecision:
+        if self.config.RATE_LIMIT_BACKEND == RateLimitBackend.REDIS:
+            try:
+                return await self._get_redis_limiter(scope).hit(
+                    key, limit, window, cost
                 )
+            except Exception as e:
+                logger.error(f"Erro no rate limiting: {str(e)}")
+        return self.local.hit_sync(key, limit, window, cost)
 
-            # Adiciona request atual
-            await self.cache.redis_client.zadd(
-                rate_key, {str(current_time): current_time}
-            )
-            await self.cache.redis_client.expire(rate_key, window)
+    def _get_redis_limiter(self, scope: Scope) -> RedisGCRALimiter:
+        if self._redis_limiter is None:
+            # O pool do Redis é criado no lifespan (ClientRegistry)
+            self._redis_limiter = RedisGCRALimiter(scope["app"].state.clients.redis)
+        return self._redis_limiter
 
-            return True
+    @staticmethod
+    def _headers(decision: RateLimitDecision) -> list:
+        return [
+            (b"x-ratelimit-limit", str(decision.limit).encode()),
+            (b"x-ratelimit-remaining", str(max(decision.remaining, 0)).encode()),
+            (b"x-ratelimit-reset", str(math.ceil(decision.reset_after)).encode()),
+        ]
 
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Erro no rate limiting: {str(e)}")
-            return True  # Em caso de erro, permite a request
+    @staticmethod
+    async def _reject(send: Send, decision: RateLimitDecision, headers: list) -> None:
+        retry_after = max(math.ceil(decision.retry_after), 1)
+        body = json.dumps(
+            {
+                "detail": f"Rate limit exceeded. Max {decision.limit} requests, "
+                f"retry in {retry_after} seconds"
+            }
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers
+                + [
+                    (b"retry-after", str(retry_after).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -2,10 +2,14 @@
 
 from fastapi import APIRouter
 
+from .admin import router as admin_router
 from .chat.controller import router as chat_router
+from .health import router as health_router
 
 # Define and configure versioned API routers
 v1_routers = APIRouter()
 v1_routers.include_router(chat_router, tags=["Chat"])
+v1_routers.include_router(health_router, tags=["Health"])
+v1_routers.include_router(admin_router, tags=["Admin"])
 
 __all__ = ["v1_routers"]
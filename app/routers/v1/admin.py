@@ -0,0 +1,58 @@
+"""Endpoints administrativos (protegidos por ``X-Admin-Token``)."""
+
+import asyncio
+import threading
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.clients import ClientRegistry, get_clients
+from app.core.config import settings
+from app.core.security import require_admin_token
+from app.services.cache_service import CacheService
+from app.services.profiler import ProfilerBusy, SamplingProfiler
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0),
+    interval: float = Query(0.005, ge=0.001, le=1.0),
+):
+    """
+    Amostra o event loop deste worker por ``seconds`` segundos.
+
+    Devolve collapsed stacks (``flamegraph.pl`` ou speedscope geram o
+    flamegraph). Com vários workers, cada chamada perfila só o worker que a
+    atendeu.
+    """
+    # O handler roda na thread do event loop: é ela que será amostrada
+    profiler = SamplingProfiler(threading.get_ident(), interval)
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    try:
+        output = await asyncio.to_thread(profiler.run, seconds)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="Profiling já em andamento")
+    return PlainTextResponse(output)
+
+
+@router.delete("/cache")
+async def invalidate_cache(
+    model: Optional[str] = Query(None),
+    userId: Optional[str] = Query(None),
+    clients: ClientRegistry = Depends(get_clients),
+):
+    """Remove do cache as respostas de um modelo e/ou de um usuário."""
+    if not model and not userId:
+        raise HTTPException(status_code=400, detail="Informe model e/ou userId")
+    cache = CacheService(clients.redis, local_cache=clients.local_cache)
+    removed = {}
+    if model:
+        removed["model"] = await cache.invalidate_model(model)
+        if clients.semantic_cache is not None:
+            removed["semantic"] = await clients.semantic_cache.invalidate(model)
+    if userId:
+        removed["user"] = await cache.invalidate_user(userId)
+    return {"removed": removed}
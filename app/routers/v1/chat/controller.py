@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, Request
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from fastapi_utils.cbv import cbv
+from starlette.background import BackgroundTask
 import uuid
 from datetime import datetime
 
-from .models import ChatRequest, ChatResponse
-from .service import ChatService
+from app.core.config import settings
+from app.core.serialization import FastJSONResponse
+from app.core.tracing import stage
+from app.services.db_service import CHAT_FIELDS
+from app.services.quota_service import QuotaExceeded
+
+from .models import BatchChatRequest, ChatRequest, ChatResponse, StreamFormat
+from .service import ChatService, build_chat_record, get_chat_service
+from .streaming import MEDIA_TYPES, STREAM_HEADERS, encode_event
 
 router = APIRouter()
 
@@ -19,39 +29,181 @@ def common_dependency():
 class ChatRoute:
     """Chat-related routes."""
 
-    def __init__(self, common_dep=Depends(common_dependency)):
+    def __init__(
+        self,
+        common_dep=Depends(common_dependency),
+        service: ChatService = Depends(get_chat_service),
+    ):
         self.common_dep = common_dep
-        self.service = ChatService()
+        self.service = service
 
     @router.post("/chat", response_model=ChatResponse)
     async def chat_endpoint(self, request: Request, chat_request: ChatRequest):
         # Gera ID e timestamp
         chat_id = str(uuid.uuid4())
         now = datetime.now()
+
+        if chat_request.stream:
+            return await self._stream_chat(chat_request, chat_id, now)
+
         # Chama LLM (OpenAI)
         llm_response = await self.service.chat_service(chat_request)
-        chat_response = ChatResponse(
-            id=chat_id,
-            userId=chat_request.userId,
-            prompt=chat_request.prompt,
-            response=llm_response.get("content", ""),
-            model=llm_response.get("model", ""),
-            timestamp=now.isoformat(),
+        if llm_response.get("quota_exceeded"):
+            raise HTTPException(
+                status_code=429,
+                detail=llm_response["content"],
+                headers={"Retry-After": str(llm_response["retry_after"])},
+            )
+        chat_data = build_chat_record(
+            chat_id, chat_request, llm_response, now.isoformat()
         )
 
+        # Serializa antes de enfileirar: o insert no MongoDB acrescenta "_id"
+        # ao dict. Devolver um Response evita a revalidação do response_model
+        with stage("serialize"):
+            response = FastJSONResponse(chat_data)
+
         # Salvar no MongoDB
-        chat_data = chat_response.model_dump()
         await self.service.save_chat(chat_data)
 
         # Retorna resposta
-        return chat_response
+        return response
+
+    async def _stream_chat(
+        self, chat_request: ChatRequest, chat_id: str, now: datetime
+    ) -> StreamingResponse:
+        """Repassa os tokens do LLM conforme chegam (SSE ou NDJSON)."""
+        try:
+            events = await self.service.chat_stream_service(chat_request)
+        except QuotaExceeded as e:
+            # Antes do StreamingResponse: o cliente recebe o mesmo 429 do /chat
+            raise HTTPException(
+                status_code=429,
+                detail=f"Cota de uso {e.period} excedida.",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        result = {}
+
+        async def event_stream():
+            async for event in events:
+                if event["type"] == "done":
+                    result.update(event, id=chat_id, timestamp=now.isoformat())
+                    event = {
+                        "type": "done",
+                        "id": chat_id,
+                        "userId": chat_request.userId,
+                        "model": event.get("model", ""),
+                        "timestamp": now.isoformat(),
+                        "from_cache": event.get("from_cache", False),
+                        "circuit_open": event.get("circuit_open", False),
+                    }
+                yield encode_event(event, chat_request.stream)
+
+        async def persist():
+            # Só persiste streams concluídos; se o cliente desconectou antes
+            # do evento final, a resposta parcial é descartada
+            if result:
+                await self.service.finish_stream(chat_request, result)
+
+        return StreamingResponse(
+            event_stream(),
+            media_type=MEDIA_TYPES[chat_request.stream],
+            headers=STREAM_HEADERS,
+            background=BackgroundTask(persist),
+        )
+
+    @router.post("/chat/batch")
+    async def chat_batch_endpoint(self, batch_request: BatchChatRequest):
+        """
+        Vários prompts numa requisição, com resultados em NDJSON.
+
+        Cada linha é um chat (como em ``POST /chat``) com ``index`` (posição
+        do prompt) e ``from_cache``. Os chats são salvos de uma vez quando o
+        stream termina.
+        """
+        timestamp = datetime.now().isoformat()
+        records = []
+
+        async def results():
+            async for index, llm_response in self.service.chat_batch_service(
+                batch_request
+            ):
+                chat_request = ChatRequest.model_construct(
+                    userId=batch_request.userId,
+                    prompt=batch_request.prompts[index],
+                    useContext=False,
+                )
+                record = build_chat_record(
+                    str(uuid.uuid4()), chat_request, llm_response, timestamp
+                )
+                # Serializa antes de guardar: o insert acrescenta "_id" ao dict
+                line = encode_event(
+                    {
+                        "index": index,
+                        **record,
+                        "from_cache": llm_response.get("from_cache", False),
+                        "error": bool(
+                            llm_response.get("error") or llm_response.get("circuit_open")
+                        ),
+                    },
+                    StreamFormat.NDJSON,
+                )
+                records.append(record)
+                yield line
+
+        async def persist():
+            await self.service.save_chats(records)
+
+        return StreamingResponse(
+            results(),
+            media_type=MEDIA_TYPES[StreamFormat.NDJSON],
+            headers=STREAM_HEADERS,
+            background=BackgroundTask(persist),
+        )
 
     @router.get("/health")
     async def health_check(self):
         return {"status": "ok"}
 
     @router.get("/chats/{user_id}", response_model=list[ChatResponse])
-    async def get_user_chats(self, user_id: str):
-        """Get all chats for a specific user."""
-        chats = await self.service.db_service.get_chats_by_user(user_id)
-        return chats
+    async def get_user_chats(
+        self,
+        user_id: str,
+        limit: int = Query(
+            settings.CHAT_HISTORY_PAGE_SIZE,
+            ge=1,
+            le=settings.CHAT_HISTORY_MAX_PAGE_SIZE,
+        ),
+        before: Optional[str] = Query(
+            None, description="Cursor da página anterior (header X-Next-Cursor)"
+        ),
+    ):
+        """Get a page of chats for a specific user, newest first."""
+        try:
+            chats, next_cursor = await self.service.get_user_chats(
+                user_id, limit, before
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return FastJSONResponse(chats, headers=headers)
+
+    @router.get("/chats/{user_id}/export")
+    async def export_user_chats(
+        self,
+        user_id: str,
+        fields: Optional[str] = Query(
+            None, description="Campos separados por vírgula (padrão: todos)"
+        ),
+    ):
+        """Stream the full chat history of a user as NDJSON."""
+        selected = [field for field in (fields or "").split(",") if field] or None
+        if selected and not set(selected) <= set(CHAT_FIELDS):
+            raise HTTPException(
+                status_code=400, detail=f"Campos válidos: {', '.join(CHAT_FIELDS)}"
+            )
+        return StreamingResponse(
+            self.service.export_user_chats(user_id, selected),
+            media_type="application/x-ndjson",
+        )
@@ -1,11 +1,34 @@
 """Request module for chat streaming API."""
 
+import enum
+from typing import Annotated, List, Optional
+
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
+
+
+class StreamFormat(str, enum.Enum):
+    """Formatos suportados para respostas em streaming."""
+
+    SSE = "sse"
+    NDJSON = "ndjson"
+
 
 class ChatRequest(BaseModel):
     userId: str = Field(..., min_length=1)
     prompt: str = Field(..., min_length=1)
+    stream: Optional[StreamFormat] = None
+    useContext: bool = False
+
+
+class BatchChatRequest(BaseModel):
+    userId: str = Field(..., min_length=1)
+    prompts: List[Annotated[str, Field(min_length=1)]] = Field(
+        ..., min_length=1, max_length=settings.CHAT_BATCH_MAX_SIZE
+    )
+    # False: cada resultado sai assim que fica pronto (campo "index" indica o prompt)
+    ordered: bool = True
 
 
 class ChatResponse(BaseModel):
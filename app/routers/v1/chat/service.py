@@ -1,21 +1,195 @@
-from .models import ChatRequest, ChatResponse
+import base64
+import json
+from contextlib import nullcontext
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import Depends
+
+from .models import BatchChatRequest, ChatRequest
+from app.core.clients import ClientRegistry, get_llm_clients
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.core.tracing import stage
+from app.services.cache_service import CacheService
 from app.services.llm_service import OpenAIClient
 from app.services.db_service import MongoDBService
+from app.services.session_service import SessionService
 
 
 class ChatService:
     """Service for chat API."""
 
-    def __init__(self):
-        """Initialize the chat service."""
-        self.db_service = MongoDBService()
+    def __init__(self, clients: ClientRegistry):
+        """Initialize the chat service with the process-wide clients."""
+        self.db_service = MongoDBService(client=clients.mongo)
+        self.batcher = clients.redis_batcher
+        self.session_service = SessionService(clients.redis, batcher=self.batcher)
+        self.write_queue = clients.write_queue
+        self.llm_client = OpenAIClient(
+            client=clients.openai,
+            cache=CacheService(
+                clients.redis, local_cache=clients.local_cache, batcher=self.batcher
+            ),
+            circuit_breaker=clients.circuit_breaker("openai_api"),
+            single_flight=clients.single_flight,
+            dispatcher=clients.llm_dispatcher,
+            semantic_cache=clients.semantic_cache,
+            router=clients.llm_router,
+            quota=clients.quota,
+        )
+
+    def _redis_scope(self):
+        """Escritas no Redis da requisição (cache, contexto, resumo) num só pipeline."""
+        return self.batcher.scope() if self.batcher is not None else nullcontext()
 
     async def chat_service(self, chat_request: ChatRequest) -> dict:
         """Chat service."""
-        client = OpenAIClient()
-        response = await client.get_chat_completions(chat_request.prompt)
+        async with self._redis_scope():
+            history = await self._load_context(chat_request)
+            response = await self.llm_client.get_chat_completions(
+                chat_request.prompt, history=history, account=chat_request.userId
+            )
+            await self._save_context(chat_request, response)
         return response
 
+    async def chat_stream_service(
+        self, chat_request: ChatRequest
+    ) -> AsyncIterator[dict]:
+        """
+        Chat service em streaming (eventos de token e resultado final).
+
+        Contexto, cache e cota são resolvidos antes de devolver os eventos:
+        ``QuotaExceeded`` chega ao controller antes da resposta começar.
+        """
+        history = await self._load_context(chat_request)
+        return await self.llm_client.stream_chat_completions(
+            chat_request.prompt, history=history, account=chat_request.userId
+        )
+
+    async def finish_stream(self, chat_request: ChatRequest, result: dict) -> None:
+        """Preenche o cache e salva o chat após o término de um stream."""
+        response = {
+            "content": result.get("content", ""),
+            "model": result.get("model", ""),
+            "from_cache": False,
+            "circuit_open": False,
+        }
+        async with self._redis_scope():
+            if result.get("cacheable"):
+                await self.llm_client.cache_completion(chat_request.prompt, response)
+            await self._save_context(chat_request, result)
+
+        await self.save_chat(
+            build_chat_record(result["id"], chat_request, response, result["timestamp"])
+        )
+
+    async def chat_batch_service(
+        self, batch_request: BatchChatRequest
+    ) -> AsyncIterator[Tuple[int, dict]]:
+        """Respostas do LLM para cada prompt do lote, como ``(índice, resposta)``."""
+        async for index, response in self.llm_client.batch_completions(
+            batch_request.prompts,
+            concurrency=settings.CHAT_BATCH_CONCURRENCY,
+            ordered=batch_request.ordered,
+            account=batch_request.userId,
+        ):
+            yield index, response
+
+    async def _load_context(self, chat_request: ChatRequest) -> list:
+        """Histórico recente da conversa que cabe no orçamento de tokens."""
+        if not chat_request.useContext:
+            return []
+        with stage("context_load"):
+            return await self.session_service.build_context(chat_request.userId)
+
+    async def _save_context(self, chat_request: ChatRequest, response: dict) -> None:
+        """Acrescenta a pergunta e a resposta ao histórico da conversa."""
+        if not chat_request.useContext:
+            return
+        if response.get("circuit_open") or response.get("error"):
+            return
+        with stage("context_save"):
+            await self.session_service.append_turns(
+                chat_request.userId,
+                [
+                    {"role": "user", "content": chat_request.prompt},
+                    {"role": "assistant", "content": response.get("content", "")},
+                ],
+            )
+
+    async def get_user_chats(
+        self, user_id: str, limit: int, before: Optional[str] = None
+    ) -> Tuple[list, Optional[str]]:
+        """Página do histórico do usuário e o cursor da próxima página."""
+        chats = await self.db_service.get_chats_by_user(
+            user_id, limit=limit, before=decode_cursor(before) if before else None
+        )
+        next_cursor = encode_cursor(chats[-1]) if len(chats) == limit else None
+        return chats, next_cursor
+
+    async def export_user_chats(
+        self, user_id: str, fields: Optional[List[str]] = None
+    ) -> AsyncIterator[bytes]:
+        """Histórico completo do usuário em NDJSON, lido do cursor em lotes."""
+        async for chat in self.db_service.iter_chats_by_user(
+            user_id, batch_size=settings.CHAT_EXPORT_BATCH_SIZE, fields=fields
+        ):
+            yield dumps(chat) + b"\n"
+
+    async def save_chats(self, chats: List[dict]) -> bool:
+        """Salva vários chats: pela fila write-behind ou num único insert_many."""
+        if not chats:
+            return True
+        if self.write_queue is not None:
+            with stage("db_enqueue"):
+                results = [await self.write_queue.enqueue(chat) for chat in chats]
+            return all(results)
+        return await self.db_service.save_chat_interactions(chats)
+
     async def save_chat(self, chat_data: dict) -> bool:
-        """Save chat to database."""
+        """Save chat to database (enfileira na fila write-behind quando ativa)."""
+        if self.write_queue is not None:
+            with stage("db_enqueue"):
+                return await self.write_queue.enqueue(chat_data)
         return await self.db_service.save_chat_interaction(chat_data)
+
+
+def build_chat_record(
+    chat_id: str, chat_request: ChatRequest, llm_response: dict, timestamp: str
+) -> dict:
+    """
+    Documento do chat no formato de ``ChatResponse``.
+
+    Montado direto como dict: os campos já vêm tipados do request validado e
+    do LLM, então validar de novo num modelo Pydantic só custaria tempo. O
+    mesmo dict vira a resposta HTTP e o documento do MongoDB.
+    """
+    return {
+        "id": chat_id,
+        "userId": chat_request.userId,
+        "prompt": chat_request.prompt,
+        "response": llm_response.get("content") or "",
+        "model": llm_response.get("model") or "",
+        "timestamp": timestamp,
+    }
+
+
+def encode_cursor(chat: dict) -> str:
+    """Cursor opaco de paginação a partir do último chat da página."""
+    raw = json.dumps([chat["timestamp"], chat["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decodifica o cursor de paginação (ValueError se inválido)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, chat_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(timestamp), str(chat_id)
+    except Exception as e:
+        raise ValueError("Cursor de paginação inválido") from e
+
+
+def get_chat_service(clients: ClientRegistry = Depends(get_llm_clients)) -> ChatService:
+    """Dependência FastAPI que monta o ChatService sobre os clientes compartilhados."""
+    return ChatService(clients)
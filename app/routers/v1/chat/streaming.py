@@ -0,0 +1,21 @@
+"""Codificação dos eventos de streaming do chat (SSE e NDJSON)."""
+
+from app.core.serialization import dumps
+
+from .models import StreamFormat
+
+MEDIA_TYPES = {
+    StreamFormat.SSE: "text/event-stream",
+    StreamFormat.NDJSON: "application/x-ndjson",
+}
+
+# Evita que proxies (nginx) segurem os chunks em buffer
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def encode_event(event: dict, stream_format: StreamFormat) -> bytes:
+    """Serializa um evento no formato de streaming escolhido."""
+    if stream_format == StreamFormat.SSE:
+        payload = {key: value for key, value in event.items() if key != "type"}
+        return b"event: %s\ndata: %s\n\n" % (event["type"].encode(), dumps(payload))
+    return dumps(event) + b"\n"
@@ -0,0 +1,32 @@
+"""Probes de liveness e readiness do worker."""
+
+from fastapi import APIRouter, Request
+
+from app.core.serialization import FastJSONResponse
+
+router = APIRouter()
+
+
+@router.get("/livez")
+async def livez(request: Request):
+    """
+    O processo está de pé e o event loop responde.
+
+    Não olha as dependências: um Redis fora do ar não deve reiniciar o
+    worker. Responde 503 só se os probes de background pararam de rodar.
+    """
+    health = request.app.state.clients.health
+    return FastJSONResponse(health.liveness(), status_code=503 if health.stale else 200)
+
+
+@router.get("/readyz")
+async def readyz(request: Request):
+    """
+    Pronto para tráfego, segundo o último probe em cache (custo constante).
+
+    503 enquanto o aquecimento não terminou, se Redis ou MongoDB não
+    respondem, se a fila write-behind ou algum pool está quase cheio ou se o
+    event loop está atrasado.
+    """
+    health = request.app.state.clients.health
+    return FastJSONResponse(health.readiness(), status_code=200 if health.ready else 503)
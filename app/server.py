@@ -3,25 +3,21 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
 
-from loki_logger_handler.loki_logger_handler import LokiLoggerHandler
-from loki_logger_handler.formatters.loguru_formatter import LoguruFormatter
-from loguru import logger
-
 from app.core.lifespan import lifespan
+from app.core.logging import configure_logging
+from app.core.serialization import FastJSONResponse
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.metrics import InFlightMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
 from app.routers import api_routers
 from app.core.config import settings
 
 
 def configure_logs(app: FastAPI) -> None:
-    custom_handler = LokiLoggerHandler(
-        url=settings.LOKI_URL,
-        labels={"application": "Test", "environment": "Develop"},
-        label_keys={},
-        timeout=10,
-        default_formatter=LoguruFormatter(),
-    )
-
-    logger.configure(handlers=[{"sink": custom_handler, "serialize": True}])
+    """Configure log sinks (Loki em lote fora do event loop)."""
+    configure_logging(settings)
 
 
 def configure_routes(app: FastAPI) -> None:
@@ -51,9 +47,15 @@ def build_app():
                 allow_credentials=True,
                 allow_methods=["*"],
                 allow_headers=["*"],
-            )
+            ),
+            Middleware(CompressionMiddleware),
+            Middleware(InFlightMiddleware),
+            Middleware(AdmissionControlMiddleware),
+            Middleware(RateLimitMiddleware),
+            Middleware(DeadlineMiddleware),
         ],
         lifespan=lifespan,
+        default_response_class=FastJSONResponse,
     )
 
     configure_routes(app)
@@ -0,0 +1,96 @@
+"""
+Chaves do cache de respostas do LLM e os índices secundários do Redis.
+
+O prompt é canonicalizado (Unicode NFKC e espaços colapsados) antes do hash,
+então variações só de forma caem na mesma entrada. O hash é ``xxh3_128``
+quando o ``xxhash`` está instalado (extra "performance") e ``blake2b`` de
+128 bits caso contrário; nenhum dos dois precisa ser criptográfico aqui.
+
+A chave inclui o modelo, a impressão digital dos parâmetros de geração (o
+provedor que responde, o modelo dele e limites como ``max_tokens``) e o
+escopo (global ou um usuário): mudar um parâmetro troca as chaves. Cada chave gravada entra nos índices
+``llm_cache_idx:model:<modelo>`` e ``llm_cache_idx:user:<usuário>``
+(sorted sets com a expiração como score), que permitem invalidar por modelo
+ou usuário sem ``SCAN``.
+"""
+
+import hashlib
+import json
+import unicodedata
+from typing import List, Mapping, Optional
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - dependência opcional
+    xxhash = None
+
+# Prefixo das respostas e dos índices (fora de ``llm_cache:*``, que só tem valores)
+KEY_PREFIX = "llm_cache:"
+INDEX_PREFIX = "llm_cache_idx:"
+
+# Separador entre os campos hasheados (não aparece em texto normalizado)
+_SEPARATOR = "\x1f"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Forma canônica do prompt: NFKC e espaços em branco colapsados."""
+    return " ".join(unicodedata.normalize("NFKC", prompt).split())
+
+
+def digest(data: str) -> str:
+    """Hash hexadecimal de 128 bits (xxh3 ou blake2b)."""
+    raw = data.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(raw)
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def params_fingerprint(params: Optional[Mapping] = None) -> str:
+    """Impressão digital dos parâmetros de geração (independe da ordem)."""
+    if not params:
+        return ""
+    return digest(json.dumps(params, sort_keys=True, default=str))[:16]
+
+
+def cache_key(
+    prompt: str,
+    model: str,
+    user_id: Optional[str] = None,
+    params: Optional[Mapping] = None,
+) -> str:
+    """Chave da resposta para o prompt, o modelo, os parâmetros e o usuário."""
+    content = _SEPARATOR.join(
+        (normalize_prompt(prompt), model, params_fingerprint(params), user_id or "")
+    )
+    return KEY_PREFIX + digest(content)
+
+
+def model_index(model: str) -> str:
+    return f"{INDEX_PREFIX}model:{model}"
+
+
+def user_index(user_id: str) -> str:
+    return f"{INDEX_PREFIX}user:{user_id}"
+
+
+def indexes_for(model: str, user_id: Optional[str] = None) -> List[str]:
+    """Índices em que uma chave do modelo (e do usuário) deve entrar."""
+    indexes = [model_index(model)]
+    if user_id:
+        indexes.append(user_index(user_id))
+    return indexes
+
+
+def add_to_indexes(
+    pipe, key: str, model: str, user_id: Optional[str], expires_at: float, ttl: int
+) -> None:
+    """
+    Enfileira no pipeline a entrada da chave nos índices.
+
+    Membros cuja expiração já passou são podados na mesma ida ao Redis, e o
+    índice expira junto com a última chave gravada nele.
+    """
+    for index in indexes_for(model, user_id):
+        pipe.zadd(index, {key: expires_at})
+        pipe.zremrangebyscore(index, "-inf", f"({expires_at - ttl}")
+        pipe.expire(index, ttl)
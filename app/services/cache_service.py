@@ -1,16 +1,52 @@
-import json
-import hashlib
-from typing import Optional
+import time
+from typing import Callable, Iterable, List, Mapping, Optional, Tuple
 import redis.asyncio as redis
 from loguru import logger
+from redis.client import NEVER_DECODE
 from app.core.config import settings
+from app.core.metrics import LLM_CACHE_REQUESTS
+from app.core.serialization import pack, unpack
+from app.core.tracing import stage
+from app.services.cache_keys import add_to_indexes, cache_key, model_index, user_index
+from app.services.llm_providers import generation_params
+from app.services.local_cache import LocalCache
+from app.services.redis_batcher import RedisBatcher
+
+# Chaves apagadas por comando DEL na invalidação em massa
+INVALIDATION_BATCH = 500
 
 
 class CacheService:
-    """Serviço de cache usando Redis."""
+    """
+    Serviço de cache usando Redis.
+
+    Quando um ``local_cache`` é informado, ele funciona como camada L1 em
+    memória na frente das chaves ``llm_cache:*`` do Redis (L2). Os valores são
+    gravados em msgpack (``serialization.pack``) e lidos sem decodificação de
+    texto; valores JSON de versões anteriores continuam legíveis.
 
-    def __init__(self):
-        self.redis_client = None
+    As chaves vêm de ``cache_keys.cache_key`` (prompt canonicalizado, modelo,
+    ``params`` de geração e usuário); sem ``params`` valem os do provedor
+    primário configurado (``generation_params``), os mesmos no servidor e na
+    CLI. Cada escrita registra a chave nos índices por modelo e por usuário,
+    usados por ``invalidate_model`` e ``invalidate_user``.
+
+    Escritas de uma requisição (desta classe e das subclasses) passam por
+    ``_write``: com um ``batcher`` elas viajam no mesmo pipeline que as
+    escritas de outras requisições, em vez de uma ida ao Redis cada.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis = None,
+        local_cache: LocalCache = None,
+        params: Optional[Mapping] = None,
+        batcher: RedisBatcher = None,
+    ):
+        self.redis_client = redis_client
+        self.local_cache = local_cache
+        self.params = generation_params(settings) if params is None else params
+        self.batcher = batcher
 
     async def connect(self):
         """Conecta ao Redis."""
@@ -25,33 +61,97 @@ class CacheService:
             logger.error(f"❌ Erro ao conectar ao Redis: {str(e)}")
             return False
 
+    async def _write(self, write: Callable) -> None:
+        """Grava ``write(pipe)`` pelo batcher ou num pipeline próprio."""
+        if self.batcher is not None:
+            await self.batcher.submit(write)
+            return
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            write(pipe)
+            await pipe.execute()
+
     def _generate_cache_key(self, prompt: str, model: str, user_id: str = None) -> str:
         """Gera chave única para o cache baseada no prompt e modelo."""
-        content = f"{prompt}:{model}"
-        if user_id:
-            content += f":{user_id}"
-        return f"llm_cache:{hashlib.md5(content.encode()).hexdigest()}"
+        return cache_key(prompt, model, user_id, self.params)
 
     async def get_cached_response(
         self, prompt: str, model: str, user_id: str = None
     ) -> Optional[dict]:
-        """Busca resposta em cache."""
+        """Busca resposta em cache (L1 em memória e depois Redis)."""
+        with stage("cache_lookup"):
+            return await self._get_cached_response(prompt, model, user_id)
+
+    async def _get_cached_response(
+        self, prompt: str, model: str, user_id: str = None
+    ) -> Optional[dict]:
+        cache_key = self._generate_cache_key(prompt, model, user_id)
+
+        if self.local_cache is not None:
+            cached = self.local_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
             if not self.redis_client:
                 await self.connect()
 
-            cache_key = self._generate_cache_key(prompt, model, user_id)
-            cached_data = await self.redis_client.get(cache_key)
+            cached_data = await self.redis_client.execute_command(
+                "GET", cache_key, **{NEVER_DECODE: True}
+            )
 
             if cached_data:
-                logger.info(f"💾 Cache hit para prompt: {prompt[:50]}...")
-                return json.loads(cached_data)
+                LLM_CACHE_REQUESTS.labels(layer="redis", result="hit").inc()
+                logger.info("💾 Cache hit para prompt: {}...", prompt[:50])
+                response = unpack(cached_data)
+                if self.local_cache is not None:
+                    self.local_cache.set(cache_key, response, settings.CACHE_L1_TTL)
+                return response
 
+            LLM_CACHE_REQUESTS.labels(layer="redis", result="miss").inc()
             return None
         except Exception as e:
+            LLM_CACHE_REQUESTS.labels(layer="redis", result="error").inc()
             logger.error(f"Erro ao buscar cache: {str(e)}")
             return None
 
+    async def get_cached_responses(
+        self, prompts: List[str], model: str
+    ) -> List[Optional[dict]]:
+        """Busca várias respostas: L1 e um único MGET no Redis para o restante."""
+        with stage("cache_lookup"):
+            keys = [self._generate_cache_key(prompt, model) for prompt in prompts]
+            results = [
+                self.local_cache.get(key) if self.local_cache is not None else None
+                for key in keys
+            ]
+            missing = [index for index, result in enumerate(results) if result is None]
+            if not missing:
+                return results
+
+            try:
+                if not self.redis_client:
+                    await self.connect()
+
+                values = await self.redis_client.execute_command(
+                    "MGET", *(keys[index] for index in missing), **{NEVER_DECODE: True}
+                )
+            except Exception as e:
+                LLM_CACHE_REQUESTS.labels(layer="redis", result="error").inc(len(missing))
+                logger.error(f"Erro ao buscar cache em lote: {str(e)}")
+                return results
+
+            hits = 0
+            for index, data in zip(missing, values):
+                if not data:
+                    continue
+                hits += 1
+                results[index] = unpack(data)
+                if self.local_cache is not None:
+                    self.local_cache.set(keys[index], results[index], settings.CACHE_L1_TTL)
+            LLM_CACHE_REQUESTS.labels(layer="redis", result="hit").inc(hits)
+            LLM_CACHE_REQUESTS.labels(layer="redis", result="miss").inc(len(missing) - hits)
+            return results
+
     async def cache_response(
         self,
         prompt: str,
@@ -61,12 +161,133 @@ class CacheService:
         user_id: str = None,
     ):
         """Salva resposta no cache."""
+        with stage("cache_write"):
+            await self._cache_response(prompt, model, response, ttl, user_id)
+
+    async def _cache_response(
+        self, prompt: str, model: str, response: dict, ttl: int, user_id: str = None
+    ):
+        cache_key = self._generate_cache_key(prompt, model, user_id)
+
+        if self.local_cache is not None:
+            self.local_cache.set(cache_key, response, min(ttl, settings.CACHE_L1_TTL))
+
         try:
             if not self.redis_client:
                 await self.connect()
 
-            cache_key = self._generate_cache_key(prompt, model, user_id)
-            await self.redis_client.setex(cache_key, ttl, json.dumps(response))
-            logger.info(f"💾 Resposta cacheada para: {prompt[:50]}...")
+            # Valor e índices na mesma ida ao Redis
+            value = pack(response)
+            expires_at = time.time() + ttl
+
+            def write(pipe) -> None:
+                pipe.setex(cache_key, ttl, value)
+                add_to_indexes(pipe, cache_key, model, user_id, expires_at, ttl)
+
+            await self._write(write)
+            logger.info("💾 Resposta cacheada para: {}...", prompt[:50])
         except Exception as e:
             logger.error(f"Erro ao salvar cache: {str(e)}")
+
+    async def cache_responses(
+        self, entries: Iterable[Tuple[str, dict]], model: str, ttl: int = 3600
+    ) -> int:
+        """
+        Grava várias respostas globais (prompt, resposta) num único pipeline.
+
+        Não preenche o L1: quem grava em lote (aquecimento) não vai ler as
+        respostas logo em seguida. Retorna quantas foram gravadas.
+        """
+        count = 0
+        try:
+            if not self.redis_client:
+                await self.connect()
+
+            expires_at = time.time() + ttl
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for prompt, response in entries:
+                    key = self._generate_cache_key(prompt, model)
+                    pipe.setex(key, ttl, pack(response))
+                    pipe.zadd(model_index(model), {key: expires_at})
+                    count += 1
+                if not count:
+                    return 0
+                pipe.zremrangebyscore(model_index(model), "-inf", f"({expires_at - ttl}")
+                pipe.expire(model_index(model), ttl)
+                await pipe.execute()
+            return count
+        except Exception as e:
+            logger.error(f"Erro ao salvar cache em lote: {str(e)}")
+            return 0
+
+    async def invalidate_response(
+        self, prompt: str, model: str, user_id: str = None
+    ) -> None:
+        """Remove uma resposta do cache e avisa os demais workers via pub/sub."""
+        cache_key = self._generate_cache_key(prompt, model, user_id)
+
+        if self.local_cache is not None:
+            self.local_cache.delete(cache_key)
+
+        try:
+            if not self.redis_client:
+                await self.connect()
+
+            await self.redis_client.delete(cache_key)
+            await self.redis_client.publish(
+                settings.CACHE_INVALIDATION_CHANNEL, cache_key
+            )
+        except Exception as e:
+            logger.error(f"Erro ao invalidar cache: {str(e)}")
+
+    async def invalidate_model(self, model: str) -> int:
+        """
+        Remove todas as respostas cacheadas de um modelo; retorna quantas.
+
+        Os workers também descartam o índice semântico do modelo (aviso em
+        ``SEMANTIC_CACHE_INVALIDATION_CHANNEL``); o índice persistido fica a
+        cargo de quem invalida (``SemanticCache.invalidate`` ou a CLI).
+        """
+        removed = await self._invalidate_index(model_index(model))
+        try:
+            await self.redis_client.publish(
+                settings.SEMANTIC_CACHE_INVALIDATION_CHANNEL, model
+            )
+        except Exception as e:
+            logger.error(f"Erro ao invalidar cache semântico: {str(e)}")
+        return removed
+
+    async def invalidate_user(self, user_id: str) -> int:
+        """Remove todas as respostas cacheadas de um usuário; retorna quantas."""
+        return await self._invalidate_index(user_index(user_id))
+
+    async def _invalidate_index(self, index: str) -> int:
+        """
+        Apaga as chaves de um índice e o próprio índice, sem ``SCAN``.
+
+        Os demais workers são avisados pelo canal de invalidação, uma
+        mensagem por chave, publicadas no mesmo pipeline dos ``DEL``.
+        """
+        try:
+            if not self.redis_client:
+                await self.connect()
+
+            keys = await self.redis_client.zrange(index, 0, -1)
+            await self.redis_client.delete(index)
+            # O índice pode listar chaves já expiradas: conta só as apagadas
+            removed = 0
+            for start in range(0, len(keys), INVALIDATION_BATCH):
+                batch = keys[start:start + INVALIDATION_BATCH]
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.delete(*batch)
+                    for key in batch:
+                        pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, key)
+                    removed += (await pipe.execute())[0]
+            if self.local_cache is not None:
+                for key in keys:
+                    self.local_cache.delete(key)
+            logger.info("🗑️ {} respostas removidas do cache ({})", removed, index)
+            return removed
+        except Exception as e:
+            logger.error(f"Erro ao invalidar cache: {str(e)}")
+            return 0
@@ -0,0 +1,243 @@
+"""Pré-carga do cache de respostas a partir do histórico de chats no MongoDB."""
+
+import asyncio
+import math
+import re
+import time
+from datetime import datetime, timedelta
+from typing import List, NamedTuple
+
+from loguru import logger
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.services.cache_service import CacheService
+
+# Respostas de fallback (circuito aberto, sobrecarga, erro, cota) também são
+# salvas no histórico e não podem voltar como se fossem do LLM
+FALLBACK_RESPONSE = re.compile(
+    r"^(Serviço temporariamente indisponível|Serviço sobrecarregado"
+    r"|Erro ao conectar|Erro inesperado|Cota de uso)"
+)
+
+
+def cached_response(entry: dict) -> dict:
+    """Resposta no formato gravado por ``OpenAIClient`` no cache."""
+    return {
+        "content": entry["response"],
+        "model": entry["model"],
+        "from_cache": False,
+        "circuit_open": False,
+    }
+
+
+class WarmupReport(NamedTuple):
+    """
+    Resultado de um aquecimento.
+
+    As taxas de acerto são estimadas sobre o histórico da janela: a fração
+    das requisições cujo prompt estava no cache antes e depois da carga.
+    """
+
+    requests: int = 0
+    prompts: int = 0
+    candidates: int = 0
+    already_cached: int = 0
+    written: int = 0
+    hit_ratio_before: float = 0.0
+    hit_ratio_after: float = 0.0
+    elapsed_s: float = 0.0
+
+    @property
+    def restored(self) -> float:
+        return self.hit_ratio_after - self.hit_ratio_before
+
+    def as_dict(self) -> dict:
+        return {**self._asdict(), "restored": round(self.restored, 4)}
+
+
+class CacheWarmer:
+    """
+    Carrega no cache as respostas dos prompts mais relevantes do histórico.
+
+    Um único pipeline de agregação percorre a janela de ``window_days`` da
+    coleção ``chat_interactions``, agrupa por prompt (última resposta, número
+    de pedidos e último pedido) e ordena por frequência com decaimento
+    exponencial pela idade (meia-vida ``half_life_hours``). O filtro por data
+    compara direto as strings ISO do ``timestamp``, e o modelo casa por
+    prefixo: o histórico guarda o id datado devolvido pela API
+    (``gpt-4o-mini-2024-07-18``), como em ``QuotaService.cost_micros``.
+
+    Os candidatos que já estão no Redis (um MGET) são mantidos; os demais são
+    gravados em lotes de ``batch_size`` (SETEX em pipeline), no máximo
+    ``rate`` por segundo, para não disputar o Redis com o tráfego. Só entram
+    respostas globais (sem ``userId`` na chave), as mesmas que ``/chat`` sem
+    contexto consulta.
+    """
+
+    def __init__(
+        self,
+        collection,
+        cache: CacheService,
+        window_days: float = 7.0,
+        half_life_hours: float = 24.0,
+        batch_size: int = 100,
+        rate: float = 500.0,
+    ):
+        self.collection = collection
+        self.cache = cache
+        self.window_days = window_days
+        self.half_life_hours = half_life_hours
+        self.batch_size = batch_size
+        self.rate = rate
+
+    def _pipeline(self, model: str, limit: int, now: datetime) -> List[dict]:
+        since = (now - timedelta(days=self.window_days)).isoformat()
+        decay = math.log(2) / (self.half_life_hours * 3600 * 1000)
+        return [
+            {
+                "$match": {
+                    "model": {"$regex": "^" + re.escape(model)},
+                    "timestamp": {"$gte": since},
+                    "response": {"$nin": ["", None], "$not": FALLBACK_RESPONSE},
+                }
+            },
+            {"$sort": {"timestamp": -1}},
+            {
+                "$group": {
+                    "_id": "$prompt",
+                    "count": {"$sum": 1},
+                    "last_seen": {"$first": "$timestamp"},
+                    "response": {"$first": "$response"},
+                    "model": {"$first": "$model"},
+                }
+            },
+            {
+                "$facet": {
+                    "top": [
+                        {
+                            "$addFields": {
+                                "age_ms": {
+                                    "$subtract": [
+                                        now,
+                                        {
+                                            "$dateFromString": {
+                                                "dateString": "$last_seen",
+                                                "onError": now,
+                                            }
+                                        },
+                                    ]
+                                }
+                            }
+                        },
+                        {
+                            "$addFields": {
+                                "score": {
+                                    "$multiply": [
+                                        "$count",
+                                        {"$exp": {"$multiply": [-decay, "$age_ms"]}},
+                                    ]
+                                }
+                            }
+                        },
+                        {"$sort": {"score": -1}},
+                        {"$limit": limit},
+                    ],
+                    "totals": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "requests": {"$sum": "$count"},
+                                "prompts": {"$sum": 1},
+                            }
+                        }
+                    ],
+                }
+            },
+        ]
+
+    async def top_prompts(self, model: str, limit: int) -> dict:
+        """Os ``limit`` prompts mais relevantes e os totais da janela."""
+        # Os timestamps são gravados com ``datetime.now()`` (hora local, sem fuso)
+        pipeline = self._pipeline(model, limit, datetime.now())
+        async for result in self.collection.aggregate(pipeline, allowDiskUse=True):
+            totals = result["totals"][0] if result["totals"] else {}
+            return {
+                "top": result["top"],
+                "requests": totals.get("requests", 0),
+                "prompts": totals.get("prompts", 0),
+            }
+        return {"top": [], "requests": 0, "prompts": 0}
+
+    async def warm(
+        self,
+        top: int,
+        model: str = settings.OPENAI_MODEL,
+        ttl: int = settings.CACHE_TTL,
+        dry_run: bool = False,
+    ) -> WarmupReport:
+        """Grava no cache as respostas dos ``top`` prompts que estão faltando."""
+        started_at = time.monotonic()
+        try:
+            ranking = await self.top_prompts(model, top)
+        except PyMongoError as e:
+            logger.error(f"Erro ao ler o histórico de chats: {str(e)}")
+            return WarmupReport()
+
+        entries = ranking["top"]
+        requests = ranking["requests"]
+        if not entries:
+            return WarmupReport(requests=requests, prompts=ranking["prompts"])
+
+        cached = await self.cache.get_cached_responses(
+            [entry["_id"] for entry in entries], model
+        )
+        missing = [entry for entry, hit in zip(entries, cached) if hit is None]
+        # Requisições do histórico que pedem prompts já presentes no cache.
+        # Prompts fora do top também podem estar lá: a estimativa "antes" é
+        # um piso
+        before = sum(entry["count"] for entry, hit in zip(entries, cached) if hit)
+
+        written_total = written_requests = 0
+        if dry_run:
+            # Só o relatório: "depois" é o acerto que a carga restauraria
+            written_requests = sum(entry["count"] for entry in missing)
+        else:
+            for start in range(0, len(missing), self.batch_size):
+                batch_started_at = time.monotonic()
+                batch = missing[start:start + self.batch_size]
+                written = await self.cache.cache_responses(
+                    ((entry["_id"], cached_response(entry)) for entry in batch),
+                    model,
+                    ttl,
+                )
+                if written:
+                    written_total += written
+                    written_requests += sum(entry["count"] for entry in batch)
+                # Limite de taxa: cada lote ocupa pelo menos len(batch) / rate segundos
+                if self.rate:
+                    pause = len(batch) / self.rate - (time.monotonic() - batch_started_at)
+                    if pause > 0:
+                        await asyncio.sleep(pause)
+
+        report = WarmupReport(
+            requests=requests,
+            prompts=ranking["prompts"],
+            candidates=len(entries),
+            already_cached=len(entries) - len(missing),
+            written=written_total,
+            hit_ratio_before=round(before / requests, 4) if requests else 0.0,
+            hit_ratio_after=(
+                round((before + written_requests) / requests, 4) if requests else 0.0
+            ),
+            elapsed_s=round(time.monotonic() - started_at, 3),
+        )
+        logger.info(
+            "🔥 Cache aquecido: {} respostas gravadas ({} já em cache), "
+            "acerto estimado {:.1%} -> {:.1%}",
+            report.written,
+            report.already_cached,
+            report.hit_ratio_before,
+            report.hit_ratio_after,
+        )
+        return report
@@ -1,9 +1,19 @@
+import asyncio
+import json
 import time
+import uuid
+from collections import deque
 from enum import Enum
 
 from loguru import logger
 
-from app.services.cache_service import CacheService
+from app.core.metrics import CIRCUIT_BREAKER_STATE, CIRCUIT_BREAKER_TRANSITIONS
+
+# Identifica o processo nas mensagens pub/sub (ignora as próprias)
+WORKER_ID = uuid.uuid4().hex
+
+# Canal único de transições de estado de todos os circuit breakers
+EVENTS_CHANNEL = "circuit:events"
 
 
 class CircuitState(Enum):
@@ -12,66 +22,222 @@ class CircuitState(Enum):
     HALF_OPEN = "half_open"  # Testing if service is back
 
 
-class CircuitBreaker(CacheService):
-    """Circuit Breaker para serviços externos."""
+# Valor exportado em circuit_breaker_state
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitBreaker:
+    """
+    Circuit Breaker para serviços externos.
+
+    O estado vive na memória do processo, então consultar o breaker no
+    caminho quente não custa nenhuma ida à rede. O circuito abre com
+    ``failure_threshold`` falhas consecutivas ou quando a taxa de falhas na
+    janela de ``window_seconds`` passa de ``failure_rate_threshold`` (com pelo
+    menos ``minimum_calls`` chamadas). Após ``recovery_timeout`` segundos
+    passa a HALF_OPEN e deixa passar no máximo ``half_open_max_calls``
+    requisições de teste; se todas tiverem sucesso o circuito fecha.
+
+    Com ``redis_client`` as transições são publicadas em background no canal
+    ``circuit:events`` e gravadas em ``circuit:<serviço>:state``, para que os
+    outros workers sigam o mesmo estado (ver ``apply_remote_event``).
+    """
 
     def __init__(
-        self, service_name: str, failure_threshold: int = 5, recovery_timeout: int = 60
+        self,
+        service_name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: int = 60,
+        redis_client=None,
+        failure_rate_threshold: float = 0.5,
+        window_seconds: int = 60,
+        minimum_calls: int = 10,
+        half_open_max_calls: int = 3,
     ):
-        super().__init__()
         self.service_name = service_name
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
+        self.redis_client = redis_client
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_seconds = window_seconds
+        self.minimum_calls = minimum_calls
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        # Janela deslizante em buckets de 1s: [segundo, sucessos, falhas]
+        self._window = deque()
+        self._half_open_inflight = 0
+        self._half_open_successes = 0
+        self._pending = set()
+        CIRCUIT_BREAKER_STATE.labels(service=service_name).set(0)
+
+    @property
+    def state_key(self) -> str:
+        return f"circuit:{self.service_name}:state"
+
+    def current_state(self) -> CircuitState:
+        """Estado atual, promovendo OPEN para HALF_OPEN após o timeout."""
+        if (
+            self.state == CircuitState.OPEN
+            and time.time() - self.opened_at >= self.recovery_timeout
+        ):
+            self._transition(CircuitState.HALF_OPEN)
+        return self.state
+
+    def allow_request(self) -> bool:
+        """
+        Decide se uma chamada pode seguir (sem I/O).
+
+        Em HALF_OPEN reserva uma das vagas de teste; quem recebe True deve
+        chamar ``record_success``, ``record_failure`` ou ``release``.
+        """
+        state = self.current_state()
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.OPEN:
+            return False
+        if self._half_open_inflight >= self.half_open_max_calls:
+            return False
+        self._half_open_inflight += 1
+        return True
+
+    def release(self) -> None:
+        """Libera uma vaga de teste sem registrar resultado (ex.: cancelamento)."""
+        if self.state == CircuitState.HALF_OPEN and self._half_open_inflight:
+            self._half_open_inflight -= 1
 
     async def get_circuit_state(self) -> CircuitState:
         """Obtém estado atual do circuit breaker."""
-        try:
-            state_key = f"circuit:{self.service_name}:state"
-            state = await self.redis_client.get(state_key)
-
-            if not state:
-                return CircuitState.CLOSED
-
-            if state == CircuitState.OPEN.value:
-                # Verifica se deve tentar half-open
-                last_failure_key = f"circuit:{self.service_name}:last_failure"
-                last_failure = await self.redis_client.get(last_failure_key)
-
-                if (
-                    last_failure
-                    and (time.time() - float(last_failure)) > self.recovery_timeout
-                ):
-                    await self.set_circuit_state(CircuitState.HALF_OPEN)
-                    return CircuitState.HALF_OPEN
-
-            return CircuitState(state)
-        except:
-            return CircuitState.CLOSED
+        return self.current_state()
 
     async def record_success(self):
         """Registra sucesso na operação."""
-        try:
-            await self.set_circuit_state(CircuitState.CLOSED)
-            failure_key = f"circuit:{self.service_name}:failures"
-            await self.redis_client.delete(failure_key)
-        except Exception as e:
-            logger.error(f"Erro ao registrar sucesso: {str(e)}")
+        self._record(success=True)
+        self.consecutive_failures = 0
+
+        if self.state == CircuitState.HALF_OPEN:
+            self.release()
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.half_open_max_calls:
+                self._transition(CircuitState.CLOSED)
 
     async def record_failure(self):
         """Registra falha na operação."""
+        self._record(success=False)
+        self.consecutive_failures += 1
+
+        if self.state == CircuitState.HALF_OPEN:
+            self._transition(CircuitState.OPEN)
+        elif self.state == CircuitState.CLOSED and self._should_trip():
+            self._transition(CircuitState.OPEN)
+
+    def failure_rate(self) -> float:
+        """Taxa de falhas na janela deslizante."""
+        calls, failures = self._window_totals()
+        return failures / calls if calls else 0.0
+
+    def _should_trip(self) -> bool:
+        if self.consecutive_failures >= self.failure_threshold:
+            return True
+        calls, failures = self._window_totals()
+        return (
+            calls >= self.minimum_calls
+            and failures / calls >= self.failure_rate_threshold
+        )
+
+    def _record(self, success: bool) -> None:
+        second = int(time.time())
+        if not self._window or self._window[-1][0] != second:
+            self._window.append([second, 0, 0])
+        self._window[-1][1 if success else 2] += 1
+        self._expire_window(second)
+
+    def _expire_window(self, now: int) -> None:
+        while self._window and self._window[0][0] <= now - self.window_seconds:
+            self._window.popleft()
+
+    def _window_totals(self):
+        self._expire_window(int(time.time()))
+        successes = sum(bucket[1] for bucket in self._window)
+        failures = sum(bucket[2] for bucket in self._window)
+        return successes + failures, failures
+
+    def _transition(self, state: CircuitState, publish: bool = True) -> None:
+        if state == self.state:
+            return
+        logger.warning(
+            f"⚡ Circuit breaker {self.service_name}: {self.state.value} -> {state.value}"
+        )
+        self.state = state
+        CIRCUIT_BREAKER_TRANSITIONS.labels(
+            service=self.service_name, state=state.value
+        ).inc()
+        CIRCUIT_BREAKER_STATE.labels(service=self.service_name).set(
+            STATE_VALUES[state.value]
+        )
+        self._half_open_inflight = 0
+        self._half_open_successes = 0
+        if state == CircuitState.OPEN:
+            self.opened_at = time.time()
+        elif state == CircuitState.CLOSED:
+            self.consecutive_failures = 0
+            self._window.clear()
+
+        # HALF_OPEN é local: cada worker testa o serviço por conta própria
+        if publish and state != CircuitState.HALF_OPEN:
+            self._publish_in_background()
+
+    def _publish_in_background(self) -> None:
+        if self.redis_client is None:
+            return
         try:
-            failure_key = f"circuit:{self.service_name}:failures"
-            failures = await self.redis_client.incr(failure_key)
-            await self.redis_client.expire(failure_key, 300)  # 5min TTL
-
-            if failures >= self.failure_threshold:
-                await self.set_circuit_state(CircuitState.OPEN)
-                last_failure_key = f"circuit:{self.service_name}:last_failure"
-                await self.redis_client.set(last_failure_key, time.time())
+            task = asyncio.get_running_loop().create_task(self._publish())
+        except RuntimeError:
+            return
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish(self) -> None:
+        event = json.dumps(
+            {
+                "service": self.service_name,
+                "state": self.state.value,
+                "opened_at": self.opened_at,
+                "origin": WORKER_ID,
+            }
+        )
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(self.state_key, event, ex=self.recovery_timeout * 10)
+                pipe.publish(EVENTS_CHANNEL, event)
+                await pipe.execute()
         except Exception as e:
-            logger.error(f"Erro ao registrar falha: {str(e)}")
-
-    async def set_circuit_state(self, state: CircuitState):
-        """Define estado do circuit breaker."""
-        state_key = f"circuit:{self.service_name}:state"
-        await self.redis_client.set(state_key, state.value)
+            logger.error(f"Erro ao sincronizar circuit breaker: {str(e)}")
+
+    def apply_remote_event(self, data: str) -> None:
+        """Aplica uma transição publicada por outro worker."""
+        event = json.loads(data)
+        if event.get("origin") == WORKER_ID:
+            return
+        if event.get("service") != self.service_name:
+            return
+
+        state = CircuitState(event["state"])
+        if state == CircuitState.OPEN and self.state != CircuitState.OPEN:
+            self._transition(CircuitState.OPEN, publish=False)
+            self.opened_at = float(event.get("opened_at") or time.time())
+        elif state == CircuitState.CLOSED and self.state != CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED, publish=False)
+
+    async def sync_from_redis(self) -> None:
+        """Carrega o último estado publicado (usado ao iniciar o worker)."""
+        if self.redis_client is None:
+            return
+        try:
+            data = await self.redis_client.get(self.state_key)
+            if data:
+                self.apply_remote_event(data)
+        except Exception as e:
+            logger.error(f"Erro ao carregar estado do circuit breaker: {str(e)}")
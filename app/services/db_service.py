@@ -1,17 +1,37 @@
+from typing import AsyncIterator, List, Optional, Tuple
+
 import motor.motor_asyncio
 from loguru import logger
-from pymongo.errors import PyMongoError
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
 from app.core.config import settings
+from app.core.tracing import stage
+
+# Campos de um chat retornados pela API (projeção padrão)
+CHAT_FIELDS = ["id", "userId", "prompt", "response", "model", "timestamp"]
+
+# Ordem do histórico: mais recente primeiro, com o id como desempate
+CHAT_SORT = [("timestamp", DESCENDING), ("id", DESCENDING)]
 
 
 class MongoDBService:
     """Serviço para interagir com o MongoDB."""
 
-    def __init__(self, mongo_url: str = None):
-        """Inicializa a conexão com o MongoDB."""
+    def __init__(
+        self,
+        mongo_url: str = None,
+        client: motor.motor_asyncio.AsyncIOMotorClient = None,
+    ):
+        """
+        Inicializa a conexão com o MongoDB.
+
+        Quando ``client`` é informado (cliente compartilhado do processo), o
+        serviço apenas o reutiliza e não o fecha em ``disconnect``.
+        """
         self.mongo_url = mongo_url or settings.MONGODB_URL
-        self.client = None
-        self.db = None
+        self.client = client
+        self.db = client.chat_db if client is not None else None
+        self._owns_client = client is None
 
     async def connect(self):
         """Conecta ao MongoDB."""
@@ -26,7 +46,7 @@ class MongoDBService:
 
     async def disconnect(self):
         """Desconecta do MongoDB."""
-        if self.client:
+        if self.client is not None and self._owns_client:
             self.client.close()
             logger.info("Desconectado do MongoDB")
 
@@ -41,20 +61,35 @@ class MongoDBService:
             bool: True se o salvamento foi bem-sucedido, False caso contrário
         """
         try:
-            if not self.db:
+            if self.db is None:
                 await self.connect()
 
-            await self.db.chat_interactions.insert_one(chat_data)
-            logger.info(f"Chat salvo com sucesso: {chat_data.get('id')}")
+            with stage("db_write"):
+                await self.db.chat_interactions.insert_one(chat_data)
+            logger.info("Chat salvo com sucesso: {}", chat_data.get("id"))
             return True
         except PyMongoError as e:
             logger.error(f"Erro ao salvar o chat no MongoDB: {str(e)}")
             return False
 
+    async def save_chat_interactions(self, chats: List[dict]) -> bool:
+        """Salva vários chats numa única escrita (``insert_many`` não ordenado)."""
+        try:
+            if self.db is None:
+                await self.connect()
+
+            with stage("db_write"):
+                await self.db.chat_interactions.insert_many(chats, ordered=False)
+            logger.info("{} chats salvos com sucesso", len(chats))
+            return True
+        except PyMongoError as e:
+            logger.error(f"Erro ao salvar os chats no MongoDB: {str(e)}")
+            return False
+
     async def get_chat_by_id(self, chat_id: str) -> dict:
         """Recupera um chat pelo ID."""
         try:
-            if not self.db:
+            if self.db is None:
                 await self.connect()
 
             chat = await self.db.chat_interactions.find_one({"id": chat_id})
@@ -63,15 +98,111 @@ class MongoDBService:
             logger.error(f"Erro ao recuperar o chat: {str(e)}")
             return None
 
-    async def get_chats_by_user(self, user_id: str) -> list:
-        """Recupera os chats de um usuário específico."""
+    async def ensure_indexes(self) -> bool:
+        """
+        Cria os índices usados nas consultas (idempotente, roda no startup).
+
+        Retorna False só se o índice das consultas por usuário falhar. O
+        índice único de ``id`` não é criado se a coleção já tiver ``id``
+        repetido ou ausente: o erro é registrado e o serviço segue sem ele.
+        """
         try:
-            if not self.db:
+            if self.db is None:
                 await self.connect()
 
-            cursor = self.db.chat_interactions.find({"userId": user_id})
-            chats = await cursor.to_list(length=100)  # Limitar a 100 resultados
+            collection = self.db.chat_interactions
+            await collection.create_index(
+                [("userId", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)],
+                name="userId_timestamp_id",
+            )
+        except PyMongoError as e:
+            logger.error(f"Erro ao criar índices no MongoDB: {str(e)}")
+            return False
+
+        try:
+            await collection.create_index("id", unique=True, name="id_unique")
+        except OperationFailure as e:
+            logger.error(
+                "❌ Índice único de id não criado (chats com id repetido ou sem id?): {}",
+                str(e),
+            )
+        except PyMongoError as e:
+            logger.error(f"Erro ao criar índices no MongoDB: {str(e)}")
+            return False
+        logger.info("Índices do MongoDB verificados")
+        return True
+
+    def _user_query(self, user_id: str, before: Optional[Tuple[str, str]]) -> dict:
+        """Filtro por usuário com keyset pagination (timestamp, id) decrescente."""
+        query = {"userId": user_id}
+        if before:
+            timestamp, chat_id = before
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "id": {"$lt": chat_id}},
+            ]
+        return query
+
+    async def get_chats_by_user(
+        self,
+        user_id: str,
+        limit: int = 100,
+        before: Optional[Tuple[str, str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> list:
+        """
+        Recupera os chats de um usuário específico, do mais recente ao mais antigo.
+
+        Args:
+            user_id (str): Usuário dono dos chats
+            limit (int): Tamanho máximo da página
+            before (tuple): Cursor ``(timestamp, id)`` do último item da página anterior
+            fields (list): Campos retornados (projeção); ``_id`` nunca é retornado
+
+        Returns:
+            list: Página de chats usando o índice ``userId_timestamp_id``
+        """
+        try:
+            if self.db is None:
+                await self.connect()
+
+            cursor = (
+                self.db.chat_interactions.find(
+                    self._user_query(user_id, before), self._projection(fields)
+                )
+                .sort(CHAT_SORT)
+                .limit(limit)
+            )
+            with stage("db_read"):
+                chats = await cursor.to_list(length=limit)
             return chats
         except PyMongoError as e:
             logger.error(f"Erro ao recuperar os chats do usuário: {str(e)}")
             return []
+
+    async def iter_chats_by_user(
+        self,
+        user_id: str,
+        batch_size: int = 500,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[dict]:
+        """Percorre todo o histórico do usuário em lotes, sem carregá-lo na memória."""
+        if self.db is None:
+            await self.connect()
+
+        cursor = self.db.chat_interactions.find(
+            self._user_query(user_id, None),
+            self._projection(fields),
+            batch_size=batch_size,
+        ).sort(CHAT_SORT)
+        try:
+            async for chat in cursor:
+                yield chat
+        finally:
+            await cursor.close()
+
+    @staticmethod
+    def _projection(fields: Optional[List[str]]) -> dict:
+        projection = {"_id": 0}
+        projection.update({field: 1 for field in fields or CHAT_FIELDS})
+        return projection
@@ -0,0 +1,189 @@
+"""Probes das dependências em segundo plano, com resultado em cache."""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from loguru import logger
+
+from app.core.metrics import DEPENDENCY_UP, EVENT_LOOP_LAG, HEALTH_PROBE_LATENCY
+from app.middleware.metrics import inflight_requests
+from app.services.circuit_breaker import CircuitState
+
+if TYPE_CHECKING:
+    from app.core.clients import ClientRegistry
+
+
+class HealthMonitor:
+    """
+    Estado de saúde do worker, atualizado por tasks de background.
+
+    A cada ``interval`` segundos faz ping no Redis e no MongoDB (em paralelo,
+    com ``timeout``) e olha, em memória, os circuit breakers do LLM, a fila
+    write-behind e a saturação dos pools. Outra task mede o atraso do event
+    loop. Os endpoints de health só leem o último resultado: o custo de um
+    probe do load balancer não depende das dependências.
+
+    Só derrubam a readiness os checks ``critical``. Breakers do LLM abertos
+    valem para todos os workers (o estado é compartilhado), então tirar o
+    worker do balanceamento não ajudaria: aparecem apenas como informação.
+    """
+
+    def __init__(
+        self,
+        clients: "ClientRegistry",
+        interval: float = 5.0,
+        timeout: float = 1.0,
+        lag_interval: float = 0.5,
+        max_loop_lag: float = 0.5,
+        max_pool_saturation: float = 0.95,
+        max_write_queue_fill: float = 0.9,
+    ):
+        self.clients = clients
+        self.interval = interval
+        self.timeout = timeout
+        self.lag_interval = lag_interval
+        self.max_loop_lag = max_loop_lag
+        self.max_pool_saturation = max_pool_saturation
+        self.max_write_queue_fill = max_write_queue_fill
+        self.checks: Dict[str, dict] = {}
+        self.checked_at: Optional[float] = None
+        self.loop_lag = 0.0
+        self._tasks = []
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._probe_loop()),
+                asyncio.create_task(self._lag_loop()),
+            ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def stale(self) -> bool:
+        """O probe parou de rodar (task morta ou event loop travado)."""
+        if self.checked_at is None:
+            return False
+        return time.monotonic() - self.checked_at > 3 * self.interval + self.timeout
+
+    @property
+    def ready(self) -> bool:
+        return (
+            self.clients.ready
+            and self.checked_at is not None
+            and not self.stale
+            and self.loop_lag <= self.max_loop_lag
+            and all(check["ok"] for check in self.checks.values() if check["critical"])
+        )
+
+    def liveness(self) -> dict:
+        return {
+            "status": "stale" if self.stale else "ok",
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "inflight": inflight_requests(),
+        }
+
+    def readiness(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "not_ready",
+            "warm_up": self.clients.readiness,
+            "checks": self.checks,
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "inflight": inflight_requests(),
+            "checked_ago_s": (
+                round(time.monotonic() - self.checked_at, 1)
+                if self.checked_at is not None
+                else None
+            ),
+        }
+
+    async def probe(self) -> None:
+        """Roda todos os checks uma vez e atualiza o cache."""
+        redis_check, mongo_check = await asyncio.gather(
+            self._ping("redis", self.clients.redis.ping),
+            self._ping("mongo", lambda: self.clients.mongo.admin.command("ping")),
+        )
+        checks = {
+            "redis": redis_check,
+            "mongo": mongo_check,
+            "llm": self._llm_check(),
+            "write_queue": self._write_queue_check(),
+            "pools": self._pools_check(),
+        }
+        for name, check in checks.items():
+            DEPENDENCY_UP.labels(dependency=name).set(1 if check["ok"] else 0)
+        self.checks = checks
+        self.checked_at = time.monotonic()
+
+    async def _ping(self, name: str, command) -> dict:
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(command(), self.timeout)
+            ok, detail = True, None
+        except Exception as e:
+            ok, detail = False, str(e) or type(e).__name__
+        latency = time.perf_counter() - started_at
+        HEALTH_PROBE_LATENCY.labels(dependency=name).observe(latency)
+        check = {"ok": ok, "critical": True, "latency_ms": round(latency * 1000, 1)}
+        if detail:
+            check["detail"] = detail
+        return check
+
+    def _llm_check(self) -> dict:
+        router = self.clients.llm_router
+        if router is None:
+            return {"ok": False, "critical": False, "detail": "iniciando"}
+        states = {
+            name: breaker.current_state().value for name, breaker in router.breakers.items()
+        }
+        return {
+            "ok": any(state != CircuitState.OPEN.value for state in states.values()),
+            "critical": False,
+            "breakers": states,
+        }
+
+    def _write_queue_check(self) -> dict:
+        queue = self.clients.write_queue
+        if queue is None:
+            return {"ok": True, "critical": True, "detail": "desabilitada"}
+        fill = queue.depth / queue.capacity if queue.capacity else 0.0
+        return {
+            "ok": queue.running and fill < self.max_write_queue_fill,
+            "critical": True,
+            "depth": queue.depth,
+            "fill": round(fill, 3),
+        }
+
+    def _pools_check(self) -> dict:
+        saturation = {
+            pool: round(stats["in_use"] / stats["max"], 3) if stats["max"] else 0.0
+            for pool, stats in self.clients.pool_stats().items()
+        }
+        return {
+            "ok": all(value < self.max_pool_saturation for value in saturation.values()),
+            "critical": True,
+            "saturation": saturation,
+        }
+
+    async def _probe_loop(self) -> None:
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.error(f"Erro ao verificar dependências: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _lag_loop(self) -> None:
+        # Quanto o sleep passou do pedido = tempo que o loop ficou ocupado.
+        # Média móvel para uma pausa isolada (ex.: GC) não derrubar a readiness
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(time.perf_counter() - started_at - self.lag_interval, 0.0)
+            self.loop_lag = 0.3 * lag + 0.7 * self.loop_lag
+            EVENT_LOOP_LAG.set(self.loop_lag)
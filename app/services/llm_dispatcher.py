@@ -0,0 +1,265 @@
+"""Controle de concorrência das chamadas ao LLM (fila com prioridade e AIMD)."""
+
+import asyncio
+import enum
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.metrics import (
+    LLM_CONCURRENCY_LIMIT,
+    LLM_DISPATCH_DROPPED,
+    LLM_INFLIGHT,
+    LLM_QUEUE_WAIT,
+)
+
+# Um burst de 429 reduz o limite uma vez só dentro deste intervalo (segundos)
+DECREASE_COOLDOWN = 1.0
+
+
+class Priority(enum.IntEnum):
+    """Prioridade na fila do dispatcher (menor valor sai primeiro)."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# Instante (time.monotonic) a partir do qual o cliente já desistiu da resposta
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.NORMAL)
+
+
+def set_deadline(timeout: float) -> None:
+    """Define o prazo da requisição atual, em segundos a partir de agora."""
+    _deadline.set(time.monotonic() + timeout)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+@contextmanager
+def priority_scope(priority: Priority) -> Iterator[None]:
+    """Prioridade das chamadas ao LLM feitas dentro do bloco."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class DispatchRejected(Exception):
+    """A chamada não foi feita: fila cheia ou prazo do cliente esgotado."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AIMDLimiter:
+    """
+    Limite de concorrência adaptativo (additive increase, multiplicative decrease).
+
+    Cada sucesso abaixo de ``latency_target`` soma ``1 / limite`` (cerca de +1
+    por "rodada" de chamadas). Um 429 multiplica o limite por ``backoff`` e
+    uma latência acima do alvo por ``latency_backoff``.
+    """
+
+    def __init__(
+        self,
+        initial: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 15.0,
+        backoff: float = 0.5,
+        latency_backoff: float = 0.9,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self._last_decrease = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self._decrease(self.latency_backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_overload(self) -> None:
+        self._decrease(self.backoff)
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+
+class Ticket:
+    """Vaga concedida pelo dispatcher; ``latency`` substitui a medida padrão."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.latency: Optional[float] = None
+
+
+class _Lane:
+    """Fila e contagem de chamadas em andamento de um modelo."""
+
+    def __init__(self, model: str, limiter: AIMDLimiter):
+        self.model = model
+        self.limiter = limiter
+        self.inflight = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+
+    def try_acquire(self) -> bool:
+        if not self.waiters and self.inflight < self.limiter.capacity:
+            self.inflight += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        self.inflight -= 1
+        self.wake()
+
+    def wake(self) -> None:
+        while self.waiters and self.inflight < self.limiter.capacity:
+            _, _, future = heapq.heappop(self.waiters)
+            # Cancelado por prazo esgotado ou desconexão enquanto esperava
+            if future.done():
+                continue
+            self.inflight += 1
+            future.set_result(True)
+
+    def report(self) -> None:
+        LLM_INFLIGHT.labels(model=self.model).set(self.inflight)
+        LLM_CONCURRENCY_LIMIT.labels(model=self.model).set(self.limiter.limit)
+
+
+class LLMDispatcher:
+    """
+    Limita as chamadas simultâneas ao LLM por modelo.
+
+    Acima do limite as chamadas esperam numa fila ordenada por prioridade
+    (e por ordem de chegada). O limite se ajusta sozinho (``AIMDLimiter``)
+    conforme os 429 e a latência observados. Uma chamada cujo prazo
+    (``set_deadline``) se esgota enquanto espera na fila é descartada com
+    ``DispatchRejected`` em vez de ocupar o provedor com uma resposta que
+    ninguém vai ler.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 15.0,
+        max_queue: int = 1000,
+        max_wait: float = 30.0,
+    ):
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lanes: Dict[str, _Lane] = {}
+        self._sequence = itertools.count()
+
+    def lane(self, model: str) -> _Lane:
+        if model not in self._lanes:
+            self._lanes[model] = _Lane(
+                model,
+                AIMDLimiter(
+                    self.initial_limit,
+                    self.min_limit,
+                    self.max_limit,
+                    self.latency_target,
+                ),
+            )
+        return self._lanes[model]
+
+    @asynccontextmanager
+    async def slot(
+        self, model: str, priority: Optional[Priority] = None
+    ) -> AsyncIterator[Ticket]:
+        """
+        Reserva uma vaga para chamar ``model`` durante o bloco.
+
+        Um ``openai.RateLimitError`` saindo do bloco reduz o limite; um bloco
+        concluído sem erro conta como sucesso com a latência do bloco (ou
+        ``ticket.latency``, ex.: tempo até o primeiro token em streaming).
+        """
+        lane = self.lane(model)
+        priority = _priority.get() if priority is None else priority
+        await self._acquire(lane, priority)
+
+        ticket = Ticket()
+        lane.report()
+        try:
+            yield ticket
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:
+                lane.limiter.on_overload()
+                logger.warning(
+                    f"⚠️ 429 do provedor, limite de {model} reduzido para {lane.limiter.capacity}"
+                )
+            raise
+        else:
+            lane.limiter.on_success(
+                ticket.latency
+                if ticket.latency is not None
+                else time.perf_counter() - ticket.started_at
+            )
+        finally:
+            lane.release()
+            lane.report()
+
+    async def _acquire(self, lane: _Lane, priority: Priority) -> None:
+        started_at = time.perf_counter()
+        if lane.try_acquire():
+            LLM_QUEUE_WAIT.labels(model=lane.model, priority=priority.name).observe(0)
+            return
+
+        if len(lane.waiters) >= self.max_queue:
+            LLM_DISPATCH_DROPPED.labels(model=lane.model, reason="queue_full").inc()
+            raise DispatchRejected("queue_full")
+
+        deadline = _deadline.get()
+        timeout = self.max_wait
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            LLM_DISPATCH_DROPPED.labels(model=lane.model, reason="deadline").inc()
+            raise DispatchRejected("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiters, (priority, next(self._sequence), future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            LLM_DISPATCH_DROPPED.labels(model=lane.model, reason="deadline").inc()
+            raise DispatchRejected("deadline")
+        except asyncio.CancelledError:
+            # A vaga pode ter sido concedida no mesmo ciclo do cancelamento
+            if future.done() and not future.cancelled():
+                lane.release()
+            raise
+        finally:
+            LLM_QUEUE_WAIT.labels(model=lane.model, priority=priority.name).observe(
+                time.perf_counter() - started_at
+            )
@@ -0,0 +1,257 @@
+"""Provedores de LLM atrás de uma interface comum (OpenAI, Anthropic e mock)."""
+
+import asyncio
+import json
+import random
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+MOCK_MODEL = "mock-model"
+
+
+def generation_params(config) -> dict:
+    """
+    Parâmetros de geração do provedor primário (o primeiro de ``LLM_PROVIDERS``).
+
+    Entram na chave do cache de respostas, e só respostas desse provedor são
+    gravadas: uma resposta de failover (outro modelo, outro ``max_tokens``)
+    não volta como se fosse do modelo pedido.
+    """
+    provider = config.LLM_PROVIDERS[0] if config.LLM_PROVIDERS else "openai"
+    if provider == "anthropic":
+        return {
+            "provider": provider,
+            "model": config.ANTHROPIC_MODEL,
+            "max_tokens": config.ANTHROPIC_MAX_TOKENS,
+        }
+    if provider == "mock":
+        return {"provider": provider, "model": MOCK_MODEL}
+    return {"provider": provider, "model": config.OPENAI_MODEL}
+
+
+class ProviderError(Exception):
+    """Falha de um provedor; ``status_code`` vem da resposta HTTP, se houver."""
+
+    def __init__(self, provider: str, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+
+
+class LLMProvider:
+    """
+    Interface dos provedores.
+
+    ``complete`` devolve ``{"content", "model", "usage"}`` (``usage`` com
+    ``prompt_tokens`` e ``completion_tokens`` informados pelo provedor, ou
+    ``None``); ``stream`` gera pares
+    ``(delta, model)`` conforme os tokens chegam. Erros do provedor saem
+    como ``ProviderError``.
+    """
+
+    name: str = "provider"
+
+    def __init__(self, model: str, breaker_name: Optional[str] = None):
+        self.model = model
+        self.breaker_name = breaker_name or f"{self.name}_api"
+
+    async def complete(self, messages: List[Dict]) -> dict:
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict]) -> AsyncIterator[Tuple[str, str]]:
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, client: "AsyncOpenAI", model: str):
+        super().__init__(model)
+        self.client = client
+
+    async def complete(self, messages: List[Dict]) -> dict:
+        # Já importado por quem criou ``client``; aqui só resolve o nome
+        from openai import OpenAIError
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model, messages=messages
+            )
+        except OpenAIError as e:
+            raise ProviderError(self.name, str(e), getattr(e, "status_code", None)) from e
+        usage = response.usage
+        return {
+            "content": response.choices[0].message.content,
+            "model": response.model,
+            "usage": (
+                {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                }
+                if usage is not None
+                else None
+            ),
+        }
+
+    async def stream(self, messages: List[Dict]) -> AsyncIterator[Tuple[str, str]]:
+        from openai import OpenAIError
+
+        stream = None
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model, messages=messages, stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta, chunk.model or self.model
+        except OpenAIError as e:
+            raise ProviderError(self.name, str(e), getattr(e, "status_code", None)) from e
+        finally:
+            # Fecha a conexão também quando o consumidor desiste do stream
+            if stream is not None:
+                await stream.close()
+
+
+class AnthropicProvider(LLMProvider):
+    """Messages API da Anthropic via httpx (sem depender do SDK)."""
+
+    name = "anthropic"
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        api_key: str,
+        model: str,
+        base_url: str = "https://api.anthropic.com",
+        max_tokens: int = 1024,
+        version: str = "2023-06-01",
+    ):
+        super().__init__(model)
+        self.http_client = http_client
+        self.url = base_url.rstrip("/") + "/v1/messages"
+        self.max_tokens = max_tokens
+        self.headers = {
+            "x-api-key": api_key,
+            "anthropic-version": version,
+            "content-type": "application/json",
+        }
+
+    def _payload(self, messages: List[Dict], stream: bool = False) -> dict:
+        # O system prompt é um campo à parte na Messages API
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        payload = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": [m for m in messages if m["role"] != "system"],
+        }
+        if system:
+            payload["system"] = system
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def complete(self, messages: List[Dict]) -> dict:
+        try:
+            response = await self.http_client.post(
+                self.url, json=self._payload(messages), headers=self.headers
+            )
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise ProviderError(self.name, e.response.text, e.response.status_code) from e
+        except httpx.HTTPError as e:
+            raise ProviderError(self.name, str(e)) from e
+
+        data = response.json()
+        content = "".join(
+            block.get("text", "")
+            for block in data.get("content", [])
+            if block.get("type") == "text"
+        )
+        usage = data.get("usage") or {}
+        return {
+            "content": content,
+            "model": data.get("model", self.model),
+            "usage": (
+                {
+                    "prompt_tokens": usage.get("input_tokens", 0),
+                    "completion_tokens": usage.get("output_tokens", 0),
+                }
+                if usage
+                else None
+            ),
+        }
+
+    async def stream(self, messages: List[Dict]) -> AsyncIterator[Tuple[str, str]]:
+        model = self.model
+        try:
+            async with self.http_client.stream(
+                "POST", self.url, json=self._payload(messages, stream=True), headers=self.headers
+            ) as response:
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    raise ProviderError(
+                        self.name, body.decode(errors="replace"), response.status_code
+                    )
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    if event.get("type") == "message_start":
+                        model = event["message"].get("model", model)
+                    elif event.get("type") == "content_block_delta":
+                        text = event["delta"].get("text")
+                        if text:
+                            yield text, model
+                    elif event.get("type") == "error":
+                        raise ProviderError(self.name, json.dumps(event.get("error")))
+        except httpx.HTTPError as e:
+            raise ProviderError(self.name, str(e)) from e
+
+
+class MockProvider(LLMProvider):
+    """Provedor local para testes e benchmarks: latência e erros configuráveis."""
+
+    name = "mock"
+
+    def __init__(
+        self,
+        model: str = MOCK_MODEL,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        name: Optional[str] = None,
+    ):
+        if name:
+            self.name = name
+        super().__init__(model)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def _maybe_fail(self) -> None:
+        if random.random() < self.error_rate:
+            raise ProviderError(self.name, "mock error", 500)
+
+    async def complete(self, messages: List[Dict]) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return {
+            "content": f"[{self.name}] {messages[-1]['content']}",
+            "model": self.model,
+            "usage": None,
+        }
+
+    async def stream(self, messages: List[Dict]) -> AsyncIterator[Tuple[str, str]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        for word in f"[{self.name}] {messages[-1]['content']}".split(" "):
+            yield word + " ", self.model
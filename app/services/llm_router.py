@@ -0,0 +1,278 @@
+"""Roteamento entre provedores de LLM com failover e requisições hedged."""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.metrics import (
+    LLM_HEDGED_REQUESTS,
+    LLM_PROVIDER_FAILOVERS,
+    LLM_PROVIDER_LATENCY,
+    LLM_TIME_TO_FIRST_TOKEN,
+)
+from app.services.circuit_breaker import CircuitBreaker, CircuitState
+from app.services.llm_dispatcher import DispatchRejected, LLMDispatcher, Priority
+from app.services.llm_providers import LLMProvider, ProviderError
+
+
+class ProviderUnavailable(Exception):
+    """Nenhum provedor aceitou a chamada (circuit breakers abertos)."""
+
+
+class ProviderStats:
+    """
+    Latência e taxa de erro recentes de um provedor.
+
+    As médias são móveis exponenciais (EWMA); as últimas latências ficam numa
+    janela para estimar o p95 usado como atraso do hedge.
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 200):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self._latencies = deque(maxlen=window)
+
+    def record_success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._update_latency(latency)
+        self.error_rate = (1 - self.alpha) * self.error_rate
+
+    def record_abandoned(self, elapsed: float) -> None:
+        """Chamada cancelada (ex.: perdeu o hedge): levou pelo menos ``elapsed``."""
+        if self.latency is None or elapsed > self.latency:
+            self._update_latency(elapsed)
+
+    def _update_latency(self, latency: float) -> None:
+        self.latency = (
+            latency
+            if self.latency is None
+            else self.alpha * latency + (1 - self.alpha) * self.latency
+        )
+
+    def record_error(self) -> None:
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+
+    def score(self) -> float:
+        """Tempo esperado até uma resposta com sucesso (menor é melhor)."""
+        if self.latency is None:
+            # Sem amostras: fica à frente para que a latência seja medida
+            return 0.0
+        return self.latency / max(1.0 - self.error_rate, 0.05)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LLMRouter:
+    """
+    Escolhe o provedor de cada chamada e faz failover entre eles.
+
+    Os provedores com circuit breaker aberto ficam de fora e os demais são
+    tentados em ordem de ``ProviderStats.score`` (empates mantêm a ordem de
+    configuração). Se um falha, o próximo é tentado. Com ``hedge`` ligado,
+    se o primeiro não responde dentro do seu p95 (mínimo
+    ``hedge_min_delay``) o seguinte é disparado em paralelo; vale a primeira
+    resposta e a outra chamada é cancelada.
+    """
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        breakers: Dict[str, CircuitBreaker],
+        dispatcher: LLMDispatcher,
+        hedge: bool = False,
+        hedge_min_delay: float = 0.5,
+        hedge_quantile: float = 0.95,
+    ):
+        self.providers = providers
+        self.breakers = breakers
+        self.dispatcher = dispatcher
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_quantile = hedge_quantile
+        self.stats = {provider.name: ProviderStats() for provider in providers}
+
+    def ranked(self) -> List[LLMProvider]:
+        """Provedores disponíveis, do mais para o menos rápido."""
+        available = [
+            provider
+            for provider in self.providers
+            if self.breakers[provider.name].current_state() != CircuitState.OPEN
+        ]
+        return sorted(available, key=lambda provider: self.stats[provider.name].score())
+
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        p95 = self.stats[provider.name].quantile(self.hedge_quantile)
+        return max(self.hedge_min_delay, p95 or 0.0)
+
+    async def complete(
+        self, messages: List[Dict], priority: Optional[Priority] = None
+    ) -> dict:
+        """Completion do provedor que responder primeiro com sucesso."""
+        remaining = self.ranked()
+        if not remaining:
+            raise ProviderUnavailable()
+
+        pending = set()
+        errors = []
+        current = None
+        try:
+            while remaining or pending:
+                if remaining and not pending:
+                    if current is not None:
+                        LLM_PROVIDER_FAILOVERS.labels(provider=remaining[0].name).inc()
+                    current = remaining.pop(0)
+                    pending.add(
+                        asyncio.ensure_future(self._attempt(current, messages, priority))
+                    )
+
+                timeout = (
+                    self._hedge_delay(current) if self.hedge and remaining else None
+                )
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # O provedor atual passou do seu p95: dispara o próximo
+                    current = remaining.pop(0)
+                    LLM_HEDGED_REQUESTS.labels(provider=current.name).inc()
+                    pending.add(
+                        asyncio.ensure_future(self._attempt(current, messages, priority))
+                    )
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        raise _most_relevant(errors)
+
+    async def _attempt(
+        self,
+        provider: LLMProvider,
+        messages: List[Dict],
+        priority: Optional[Priority] = None,
+    ) -> dict:
+        breaker = self.breakers[provider.name]
+        if not breaker.allow_request():
+            raise ProviderUnavailable()
+
+        started_at = time.perf_counter()
+        try:
+            async with self.dispatcher.slot(provider.model, priority):
+                result = await provider.complete(messages)
+        except asyncio.CancelledError:
+            # Perdeu o hedge ou o cliente desistiu: não conta como falha, mas
+            # a demora entra na latência para o provedor não ficar sempre à frente
+            breaker.release()
+            elapsed = time.perf_counter() - started_at
+            self.stats[provider.name].record_abandoned(elapsed)
+            LLM_PROVIDER_LATENCY.labels(provider=provider.name, outcome="cancelled").observe(
+                elapsed
+            )
+            raise
+        except DispatchRejected:
+            breaker.release()
+            raise
+        except Exception as e:
+            self.stats[provider.name].record_error()
+            await breaker.record_failure()
+            LLM_PROVIDER_LATENCY.labels(provider=provider.name, outcome="error").observe(
+                time.perf_counter() - started_at
+            )
+            logger.warning(f"⚠️ Falha no provedor {provider.name}: {str(e)}")
+            raise
+
+        elapsed = time.perf_counter() - started_at
+        LLM_PROVIDER_LATENCY.labels(provider=provider.name, outcome="success").observe(
+            elapsed
+        )
+        self.stats[provider.name].record_success(elapsed)
+        await breaker.record_success()
+        return {**result, "provider": provider.name}
+
+    async def stream(
+        self, messages: List[Dict], priority: Optional[Priority] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Stream do provedor mais rápido disponível.
+
+        O failover só acontece antes do primeiro token; depois dele um erro
+        encerra o stream. Gera ``{"content", "model", "provider"}`` por token.
+        """
+        providers = self.ranked()
+        if not providers:
+            raise ProviderUnavailable()
+
+        errors = []
+        for index, provider in enumerate(providers):
+            breaker = self.breakers[provider.name]
+            if not breaker.allow_request():
+                errors.append(ProviderUnavailable())
+                continue
+            if index and errors:
+                LLM_PROVIDER_FAILOVERS.labels(provider=provider.name).inc()
+
+            started_at = time.perf_counter()
+            first_token_at = None
+            try:
+                async with self.dispatcher.slot(provider.model, priority) as ticket:
+                    async for delta, model in provider.stream(messages):
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            LLM_TIME_TO_FIRST_TOKEN.labels(model=provider.model).observe(
+                                first_token_at - started_at
+                            )
+                            # O AIMD olha a latência do provedor, sem a espera na fila
+                            ticket.latency = first_token_at - ticket.started_at
+                        yield {"content": delta, "model": model, "provider": provider.name}
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release()
+                raise
+            except DispatchRejected as e:
+                breaker.release()
+                errors.append(e)
+                continue
+            except Exception as e:
+                self.stats[provider.name].record_error()
+                await breaker.record_failure()
+                logger.warning(f"⚠️ Falha no provedor {provider.name}: {str(e)}")
+                if first_token_at is not None:
+                    raise
+                errors.append(e)
+                continue
+
+            self.stats[provider.name].record_success(
+                (first_token_at or time.perf_counter()) - started_at
+            )
+            await breaker.record_success()
+            return
+
+        raise _most_relevant(errors)
+
+
+def _most_relevant(errors: List[Exception]) -> Exception:
+    """Erro a reportar: falha real do provedor > fila > circuito aberto."""
+    for kind in (ProviderError, Exception):
+        for error in reversed(errors):
+            if isinstance(error, kind) and not isinstance(
+                error, (ProviderUnavailable, DispatchRejected)
+            ):
+                return error
+    for error in errors:
+        if isinstance(error, DispatchRejected):
+            return error
+    return ProviderUnavailable()
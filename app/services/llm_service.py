@@ -1,74 +1,394 @@
-from openai import AsyncOpenAI, OpenAIError
+import asyncio
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+
 from app.core.config import settings
+from app.core.metrics import LLM_CACHE_REQUESTS
+from app.core.tracing import stage
 from app.services.cache_service import CacheService
-from app.services.circuit_breaker import CircuitBreaker, CircuitState
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.llm_dispatcher import (
+    DispatchRejected,
+    LLMDispatcher,
+    Priority,
+    priority_scope,
+)
+from app.services.llm_providers import OpenAIProvider, ProviderError
+from app.services.llm_router import LLMRouter, ProviderUnavailable
+from app.services.quota_service import QuotaExceeded, QuotaService, Usage
+from app.services.single_flight import SingleFlight
+from app.services.tokenizer import count_message_tokens, count_tokens
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+    from app.services.semantic_cache import SemanticCache
 
 
 class OpenAIClient:
-    """Cliente para interagir com a API da OpenAI com cache e circuit breaker."""
+    """
+    Cliente de chat com cache, coalescência e circuit breaker.
+
+    As chamadas vão para o ``LLMRouter``, que escolhe entre os provedores
+    configurados; sem ``router`` usa só a OpenAI com ``client``.
+    """
 
     def __init__(
-        self, api_key: str = settings.OPENAI_API_KEY, model: str = "gpt-4o-mini"
+        self,
+        api_key: str = settings.OPENAI_API_KEY,
+        model: str = settings.OPENAI_MODEL,
+        client: "AsyncOpenAI" = None,
+        cache: CacheService = None,
+        circuit_breaker: CircuitBreaker = None,
+        single_flight: SingleFlight = None,
+        semantic_cache: "SemanticCache" = None,
+        dispatcher: LLMDispatcher = None,
+        router: LLMRouter = None,
+        quota: QuotaService = None,
     ):
         self.api_key = api_key
         self.model = model
-        self.client = AsyncOpenAI(api_key=self.api_key, max_retries=3)
-        self.cache = CacheService()
-        self.circuit_breaker = CircuitBreaker("openai_api")
+        self.client = client
+        self.cache = cache or CacheService()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker("openai_api")
+        self.single_flight = single_flight or SingleFlight("llm")
+        self.semantic_cache = semantic_cache
+        self.dispatcher = dispatcher or LLMDispatcher()
+        if router is None:
+            if self.client is None:
+                # Importado aqui: o SDK da OpenAI é a dependência mais lenta de importar
+                from openai import AsyncOpenAI
 
-    async def get_chat_completions(self, message: str, user_id: str = None) -> dict:
-        # 1. Verifica cache primeiro
+                self.client = AsyncOpenAI(
+                    api_key=self.api_key, max_retries=settings.OPENAI_MAX_RETRIES
+                )
+            router = LLMRouter(
+                [OpenAIProvider(self.client, self.model)],
+                {"openai": self.circuit_breaker},
+                self.dispatcher,
+            )
+        self.router = router
+        self.quota = quota
+
+    async def get_cached_response(self, message: str, user_id: str = None) -> dict:
+        """Busca no cache exato e, se habilitado, no cache semântico."""
         cached_response = await self.cache.get_cached_response(
             message, self.model, user_id
         )
         if cached_response:
             return cached_response
+        return await self._semantic_lookup(message, user_id)
+
+    async def _semantic_lookup(self, message: str, user_id: str = None) -> Optional[dict]:
+        # Cache semântico (prompts quase idênticos), só para respostas globais
+        if self.semantic_cache is None or user_id:
+            return None
+        with stage("semantic_lookup"):
+            similar_response = await self.semantic_cache.lookup(message, self.model)
+        LLM_CACHE_REQUESTS.labels(
+            layer="semantic", result="hit" if similar_response else "miss"
+        ).inc()
+        if similar_response:
+            return {**similar_response, "from_cache": True}
+        return None
+
+    async def cache_completion(
+        self, message: str, result: dict, user_id: str = None
+    ) -> None:
+        """Salva uma completion no cache exato e no semântico."""
+        await self.cache.cache_response(message, self.model, result, user_id=user_id)
+        if self.semantic_cache is not None and not user_id:
+            await self.semantic_cache.add(message, self.model, result)
 
-        # 2. Verifica circuit breaker
-        circuit_state = await self.circuit_breaker.get_circuit_state()
+    async def get_chat_completions(
+        self,
+        message: str,
+        user_id: str = None,
+        history: List[Dict] = None,
+        account: str = None,
+    ) -> dict:
+        """
+        Completion com cache, coalescência e cota.
 
-        if circuit_state == CircuitState.OPEN:
-            return {
-                "content": "Serviço temporariamente indisponível. Tente novamente em alguns minutos.",
-                "model": self.model,
-                "from_cache": False,
-                "circuit_open": True,
-            }
+        ``account`` é o usuário cobrado pela chamada ao provedor (cotas e
+        contabilização de tokens); ``user_id`` só separa o cache por usuário.
+        """
+        # Com histórico a resposta depende da conversa: sem cache nem coalescência
+        if history:
+            return self._check_quota(
+                account, message, history
+            ) or await self._create_completion(message, user_id, history, account)
 
-        # 3. Tenta chamar a API
+        # 1. Verifica cache primeiro
+        cached_response = await self.get_cached_response(message, user_id)
+        if cached_response:
+            return cached_response
+
+        # 2. Chama a API uma única vez para prompts idênticos concorrentes
+        return self._check_quota(account, message) or await self._coalesced_completion(
+            message, user_id, account
+        )
+
+    async def _coalesced_completion(
+        self, message: str, user_id: str = None, account: str = None
+    ) -> dict:
+        # A cota é checada por quem chama, antes: quem pega carona na chamada
+        # de outro usuário não é recusado pela cota dele
+        cache_key = self.cache._generate_cache_key(message, self.model, user_id)
+        return await self.single_flight.do(
+            cache_key, lambda: self._create_completion(message, user_id, account=account)
+        )
+
+    def _cacheable(self, provider: Optional[str]) -> bool:
+        """
+        Se a resposta do ``provider`` pode ir para o cache.
+
+        A chave leva os parâmetros do provedor primário: uma resposta de
+        failover (outro modelo, outro ``max_tokens``) não é gravada sob ela.
+        """
+        return provider is None or provider == self.cache.params.get("provider")
+
+    def _check_quota(
+        self, account: str, message: str, history: List[Dict] = None
+    ) -> Optional[dict]:
+        """Resposta de cota excedida, ou None se a chamada pode seguir."""
+        if self.quota is None:
+            return None
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model, messages=[{"role": "user", "content": message}]
+            self.quota.check(account, self.model, self._build_messages(message, history))
+        except QuotaExceeded as e:
+            return self._quota_response(e)
+        return None
+
+    def _record_usage(
+        self, account: str, messages: List[Dict], response: dict
+    ) -> None:
+        """Contabiliza os tokens informados pelo provedor (ou estimados, sem eles)."""
+        if self.quota is None:
+            return
+        model = response.get("model") or self.model
+        usage = response.get("usage")
+        if usage:
+            usage = Usage(usage["prompt_tokens"], usage["completion_tokens"])
+        else:
+            usage = Usage(
+                count_message_tokens(messages, model),
+                count_tokens(response.get("content", ""), model),
             )
+        self.quota.record(account, model, usage)
 
-            result = {
-                "content": response.choices[0].message.content,
-                "model": response.model,
-                "from_cache": False,
-                "circuit_open": False,
-            }
+    async def batch_completions(
+        self,
+        messages: List[str],
+        concurrency: int,
+        ordered: bool = True,
+        account: str = None,
+    ) -> AsyncIterator[Tuple[int, dict]]:
+        """
+        Completions de vários prompts, gerando ``(índice, resposta)``.
 
-            # 4. Sucesso: salva no cache e registra no circuit breaker
-            await self.cache.cache_response(
-                message, self.model, result, user_id=user_id
-            )
-            await self.circuit_breaker.record_success()
-
-            return result
-
-        except OpenAIError as e:
-            await self.circuit_breaker.record_failure()
-            return {
-                "content": f"Erro ao conectar com a OpenAI: {str(e)}",
-                "model": self.model,
-                "from_cache": False,
-                "circuit_open": False,
-            }
+        Os hits saem de uma só consulta ao cache (L1 e um MGET); os misses
+        vão ao LLM com no máximo ``concurrency`` chamadas simultâneas e
+        prioridade baixa no dispatcher, para não atrasar o chat interativo.
+        Com ``ordered`` as respostas saem na ordem dos prompts; senão, na
+        ordem em que ficam prontas (hits primeiro).
+        """
+        cached = await self.cache.get_cached_responses(messages, self.model)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def resolve(index: int, message: str) -> Tuple[int, dict]:
+            async with semaphore:
+                # A task tem seu próprio contexto: a prioridade não vaza
+                with priority_scope(Priority.LOW):
+                    response = await self._semantic_lookup(message)
+                    if response is None:
+                        response = self._check_quota(
+                            account, message
+                        ) or await self._coalesced_completion(message, account=account)
+            return index, response
+
+        tasks = {
+            index: asyncio.ensure_future(resolve(index, message))
+            for index, (message, hit) in enumerate(zip(messages, cached))
+            if hit is None
+        }
+        try:
+            if not ordered:
+                for index, hit in enumerate(cached):
+                    if hit is not None:
+                        yield index, {**hit, "from_cache": True}
+                for next_done in asyncio.as_completed(tasks.values()):
+                    yield await next_done
+                return
+
+            for index, hit in enumerate(cached):
+                if hit is not None:
+                    yield index, {**hit, "from_cache": True}
+                else:
+                    yield await tasks[index]
+        finally:
+            # Cliente desconectou no meio do stream: não continua chamando o LLM
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    def _circuit_open_response(self) -> dict:
+        return {
+            "content": "Serviço temporariamente indisponível. Tente novamente em alguns minutos.",
+            "model": self.model,
+            "from_cache": False,
+            "circuit_open": True,
+        }
+
+    def _rejected_response(self, reason: str) -> dict:
+        return {
+            "content": "Serviço sobrecarregado. Tente novamente em instantes.",
+            "model": self.model,
+            "from_cache": False,
+            "circuit_open": False,
+            "error": True,
+            "rejected": reason,
+        }
+
+    def _quota_response(self, error: QuotaExceeded) -> dict:
+        return {
+            "content": f"Cota de uso {error.period} excedida.",
+            "model": self.model,
+            "from_cache": False,
+            "circuit_open": False,
+            "error": True,
+            "quota_exceeded": error.period,
+            "retry_after": error.retry_after,
+        }
+
+    def _error_response(self, error: Exception) -> dict:
+        if isinstance(error, ProviderError):
+            content = f"Erro ao conectar com o provedor {error.provider}: {str(error)}"
+        else:
+            content = f"Erro inesperado: {str(error)}"
+        return {
+            "content": content,
+            "model": self.model,
+            "from_cache": False,
+            "circuit_open": False,
+            "error": True,
+        }
+
+    @staticmethod
+    def _build_messages(message: str, history: List[Dict] = None) -> List[Dict]:
+        return [*(history or []), {"role": "user", "content": message}]
+
+    async def _create_completion(
+        self,
+        message: str,
+        user_id: str = None,
+        history: List[Dict] = None,
+        account: str = None,
+    ) -> dict:
+        """Chama o provedor mais rápido disponível e salva no cache."""
+        # 3. O router pula provedores com circuito aberto, espera uma vaga no
+        # dispatcher e faz failover (ou hedge) entre os provedores
+        messages = self._build_messages(message, history)
+        try:
+            with stage("llm_call"):
+                response = await self.router.complete(messages)
+        except ProviderUnavailable:
+            return self._circuit_open_response()
+        except DispatchRejected as e:
+            return self._rejected_response(e.reason)
         except Exception as e:
-            await self.circuit_breaker.record_failure()
-            return {
-                "content": f"Erro inesperado: {str(e)}",
-                "model": self.model,
-                "from_cache": False,
-                "circuit_open": False,
-            }
+            return self._error_response(e)
+
+        self._record_usage(account, messages, response)
+        result = {
+            "content": response["content"],
+            "model": response["model"],
+            "from_cache": False,
+            "circuit_open": False,
+        }
+
+        # 4. Sucesso: salva no cache (só respostas do provedor da chave)
+        if not history and self._cacheable(response.get("provider")):
+            await self.cache_completion(message, result, user_id)
+
+        return result
+
+    async def stream_chat_completions(
+        self,
+        message: str,
+        user_id: str = None,
+        history: List[Dict] = None,
+        account: str = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Prepara a completion em streaming e devolve o gerador de eventos.
+
+        O cache e a cota são consultados aqui, antes do primeiro token: com a
+        cota excedida levanta ``QuotaExceeded``, e o chamador ainda pode
+        responder 429 em vez de abrir o stream. O gerador emite eventos
+        ``{"type": "token", "content": ...}`` conforme os tokens chegam e um
+        evento final ``{"type": "done", ...}`` com o resultado agregado. O
+        cache não é preenchido aqui: o evento final traz ``cacheable=True``
+        quando a resposta veio completa da API, para que o chamador salve em
+        background após o fim do stream.
+        """
+        # 1. Verifica cache primeiro (só para prompts sem histórico)
+        cached_response = (
+            None if history else await self.get_cached_response(message, user_id)
+        )
+        if cached_response:
+            return self._replay_stream(cached_response)
+
+        if self.quota is not None:
+            self.quota.check(account, self.model, self._build_messages(message, history))
+        return self._stream_completion(message, history, account)
+
+    @staticmethod
+    async def _replay_stream(response: dict) -> AsyncIterator[dict]:
+        yield {"type": "token", "content": response.get("content", "")}
+        yield {"type": "done", **response, "cacheable": False}
+
+    async def _stream_completion(
+        self, message: str, history: List[Dict] = None, account: str = None
+    ) -> AsyncIterator[dict]:
+        # 2. Repassa os tokens conforme chegam. A vaga no dispatcher fica
+        # reservada até o fim do stream; quem acompanha os tokens ao vivo tem
+        # prioridade na fila
+        messages = self._build_messages(message, history)
+        chunks = []
+        model = self.model
+        provider = None
+        result = None
+        try:
+            async for event in self.router.stream(messages, priority=Priority.HIGH):
+                model = event["model"]
+                provider = event.get("provider")
+                chunks.append(event["content"])
+                yield {"type": "token", "content": event["content"]}
+        except ProviderUnavailable:
+            result = self._circuit_open_response()
+        except DispatchRejected as e:
+            result = self._rejected_response(e.reason)
+        except Exception as e:
+            result = self._error_response(e)
+        finally:
+            # Tokens gerados contam mesmo se o cliente desistiu no meio do stream
+            if chunks:
+                self._record_usage(
+                    account, messages, {"content": "".join(chunks), "model": model}
+                )
+
+        if result is not None:
+            yield {"type": "token", "content": result["content"]}
+            yield {"type": "done", **result, "cacheable": False}
+            return
+
+        # 3. Sucesso: entrega o resultado agregado
+        yield {
+            "type": "done",
+            "content": "".join(chunks),
+            "model": model,
+            "from_cache": False,
+            "circuit_open": False,
+            "cacheable": not history and self._cacheable(provider),
+        }
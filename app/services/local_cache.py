@@ -0,0 +1,104 @@
+"""Cache L1 em memória do processo (LRU com TTL e limite de bytes)."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.core.metrics import L1_CACHE_EVICTIONS, L1_CACHE_REQUESTS
+from app.core.serialization import dumps
+
+
+class LocalCache:
+    """
+    Cache LRU em memória, limitado por número de itens e por bytes.
+
+    Cada entrada guarda o valor, o instante de expiração e o tamanho estimado
+    (JSON serializado). Entradas expiradas são descartadas na leitura e, quando
+    algum limite é excedido, as menos usadas recentemente são removidas
+    primeiro. Não é thread-safe: pensado para uso dentro de um único event loop.
+    """
+
+    def __init__(self, max_items: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retorna o valor em cache ou None (miss ou expirado)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._record_miss()
+            return None
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self._record_eviction("expired")
+            self._record_miss()
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        L1_CACHE_REQUESTS.labels(result="hit").inc()
+        return value
+
+    def contains(self, key: str) -> bool:
+        """Se a chave está em cache e válida, sem contar acesso nem mudar o LRU."""
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Armazena um valor com TTL em segundos."""
+        size = len(dumps(value))
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_items:
+            self._evict_oldest("capacity")
+        while self._bytes > self.max_bytes:
+            self._evict_oldest("bytes")
+
+    def delete(self, key: str) -> bool:
+        """Remove uma chave; retorna True se ela existia."""
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict_oldest(self, reason: str) -> None:
+        key = next(iter(self._entries))
+        self._remove(key)
+        self._record_eviction(reason)
+
+    def _record_miss(self) -> None:
+        self.misses += 1
+        L1_CACHE_REQUESTS.labels(result="miss").inc()
+
+    def _record_eviction(self, reason: str) -> None:
+        self.evictions += 1
+        L1_CACHE_EVICTIONS.labels(reason=reason).inc()
@@ -0,0 +1,59 @@
+"""Profiler por amostragem do próprio processo (saída em collapsed stacks)."""
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# Um profiling por processo de cada vez
+_running = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Já existe um profiling em andamento neste processo."""
+
+
+class SamplingProfiler:
+    """
+    Amostra a pilha de uma thread a cada ``interval`` segundos.
+
+    Roda numa thread própria lendo ``sys._current_frames()``, então não
+    instrumenta nem para o código amostrado; o custo fica na thread do
+    profiler. O resultado sai no formato "collapsed" (``a;b;c contagem``),
+    aceito por ``flamegraph.pl``, speedscope e similares.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+
+    def run(self, seconds: float) -> str:
+        """Amostra por ``seconds`` segundos e devolve as pilhas agregadas."""
+        if not _running.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample()
+                time.sleep(self.interval)
+        finally:
+            _running.release()
+        return self.collapsed()
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common(limit)
+        )
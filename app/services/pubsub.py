@@ -0,0 +1,76 @@
+"""Assinatura de canais Redis pub/sub para sincronizar estado entre workers."""
+
+import asyncio
+from typing import Callable, Dict
+
+import redis.asyncio as redis
+from loguru import logger
+
+
+class PubSubListener:
+    """
+    Escuta canais Redis em uma task de background e despacha as mensagens.
+
+    Cada canal tem um handler síncrono ``handler(data: str)``. A conexão é
+    lida em ciclos de ``poll_timeout`` segundos (menor que o
+    ``socket_timeout`` do pool), então um canal ocioso não derruba a
+    assinatura. Em caso de erro de conexão ela é refeita com backoff
+    exponencial.
+    """
+
+    def __init__(self, redis_client: redis.Redis, poll_timeout: float = 1.0):
+        self.redis_client = redis_client
+        self.poll_timeout = poll_timeout
+        self._handlers: Dict[str, Callable[[str], None]] = {}
+        self._task = None
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Registra o handler de um canal (antes de ``start``)."""
+        self._handlers[channel] = handler
+
+    def start(self) -> None:
+        """Inicia a task de escuta."""
+        if self._handlers and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancela a task de escuta."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        backoff = 1
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self._handlers)
+                backoff = 1
+                while True:
+                    # ``listen()`` lê com o ``socket_timeout`` do pool e cai por
+                    # TimeoutError quando o canal fica ocioso; com um timeout
+                    # menor que ele a leitura só devolve None
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=self.poll_timeout
+                    )
+                    if message is None:
+                        continue
+                    handler = self._handlers.get(message["channel"])
+                    if handler is None:
+                        continue
+                    try:
+                        handler(message["data"])
+                    except Exception as e:
+                        logger.error(f"Erro ao processar mensagem pub/sub: {str(e)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Pub/sub desconectado ({str(e)}), reconectando...")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
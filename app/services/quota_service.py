@@ -0,0 +1,314 @@
+"""Contabilização de tokens e custo por usuário e modelo, com cotas diárias e mensais."""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from app.core.metrics import LLM_COST, LLM_TOKENS, QUOTA_REJECTIONS
+from app.services.tokenizer import count_message_tokens
+
+# Por quanto tempo o Redis guarda os contadores de cada período (segundos)
+PERIOD_TTL = {"daily": 2 * 86400, "monthly": 35 * 86400}
+
+# Custo guardado em milionésimos de dólar: o HINCRBY só soma inteiros
+MICROS = 1_000_000
+
+
+class Usage(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+
+    @property
+    def total(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class QuotaExceeded(Exception):
+    """A chamada estouraria a cota do período; ``retry_after`` até a virada."""
+
+    def __init__(self, period: str, retry_after: int):
+        super().__init__(f"Cota {period} excedida")
+        self.period = period
+        self.retry_after = retry_after
+
+
+def period_keys(now: datetime) -> Dict[str, str]:
+    """Identificadores dos períodos correntes (UTC)."""
+    return {"daily": now.strftime("%Y%m%d"), "monthly": now.strftime("%Y%m")}
+
+
+def seconds_until_reset(period: str, now: datetime) -> int:
+    if period == "daily":
+        reset = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        reset = (now.replace(day=28) + timedelta(days=4)).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+    return max(int((reset - now).total_seconds()), 1)
+
+
+class QuotaService:
+    """
+    Uso de tokens por usuário e modelo, com cotas checadas antes da chamada.
+
+    ``record`` só soma em memória. Uma task de background grava os deltas
+    no Redis a cada ``flush_interval`` num único pipeline (HINCRBY nos hashes
+    ``usage:<usuário>:<período>``), e os totais devolvidos pelo HINCRBY
+    atualizam a visão local. A cada ``rollup_interval`` os mesmos deltas vão
+    para o MongoDB num ``bulk_write`` de ``$inc`` (coleção ``usage_rollups``),
+    para relatórios. Nada disso acrescenta idas ao Redis por requisição.
+
+    ``check`` estima o custo da chamada (tokens do prompt mais
+    ``completion_estimate``) e compara com o total conhecido mais o que ainda
+    não foi gravado. O total de um usuário que o worker ainda não conhece é
+    lido do Redis em segundo plano; até lá, e entre flushes de outros
+    workers, a cota pode ser ultrapassada por pouco: a checagem é best-effort.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        collection=None,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        overrides: Optional[Dict[str, Dict[str, float]]] = None,
+        pricing: Optional[Dict[str, List[float]]] = None,
+        completion_estimate: int = 500,
+        flush_interval: float = 1.0,
+        rollup_interval: float = 60.0,
+        sync_interval: float = 30.0,
+    ):
+        self.redis_client = redis_client
+        self.collection = collection
+        self.limits = limits or {}
+        self.overrides = overrides or {}
+        # Preço por 1M de tokens: [entrada, saída]; o prefixo mais longo vence
+        self.pricing = sorted((pricing or {}).items(), key=lambda item: -len(item[0]))
+        self.completion_estimate = completion_estimate
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.sync_interval = sync_interval
+        # Deltas ainda não gravados: (usuário, modelo) -> contadores, e a soma
+        # por usuário (tokens, custo) incluindo o lote que está sendo gravado
+        self._pending: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        self._unflushed: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self._pending_rollups: Dict[Tuple[str, str, str], Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        # Totais conhecidos no Redis: (usuário, período) -> {"tokens", "cost"}
+        self._known: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._synced_at: Dict[str, float] = {}
+        self._pruned_at = time.monotonic()
+        self._syncing: Dict[str, asyncio.Task] = {}
+        self._task = None
+
+    @property
+    def enforcing(self) -> bool:
+        return bool(self.overrides) or any(
+            value for limits in self.limits.values() for value in limits.values()
+        )
+
+    def cost_micros(self, model: str, usage: Usage) -> int:
+        for prefix, (input_price, output_price) in self.pricing:
+            if model.startswith(prefix):
+                return int(
+                    usage.prompt_tokens * input_price + usage.completion_tokens * output_price
+                )
+        return 0
+
+    def estimate(self, model: str, messages: List[Dict]) -> Usage:
+        return Usage(count_message_tokens(messages, model), self.completion_estimate)
+
+    def check(self, account: str, model: str, messages: List[Dict]) -> None:
+        """Levanta ``QuotaExceeded`` se a chamada estimada passa de alguma cota."""
+        if not account or not self.enforcing:
+            return
+        self._schedule_sync(account)
+
+        estimate = self.estimate(model, messages)
+        estimated_tokens = estimate.total
+        estimated_cost = self.cost_micros(model, estimate)
+        pending_tokens, pending_cost = self._unflushed.get(account, (0, 0))
+        now = datetime.now(timezone.utc)
+        for period, key in period_keys(now).items():
+            limits = {
+                **self.limits.get(period, {}),
+                **self.overrides.get(account, {}).get(period, {}),
+            }
+            known = self._known.get((account, key), {})
+            used_tokens = known.get("tokens", 0) + pending_tokens
+            used_cost = known.get("cost", 0) + pending_cost
+            token_limit = limits.get("tokens")
+            cost_limit = limits.get("cost_usd")
+            if (token_limit and used_tokens + estimated_tokens > token_limit) or (
+                cost_limit and used_cost + estimated_cost > cost_limit * MICROS
+            ):
+                QUOTA_REJECTIONS.labels(period=period).inc()
+                raise QuotaExceeded(period, seconds_until_reset(period, now))
+
+    def record(self, account: str, model: str, usage: Usage) -> None:
+        """Soma o uso de uma chamada (só em memória; o flush grava depois)."""
+        cost = self.cost_micros(model, usage)
+        LLM_TOKENS.labels(model=model, kind="prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels(model=model, kind="completion").inc(usage.completion_tokens)
+        LLM_COST.labels(model=model).inc(cost / MICROS)
+        if not account:
+            return
+        day = period_keys(datetime.now(timezone.utc))["daily"]
+        for pending in (
+            self._pending[(account, model)],
+            self._pending_rollups[(account, model, day)],
+        ):
+            pending["prompt_tokens"] += usage.prompt_tokens
+            pending["completion_tokens"] += usage.completion_tokens
+            pending["requests"] += 1
+            pending["cost_micros"] += cost
+        unflushed = self._unflushed[account]
+        unflushed[0] += usage.total
+        unflushed[1] += cost
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Para a task e grava o que ficou pendente."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        await self.flush_rollups()
+
+    async def _run(self) -> None:
+        last_rollup = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - last_rollup >= self.rollup_interval:
+                last_rollup = time.monotonic()
+                await self.flush_rollups()
+
+    async def flush(self) -> None:
+        """Grava os deltas pendentes no Redis num único pipeline."""
+        self._prune_synced()
+        if not self._pending or self.redis_client is None:
+            return
+        pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+
+        keys = period_keys(datetime.now(timezone.utc))
+        totals = defaultdict(lambda: defaultdict(int))
+        for (account, model), counters in pending.items():
+            totals[account]["tokens"] += (
+                counters["prompt_tokens"] + counters["completion_tokens"]
+            )
+            totals[account]["cost"] += counters["cost_micros"]
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                order = []
+                for (account, model), counters in pending.items():
+                    for period, key in keys.items():
+                        redis_key = f"usage:{account}:{key}"
+                        for field in ("prompt_tokens", "completion_tokens", "requests"):
+                            pipe.hincrby(redis_key, f"{model}:{field}", counters[field])
+                for account, total in totals.items():
+                    for period, key in keys.items():
+                        redis_key = f"usage:{account}:{key}"
+                        pipe.hincrby(redis_key, "tokens", total["tokens"])
+                        pipe.hincrby(redis_key, "cost_micros", total["cost"])
+                        pipe.expire(redis_key, PERIOD_TTL[period])
+                        order.append((account, key))
+                results = await pipe.execute()
+        except Exception as e:
+            # Devolve os deltas para a próxima tentativa
+            for item, counters in pending.items():
+                for field, value in counters.items():
+                    self._pending[item][field] += value
+            logger.error(f"Erro ao gravar uso de tokens no Redis: {str(e)}")
+            return
+
+        # Os totais do Redis já incluem o lote: sai da soma local
+        for account, total in totals.items():
+            unflushed = self._unflushed[account]
+            unflushed[0] -= total["tokens"]
+            unflushed[1] -= total["cost"]
+            if unflushed == [0, 0]:
+                del self._unflushed[account]
+
+        # Os últimos resultados são (tokens, cost_micros, expire) por usuário e período
+        current = set(keys.values())
+        self._known = {
+            item: known for item, known in self._known.items() if item[1] in current
+        }
+        tail = results[len(results) - 3 * len(order):]
+        for index, (account, key) in enumerate(order):
+            tokens, cost, _ = tail[3 * index: 3 * index + 3]
+            self._known[(account, key)] = {"tokens": int(tokens), "cost": int(cost)}
+
+    def _prune_synced(self) -> None:
+        """Esquece as leituras vencidas: o próximo ``check`` relê do Redis."""
+        now = time.monotonic()
+        if now - self._pruned_at < self.sync_interval:
+            return
+        self._pruned_at = now
+        self._synced_at = {
+            account: synced_at
+            for account, synced_at in self._synced_at.items()
+            if now - synced_at < self.sync_interval
+        }
+
+    async def flush_rollups(self) -> None:
+        """Soma os deltas acumulados nos documentos diários do MongoDB."""
+        if not self._pending_rollups or self.collection is None:
+            return
+        pending = self._pending_rollups
+        self._pending_rollups = defaultdict(lambda: defaultdict(int))
+        operations = [
+            UpdateOne(
+                {"userId": account, "model": model, "day": day},
+                {"$inc": dict(counters)},
+                upsert=True,
+            )
+            for (account, model, day), counters in pending.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            for item, counters in pending.items():
+                for field, value in counters.items():
+                    self._pending_rollups[item][field] += value
+            logger.error(f"Erro ao gravar rollups de uso no MongoDB: {str(e)}")
+
+    def _schedule_sync(self, account: str) -> None:
+        synced_at = self._synced_at.get(account)
+        if (
+            self.redis_client is None
+            or account in self._syncing
+            or (synced_at is not None and time.monotonic() - synced_at < self.sync_interval)
+        ):
+            return
+        self._syncing[account] = asyncio.ensure_future(self._sync(account))
+
+    async def _sync(self, account: str) -> None:
+        """Lê do Redis os totais do usuário (inclui o uso de outros workers)."""
+        try:
+            keys = list(period_keys(datetime.now(timezone.utc)).values())
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hmget(f"usage:{account}:{key}", "tokens", "cost_micros")
+                results = await pipe.execute()
+            for key, (tokens, cost) in zip(keys, results):
+                self._known[(account, key)] = {"tokens": int(tokens or 0), "cost": int(cost or 0)}
+            self._synced_at[account] = time.monotonic()
+        except Exception as e:
+            logger.error(f"Erro ao ler uso de tokens do Redis: {str(e)}")
+        finally:
+            self._syncing.pop(account, None)
@@ -0,0 +1,148 @@
+"""
+Agrupamento de escritas no Redis: um pipeline por janela curta ou por requisição.
+
+Cada escrita é uma função que enfileira comandos num pipeline
+(``lambda pipe: pipe.setex(...)``). O ``RedisBatcher`` junta as escritas
+que chegam de qualquer requisição dentro de ``window`` segundos e as envia
+num único pipeline; cada chamador recebe só os resultados dos seus
+comandos. Dentro de ``batcher.scope()`` as escritas nem esperam a janela:
+ficam guardadas e saem juntas quando o escopo termina (fim da requisição).
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.metrics import REDIS_BATCH_COMMANDS
+
+Write = Callable[[object], None]
+
+
+class _Scope:
+    def __init__(self):
+        self.writes: List[Write] = []
+        self.closed = False
+
+
+_scope: ContextVar[Optional[_Scope]] = ContextVar("redis_batch_scope", default=None)
+
+
+class RedisBatcher:
+    """
+    Junta escritas de várias corrotinas num só pipeline (sem MULTI).
+
+    As escritas agrupadas não são atômicas entre si: cada uma continua
+    idempotente ou tolerante a falha como era sozinha. A janela é disparada
+    pela primeira escrita pendente e encerrada antes se ``max_batch``
+    escritas se acumularem.
+    """
+
+    def __init__(self, redis_client, window: float = 0.002, max_batch: int = 128):
+        self.redis_client = redis_client
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Write, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    async def submit(self, write: Write) -> Optional[list]:
+        """
+        Envia uma escrita e devolve os resultados dos seus comandos.
+
+        Num ``scope()`` aberto a escrita é adiada para o fim do escopo e
+        retorna None na hora. Fora dele espera o próximo pipeline; erros de
+        comando são levantados para o chamador.
+        """
+        scope = _scope.get()
+        if scope is not None and not scope.closed:
+            scope.writes.append(write)
+            return None
+        return await self._enqueue(write)
+
+    @asynccontextmanager
+    async def scope(self):
+        """Adia as escritas feitas dentro do bloco e as envia juntas ao sair."""
+        scope = _Scope()
+        token = _scope.set(scope)
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+            # Tasks que herdaram o escopo e terminem depois escrevem direto
+            scope.closed = True
+            if scope.writes:
+                await self._flush_scope(scope.writes)
+
+    async def _flush_scope(self, writes: List[Write]) -> None:
+        def write_all(pipe) -> None:
+            for write in writes:
+                write(pipe)
+
+        try:
+            await self._enqueue(write_all)
+        except Exception as e:
+            logger.error(f"Erro ao gravar escritas agrupadas no Redis: {str(e)}")
+
+    def _enqueue(self, write: Write) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((write, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._start_flush)
+        return future
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        task = asyncio.get_running_loop().create_task(self._flush(pending))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, pending: List[Tuple[Write, asyncio.Future]]) -> None:
+        slices = []
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for write, future in pending:
+                    start = len(pipe)
+                    try:
+                        write(pipe)
+                    except Exception as e:
+                        # Comandos já enfileirados por esta escrita são descartados
+                        del pipe.command_stack[start:]
+                        if not future.done():
+                            future.set_exception(e)
+                        continue
+                    slices.append((future, start, len(pipe)))
+                if not slices:
+                    return
+                REDIS_BATCH_COMMANDS.observe(len(pipe))
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for future, _, _ in slices:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, start, end in slices:
+            if future.done():
+                continue
+            own = results[start:end]
+            error = next((r for r in own if isinstance(r, Exception)), None)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(own)
+
+    async def close(self) -> None:
+        """Envia o que estiver pendente e espera os pipelines em andamento."""
+        self._start_flush()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
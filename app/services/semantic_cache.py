@@ -0,0 +1,360 @@
+"""Cache semântico: reaproveita respostas de prompts quase idênticos."""
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import socket
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from app.core.metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_SIMILARITY
+from app.services import cache_keys
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependência opcional
+    np = None
+
+_WORD = re.compile(r"\w+")
+
+# Prompts a partir deste tamanho são embutidos fora do event loop (~3 ms por 1000 caracteres)
+OFFLOAD_CHARS = 512
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Forma canônica do cache exato (``cache_keys``), sem caixa nem pontuação final."""
+    return cache_keys.normalize_prompt(prompt).casefold().strip(" .!?;:")
+
+
+def persisted_key(model: str) -> str:
+    """Hash do Redis com os índices persistidos do modelo (um campo por worker)."""
+    return f"semantic_cache:{model}"
+
+
+def persisted_dir(persist_path: str, model: str) -> str:
+    """Diretório com os índices persistidos do modelo (um arquivo por worker)."""
+    return os.path.join(persist_path, model)
+
+
+async def clear_persisted(model: str, redis_client=None, persist_path: str = None) -> None:
+    """Apaga os índices persistidos do modelo (Redis ou disco), de todos os workers."""
+    if redis_client is not None:
+        await redis_client.delete(persisted_key(model))
+    elif persist_path:
+        shutil.rmtree(persisted_dir(persist_path, model), ignore_errors=True)
+
+
+class Embedder:
+    """Interface de geração de embeddings (vetores normalizados em L2)."""
+
+    dim: int
+
+    async def embed(self, text: str):
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Embedder local e determinístico, sem chamadas de rede.
+
+    Projeta palavras e trigramas de caracteres em ``dim`` posições via hash
+    (feature hashing com sinal). Serve para testes e como padrão barato:
+    captura variações de pontuação, caixa e pequenas reescritas, não sinônimos.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text)
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f" {word} "
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    async def embed(self, text: str):
+        # O hash por feature é Python puro: prompts longos vão para uma thread
+        if len(text) >= OFFLOAD_CHARS:
+            return await asyncio.to_thread(self.embed_sync, text)
+        return self.embed_sync(text)
+
+    def embed_sync(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dim] += sign
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings da API da OpenAI (``text-embedding-3-small``)."""
+
+    def __init__(self, client, model: str = "text-embedding-3-small", dim: int = 256):
+        self.client = client
+        self.model = model
+        self.dim = dim
+
+    async def embed(self, text: str):
+        response = await self.client.embeddings.create(
+            model=self.model, input=text, dimensions=self.dim
+        )
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """
+    Índice vetorial em memória (busca exaustiva por produto interno).
+
+    Os vetores ficam numa matriz ``capacity x dim`` pré-alocada; quando cheia,
+    a entrada mais antiga é sobrescrita. Com vetores normalizados o produto
+    interno é a similaridade de cosseno.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.payloads: List[Optional[dict]] = [None] * capacity
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self._next = 0
+
+    def add(self, vector, payload: dict, created_at: float = None) -> None:
+        """Insere um vetor (sobrescrevendo o mais antigo se estiver cheio)."""
+        slot = self._next
+        self.vectors[slot] = vector
+        self.payloads[slot] = payload
+        self.created_at[slot] = created_at or time.time()
+        self._next = (slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def search(self, vector, min_created_at: float = 0.0):
+        """Retorna ``(similaridade, payload)`` do vizinho mais próximo válido."""
+        if not self.size:
+            return 0.0, None
+        scores = self.vectors[: self.size] @ vector
+        scores[self.created_at[: self.size] < min_created_at] = -1.0
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.payloads[best]
+
+    def dumps(self) -> bytes:
+        """Serializa o índice (vetores em ``.npz`` + payloads em JSON)."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            vectors=self.vectors[: self.size],
+            created_at=self.created_at[: self.size],
+        )
+        return json.dumps(
+            {
+                "arrays": base64.b64encode(buffer.getvalue()).decode(),
+                "payloads": self.payloads[: self.size],
+                "next": self._next,
+            }
+        ).encode()
+
+    def newest(self) -> float:
+        """Criação da entrada mais recente (0 se vazio)."""
+        return float(self.created_at[: self.size].max()) if self.size else 0.0
+
+    @classmethod
+    def merge(
+        cls, indexes: List["VectorIndex"], dim: int, capacity: int, min_created_at: float
+    ) -> "VectorIndex":
+        """
+        Junta índices de vários workers num só.
+
+        Descarta entradas expiradas e vetores repetidos (o mesmo prompt
+        indexado por mais de um worker) e fica com as ``capacity`` mais novas.
+        """
+        entries = {}
+        for index in indexes:
+            for slot in range(index.size):
+                created_at = float(index.created_at[slot])
+                if created_at < min_created_at:
+                    continue
+                key = index.vectors[slot].tobytes()
+                if key not in entries or entries[key][0] < created_at:
+                    entries[key] = (created_at, index.vectors[slot], index.payloads[slot])
+        merged = cls(dim, capacity)
+        newest = sorted(entries.values(), key=lambda entry: entry[0])[-capacity:]
+        for created_at, vector, payload in newest:
+            merged.add(vector, payload, created_at)
+        return merged
+
+    @classmethod
+    def loads(cls, data: bytes, dim: int, capacity: int) -> "VectorIndex":
+        """Reconstrói um índice serializado por ``dumps``."""
+        raw = json.loads(data)
+        arrays = np.load(io.BytesIO(base64.b64decode(raw["arrays"])))
+        index = cls(dim, capacity)
+        vectors, created_at = arrays["vectors"], arrays["created_at"]
+        if vectors.shape[1:] != (dim,):
+            raise ValueError("Dimensão do índice salvo difere da configurada")
+        size = min(len(vectors), capacity)
+        index.vectors[:size] = vectors[:size]
+        index.created_at[:size] = created_at[:size]
+        index.payloads[:size] = raw["payloads"][:size]
+        index.size = size
+        index._next = raw.get("next", size) % capacity
+        return index
+
+
+class SemanticCache:
+    """
+    Camada de cache por similaridade de embeddings, com um índice por modelo.
+
+    Consultada depois do cache exato: normaliza o prompt, gera o embedding e
+    procura o vizinho mais próximo no namespace do modelo. Acima de
+    ``threshold`` a resposta armazenada é reaproveitada. Os índices podem ser
+    persistidos no Redis (hash ``semantic_cache:<modelo>``) ou em disco
+    (``<persist_path>/<modelo>/``), uma cópia por worker: cada um grava só a
+    sua e, ao carregar, junta as de todos. Cópias só com entradas expiradas
+    (de workers que não existem mais) são apagadas na carga.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        threshold: float = 0.92,
+        capacity: int = 10000,
+        ttl: int = 3600,
+        redis_client=None,
+        persist_path: str = None,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self.persist_path = persist_path
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.indexes: Dict[str, VectorIndex] = {}
+
+    def _index(self, model: str) -> VectorIndex:
+        if model not in self.indexes:
+            self.indexes[model] = VectorIndex(self.embedder.dim, self.capacity)
+        return self.indexes[model]
+
+    async def lookup(self, prompt: str, model: str) -> Optional[dict]:
+        """Busca uma resposta de um prompt semanticamente equivalente."""
+        index = self.indexes.get(model)
+        if index is None or not index.size:
+            SEMANTIC_CACHE_LOOKUPS.labels(model=model, result="miss").inc()
+            return None
+
+        vector = await self.embedder.embed(normalize_prompt(prompt))
+        score, payload = index.search(vector, min_created_at=time.time() - self.ttl)
+        SEMANTIC_CACHE_SIMILARITY.labels(model=model).observe(max(score, 0.0))
+
+        if payload is None or score < self.threshold:
+            SEMANTIC_CACHE_LOOKUPS.labels(model=model, result="miss").inc()
+            return None
+
+        SEMANTIC_CACHE_LOOKUPS.labels(model=model, result="hit").inc()
+        return payload
+
+    async def add(self, prompt: str, model: str, response: dict) -> None:
+        """Indexa a resposta de um prompt."""
+        vector = await self.embedder.embed(normalize_prompt(prompt))
+        self._index(model).add(vector, response)
+
+    def drop(self, model: str) -> int:
+        """Descarta o índice em memória do modelo; retorna quantas entradas tinha."""
+        index = self.indexes.pop(model, None)
+        return index.size if index is not None else 0
+
+    async def invalidate(self, model: str) -> int:
+        """Descarta o índice do modelo, em memória e persistido."""
+        removed = self.drop(model)
+        try:
+            await clear_persisted(model, self.redis_client, self.persist_path)
+        except Exception as e:
+            logger.error(f"Erro ao apagar cache semântico persistido ({model}): {str(e)}")
+        return removed
+
+    def _file_path(self, model: str, worker_id: str) -> str:
+        return os.path.join(persisted_dir(self.persist_path, model), f"{worker_id}.json")
+
+    async def save(self) -> None:
+        """Persiste a cópia deste worker dos índices no Redis ou em disco."""
+        for model, index in self.indexes.items():
+            try:
+                data = index.dumps()
+                if self.redis_client is not None:
+                    key = persisted_key(model)
+                    async with self.redis_client.pipeline(transaction=False) as pipe:
+                        pipe.hset(key, self.worker_id, data.decode())
+                        pipe.expire(key, self.ttl)
+                        await pipe.execute()
+                elif self.persist_path:
+                    os.makedirs(persisted_dir(self.persist_path, model), exist_ok=True)
+                    with open(self._file_path(model, self.worker_id), "wb") as file:
+                        file.write(data)
+            except Exception as e:
+                logger.error(f"Erro ao persistir cache semântico ({model}): {str(e)}")
+
+    async def _read_persisted(self, model: str) -> Dict[str, bytes]:
+        """Cópias persistidas do índice do modelo, por worker."""
+        if self.redis_client is not None:
+            key = persisted_key(model)
+            if await self.redis_client.type(key) == "string":
+                # Formato anterior (uma cópia só, gravada com SET)
+                await self.redis_client.delete(key)
+                return {}
+            return await self.redis_client.hgetall(key)
+        if not self.persist_path:
+            return {}
+        directory = persisted_dir(self.persist_path, model)
+        if not os.path.isdir(directory):
+            return {}
+        copies = {}
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name), "rb") as file:
+                copies[name[: -len(".json")]] = file.read()
+        return copies
+
+    async def _delete_persisted(self, model: str, worker_ids: List[str]) -> None:
+        if self.redis_client is not None:
+            await self.redis_client.hdel(persisted_key(model), *worker_ids)
+            return
+        for worker_id in worker_ids:
+            os.remove(self._file_path(model, worker_id))
+
+    async def load(self, models: List[str]) -> None:
+        """Carrega e junta as cópias persistidas (de todos os workers) dos modelos."""
+        min_created_at = time.time() - self.ttl
+        for model in models:
+            try:
+                indexes, stale = [], []
+                for worker_id, data in (await self._read_persisted(model)).items():
+                    index = VectorIndex.loads(data, self.embedder.dim, self.capacity)
+                    if index.newest() < min_created_at:
+                        stale.append(worker_id)
+                    else:
+                        indexes.append(index)
+                if stale:
+                    await self._delete_persisted(model, stale)
+                if indexes:
+                    self.indexes[model] = VectorIndex.merge(
+                        indexes, self.embedder.dim, self.capacity, min_created_at
+                    )
+                    logger.info(
+                        f"🧠 Cache semântico carregado ({model}): "
+                        f"{self.indexes[model].size} entradas de {len(indexes)} workers"
+                    )
+            except Exception as e:
+                logger.error(f"Erro ao carregar cache semântico ({model}): {str(e)}")
@@ -1,44 +1,123 @@
-import json
 from typing import List, Dict
 
 from loguru import logger
 
+from app.core.config import settings
+from app.core.serialization import dumps, loads
 from app.services.cache_service import CacheService
+from app.services.tokenizer import MESSAGE_OVERHEAD, count_tokens
+
+
+def summarize_turns(turns: List[Dict], max_tokens: int) -> str:
+    """
+    Resumo extrativo local das mensagens mais antigas.
+
+    Mantém a primeira frase de cada mensagem, da mais recente para a mais
+    antiga, até ``max_tokens``. É barato e determinístico; um resumo via LLM
+    pode substituí-lo em ``SessionService.summarizer``.
+    """
+    lines = []
+    used = 0
+    for turn in reversed(turns):
+        sentence = turn.get("content", "").strip().split("\n")[0].split(". ")[0]
+        line = f"{turn.get('role', 'user')}: {sentence[:300]}"
+        tokens = count_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(reversed(lines))
 
 
 class SessionService(CacheService):
-    """Gerenciamento de sessões de chat."""
+    """
+    Gerenciamento de sessões de chat.
+
+    O histórico de cada usuário é uma lista Redis (``session:<user_id>``) com
+    uma mensagem JSON por item: novas mensagens entram com RPUSH e a lista é
+    cortada com LTRIM em ``CONTEXT_MAX_MESSAGES``, então nem o payload no
+    Redis nem o prompt crescem com o tamanho da conversa.
+    """
+
+    summarizer = staticmethod(summarize_turns)
 
-    async def save_chat_context(
-        self, user_id: str, conversation_history: List[Dict], ttl: int = 7200
+    def _session_key(self, user_id: str) -> str:
+        return f"session:{user_id}"
+
+    async def append_turns(
+        self, user_id: str, turns: List[Dict], ttl: int = settings.SESSION_TTL
     ):
-        """Salva contexto da conversa do usuário."""
+        """Acrescenta mensagens ao histórico (RPUSH + LTRIM + EXPIRE em um pipeline)."""
         try:
-            session_key = f"session:{user_id}"
-            await self.redis_client.setex(
-                session_key, ttl, json.dumps(conversation_history)
-            )
-            logger.info(f"💬 Contexto salvo para usuário: {user_id}")
+            session_key = self._session_key(user_id)
+            items = [dumps(turn) for turn in turns]
+
+            def write(pipe) -> None:
+                pipe.rpush(session_key, *items)
+                pipe.ltrim(session_key, -settings.CONTEXT_MAX_MESSAGES, -1)
+                pipe.expire(session_key, ttl)
+
+            await self._write(write)
+            logger.info("💬 Contexto salvo para usuário: {}", user_id)
         except Exception as e:
             logger.error(f"Erro ao salvar contexto: {str(e)}")
 
     async def get_chat_context(self, user_id: str) -> List[Dict]:
         """Recupera contexto da conversa."""
         try:
-            session_key = f"session:{user_id}"
-            context_data = await self.redis_client.get(session_key)
-
-            if context_data:
-                return json.loads(context_data)
-            return []
+            items = await self.redis_client.lrange(
+                self._session_key(user_id), -settings.CONTEXT_MAX_MESSAGES, -1
+            )
+            return [loads(item) for item in items]
         except Exception as e:
             logger.error(f"Erro ao recuperar contexto: {str(e)}")
             return []
 
+    async def build_context(
+        self, user_id: str, token_budget: int = settings.CONTEXT_TOKEN_BUDGET
+    ) -> List[Dict]:
+        """
+        Monta as mensagens de contexto que cabem em ``token_budget``.
+
+        Inclui as mensagens mais recentes enquanto couberem no orçamento; as
+        mais antigas viram um resumo (mensagem de sistema). O resumo é
+        calculado a cada chamada: o histórico é uma janela deslizante, então o
+        trecho resumido muda a quase toda mensagem e um cache no Redis só
+        somaria um GET e um SETEX por requisição.
+        """
+        history = await self.get_chat_context(user_id)
+        if not history:
+            return []
+
+        summary_budget = min(settings.CONTEXT_SUMMARY_MAX_TOKENS, token_budget // 4)
+        recent_budget = token_budget - summary_budget
+        recent: List[Dict] = []
+        used = 0
+        for turn in reversed(history):
+            tokens = count_tokens(turn.get("content", "")) + MESSAGE_OVERHEAD
+            if used + tokens > recent_budget:
+                break
+            recent.append(turn)
+            used += tokens
+        recent.reverse()
+
+        older = history[: len(history) - len(recent)]
+        if not older:
+            return recent
+
+        summary = self.summarizer(older, summary_budget)
+        if not summary:
+            return recent
+        return [
+            {"role": "system", "content": f"Resumo da conversa anterior:\n{summary}"}
+        ] + recent
+
     async def update_user_activity(self, user_id: str):
         """Atualiza timestamp da última atividade."""
         try:
             activity_key = f"activity:{user_id}"
-            await self.redis_client.setex(activity_key, 1800, "active")  # 30min TTL
+            await self._write(
+                lambda pipe: pipe.setex(activity_key, 1800, "active")  # 30min TTL
+            )
         except Exception as e:
             logger.error(f"Erro ao atualizar atividade: {str(e)}")
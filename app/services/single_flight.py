@@ -0,0 +1,42 @@
+"""Coalescência de chamadas concorrentes idênticas (single-flight)."""
+
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+from app.core.metrics import SINGLE_FLIGHT_COALESCED
+
+
+class SingleFlight:
+    """
+    Garante no máximo uma execução em andamento por chave.
+
+    A primeira chamada para uma chave dispara a corrotina; chamadas
+    concorrentes com a mesma chave aguardam o mesmo resultado (ou exceção).
+    A execução roda em uma task própria, protegida com ``asyncio.shield``:
+    se o cliente que a iniciou for cancelado, os demais continuam aguardando.
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Executa ``fn`` uma única vez por chave entre chamadas concorrentes."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            SINGLE_FLIGHT_COALESCED.labels(name=self.name).inc()
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # Consome a exceção mesmo se todos os chamadores foram cancelados
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,42 @@
+"""Contagem (ou estimativa) de tokens para orçamentos de prompt."""
+
+import functools
+from typing import Dict, List
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - dependência opcional
+    tiktoken = None
+
+# Tokens extras que a API cobra por mensagem (papel e separadores)
+MESSAGE_OVERHEAD = 4
+
+
+@functools.lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Conta os tokens de um texto.
+
+    Usa o ``tiktoken`` quando instalado; caso contrário estima ~4 caracteres
+    por token, o que é suficiente para orçamentos de contexto.
+    """
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict], model: str = "gpt-4o-mini") -> int:
+    """Conta os tokens de uma lista de mensagens no formato da API de chat."""
+    return sum(
+        count_tokens(message.get("content", ""), model) + MESSAGE_OVERHEAD
+        for message in messages
+    )
@@ -0,0 +1,195 @@
+"""Persistência write-behind em lote das interações de chat no MongoDB."""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import List
+
+from loguru import logger
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.core.metrics import (
+    WRITE_BEHIND_DEAD_LETTERS,
+    WRITE_BEHIND_DROPPED,
+    WRITE_BEHIND_FLUSH_LATENCY,
+    WRITE_BEHIND_FLUSH_SIZE,
+    WRITE_BEHIND_QUEUE_DEPTH,
+)
+
+
+class WriteBehindQueue:
+    """
+    Fila limitada que agrupa documentos e grava com ``insert_many``.
+
+    As requisições apenas enfileiram (``enqueue``). Uma task de background
+    esvazia a fila quando junta ``batch_size`` documentos ou após
+    ``flush_interval`` segundos, com ``insert_many(ordered=False)``. Falhas
+    são retentadas com backoff exponencial; esgotadas as tentativas, os
+    documentos vão para um arquivo dead-letter (JSON lines). Com a fila cheia
+    o ``enqueue`` espera até ``enqueue_timeout`` (backpressure) e então
+    descarta o documento, contabilizando a perda.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        enqueue_timeout: float = 0.5,
+        dead_letter_path: str = "data/dead_letter/chat_interactions.jsonl",
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.enqueue_timeout = enqueue_timeout
+        self.dead_letter_path = dead_letter_path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+        # Lote tirado da fila e ainda não gravado nem em dead-letter
+        self._in_flight: List[dict] = []
+        # Uma escrita cancelada no shutdown pode seguir na thread junto com a do stop
+        self._dead_letter_lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def capacity(self) -> int:
+        return self._queue.maxsize
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Inicia a task de flush."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def enqueue(self, document: dict) -> bool:
+        """Enfileira um documento; retorna False se foi descartado."""
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(document), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                WRITE_BEHIND_DROPPED.inc()
+                logger.warning(
+                    f"⚠️ Fila de escrita cheia, chat descartado: {document.get('id')}"
+                )
+                return False
+        WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Grava o que restou na fila e para a task (drenagem no shutdown)."""
+        if self._task is None:
+            return
+
+        self._stopping = True
+        # Acorda a task caso esteja aguardando a fila
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            # O cancelamento interrompe o lote em andamento: ele vai para o
+            # dead-letter junto com a fila (parte pode já estar no MongoDB; na
+            # reinserção o índice único de ``id`` rejeita as duplicatas)
+            remaining = self._in_flight + self._take(self._queue.qsize())
+            self._in_flight = []
+            logger.error(
+                f"❌ Timeout drenando fila de escrita, {len(remaining)} chats em dead-letter"
+            )
+            await self._dead_letter(remaining)
+        self._task = None
+
+    async def _run(self) -> None:
+        while not (self._stopping and self._queue.empty()):
+            batch = self._take(self.batch_size)
+            self._in_flight = batch
+            if len(batch) < self.batch_size and not self._stopping:
+                # Espera completar o lote ou o intervalo de flush
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                batch.extend(self._take(self.batch_size - len(batch)))
+            await self._flush(batch)
+
+    def _take(self, count: int) -> List[dict]:
+        items = []
+        while len(items) < count and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _flush(self, batch: List[dict]) -> None:
+        WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+        if not batch:
+            return
+
+        started_at = time.perf_counter()
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.collection.insert_many(pending, ordered=False)
+                pending = []
+                break
+            except BulkWriteError as e:
+                # Com ordered=False só os documentos com erro falharam; chaves
+                # duplicadas (retentativa de algo já gravado) são ignoradas
+                failed = {
+                    error["index"]
+                    for error in e.details.get("writeErrors", [])
+                    if error.get("code") != 11000
+                }
+                pending = [doc for i, doc in enumerate(pending) if i in failed]
+                self._in_flight = pending
+                if not pending:
+                    break
+                logger.error(f"Erro ao salvar lote no MongoDB: {len(pending)} falhas")
+            except PyMongoError as e:
+                logger.error(f"Erro ao salvar lote no MongoDB: {str(e)}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(2**attempt * 0.5, 10))
+
+        self._in_flight = []
+        WRITE_BEHIND_FLUSH_LATENCY.observe(time.perf_counter() - started_at)
+        WRITE_BEHIND_FLUSH_SIZE.observe(len(batch))
+        if pending:
+            await self._dead_letter(pending)
+        else:
+            logger.info("Lote de {} chats salvo com sucesso", len(batch))
+
+    async def _dead_letter(self, documents: List[dict]) -> None:
+        if not documents:
+            return
+        WRITE_BEHIND_DEAD_LETTERS.inc(len(documents))
+        try:
+            # Arquivo local: a escrita roda numa thread para não travar o event loop
+            await asyncio.to_thread(self._write_dead_letter, documents)
+            logger.error(f"❌ {len(documents)} chats gravados em {self.dead_letter_path}")
+        except OSError as e:
+            logger.error(f"Erro ao gravar dead-letter: {str(e)}")
+
+    def _write_dead_letter(self, documents: List[dict]) -> None:
+        lines = []
+        for document in documents:
+            document.pop("_id", None)
+            lines.append(json.dumps(document, default=str) + "\n")
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        with self._dead_letter_lock, open(
+            self.dead_letter_path, "a", encoding="utf-8"
+        ) as file:
+            file.writelines(lines)
@@ -0,0 +1,118 @@
+"""
+Efeito da compressão de respostas no endpoint de histórico (``/chats/{user_id}``).
+
+Monta um app com o ``CompressionMiddleware`` e uma rota que devolve uma
+página de histórico do tamanho pedido, no mesmo formato de
+``GET /api/v1/chats/{user_id}``, e a chama em processo (ASGI, sem rede) com
+cada ``Accept-Encoding``. Mede o tempo em processo (serialização,
+compressão e a descompressão no cliente) e o tamanho da resposta, e estima
+o tempo total num link de ``--bandwidth-mbps``:
+
+    uv run python -m benchmarks.compression_bench --page-size 100 --bandwidth-mbps 50
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.serialization import FastJSONResponse
+from app.middleware.compression import CompressionMiddleware, available_encoders
+
+PROMPT = "Explique a diferença entre CDB, LCI e LCA e quando vale a pena cada um."
+WORDS = (
+    "o CDB é um título emitido por bancos com cobertura do FGC e IR regressivo "
+    "LCI LCA são isentas de imposto para pessoa física lastreadas em crédito "
+    "imobiliário agronegócio liquidez prazo carência rentabilidade taxa Selic "
+    "CDI inflação IPCA risco emissor garantia resgate aplicação mínima perfil"
+).split()
+
+
+def answer(seed: int, words: int = 180) -> str:
+    """Resposta com texto variado: repetir a mesma frase inflaria a compressão."""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + "."
+
+
+def history_page(page_size: int) -> list:
+    now = datetime.now()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "userId": "bench-user",
+            "prompt": f"{PROMPT} ({index})",
+            "response": answer(index),
+            "model": "gpt-4o-mini",
+            "timestamp": (now - timedelta(minutes=index)).isoformat(),
+        }
+        for index in range(page_size)
+    ]
+
+
+def build_bench_app(page_size: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    page = history_page(page_size)
+
+    @app.get("/chats/{user_id}")
+    async def get_user_chats(user_id: str):
+        return FastJSONResponse(page)
+
+    return app
+
+
+async def measure(app: FastAPI, encoding: str, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Accept-Encoding": encoding}
+        for _ in range(min(requests, 20)):
+            await client.get("/chats/bench-user", headers=headers)
+        durations = []
+        size = 0
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get("/chats/bench-user", headers=headers)
+            durations.append(time.perf_counter() - started)
+            # Bytes que iriam pela rede (o httpx já descomprimiu ``content``)
+            size = int(response.headers["content-length"])
+    return {"server_ms": statistics.median(durations) * 1000, "bytes": size}
+
+
+async def run(args: argparse.Namespace) -> None:
+    app = build_bench_app(args.page_size)
+    encodings = ["identity", *available_encoders()]
+    bytes_per_ms = args.bandwidth_mbps * 1_000_000 / 8 / 1000
+
+    print(
+        f"página com {args.page_size} chats, link de {args.bandwidth_mbps} Mbps, "
+        f"{args.requests} requisições por codificação"
+    )
+    print(f"{'codificação':<12} {'bytes':>10} {'razão':>7} {'servidor':>10} {'rede':>10} {'total':>10}")
+    baseline = None
+    for encoding in encodings:
+        result = await measure(app, encoding, args.requests)
+        baseline = baseline or result["bytes"]
+        transfer_ms = result["bytes"] / bytes_per_ms
+        print(
+            f"{encoding:<12} {result['bytes']:>10} {baseline / result['bytes']:>6.1f}x "
+            f"{result['server_ms']:>8.2f}ms {transfer_ms:>8.2f}ms "
+            f"{result['server_ms'] + transfer_ms:>8.2f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--bandwidth-mbps", type=float, default=50.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
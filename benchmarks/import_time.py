@@ -0,0 +1,107 @@
+"""
+Custo de import da aplicação, medido com ``python -X importtime``.
+
+Importa o módulo em processos novos (cache de bytecode já quente), fica com
+a mediana e lista os módulos de maior custo acumulado. Com ``--baseline``
+compara com um relatório salvo antes e sai com código 1 se o total piorou
+mais que ``--max-regression``, para rodar como etapa de CI:
+
+    uv run python -m benchmarks.import_time --output import_time.json
+    uv run python -m benchmarks.import_time --baseline import_time.json
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module: str) -> Tuple[int, Dict[str, int]]:
+    """Total (µs) e tempo acumulado de cada módulo de primeiro nível da árvore."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        _, cum, indent, name = match.groups()
+        cumulative[name] = int(cum)
+        # Indentação de 1 espaço: importado diretamente pelo processo
+        if len(indent) == 1:
+            total += int(cum)
+    return total, cumulative
+
+
+def measure(module: str, runs: int) -> dict:
+    import_times(module)  # aquece o cache de bytecode
+    samples = [import_times(module) for _ in range(runs)]
+    totals = [total for total, _ in samples]
+    modules = {
+        name: int(statistics.median(run[1].get(name, 0) for run in samples))
+        for name in samples[0][1]
+    }
+    return {
+        "module": module,
+        "runs": runs,
+        "total_ms": statistics.median(totals) / 1000,
+        "modules_ms": {name: us / 1000 for name, us in modules.items()},
+    }
+
+
+def top(report: dict, count: int) -> List[Tuple[str, float]]:
+    return sorted(report["modules_ms"].items(), key=lambda item: -item[1])[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app.server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Salva o relatório em JSON")
+    parser.add_argument("--baseline", help="Relatório JSON para comparar")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Piora tolerada do total em relação ao baseline (0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    report = measure(args.module, args.runs)
+    print(f"import {report['module']}: {report['total_ms']:.1f} ms (mediana de {args.runs})")
+    for name, ms in top(report, args.top):
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        change = report["total_ms"] / baseline["total_ms"] - 1
+        print(f"baseline: {baseline['total_ms']:.1f} ms ({change:+.1%})")
+        for name, ms in top(report, args.top):
+            before = baseline["modules_ms"].get(name)
+            if before is None:
+                print(f"  novo no top: {name} ({ms:.1f} ms)")
+            elif ms - before > max(5.0, before * args.max_regression):
+                print(f"  piorou: {name} {before:.1f} -> {ms:.1f} ms")
+        if change > args.max_regression:
+            print(f"❌ Import piorou mais que {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Benchmark de carga do caminho de chat com LLM mock.
+
+Reproduz um corpus JSON lines (``{"userId", "prompt"}`` por linha; linhas no
+formato do backlog ``{"request_id", "title", "body"}`` também são aceitas)
+contra ``POST /api/v1/chat``, com as chamadas ao LLM indo para o servidor
+mock de ``benchmarks.mock_openai``. Mede latência p50/p95/p99, throughput,
+taxa de acerto do cache (chamadas que não chegaram ao mock) e aberturas do
+circuit breaker, e salva o resultado em JSON para comparar com um baseline.
+
+Modos:
+    inprocess  app ASGI no mesmo processo (httpx.ASGITransport)
+    uvicorn    app servido por ``uvicorn`` em subprocesso (HTTP real)
+
+Redis e MongoDB: por padrão os de ``--redis-url``/``--mongo-url`` (ex.: os
+do docker-compose). Com ``--stand-ins memory`` (só no modo inprocess) usa
+``fakeredis`` e ``mongomock-motor``, se instalados.
+
+    uv run python -m benchmarks.load_test --requests 2000 --concurrency 50
+    uv run python -m benchmarks.load_test --rate 200 --duration 30 \\
+        --latency lognormal:0.3:0.6 --error-rate 0.05
+    uv run python -m benchmarks.load_test --baseline benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.mock_openai import MockOpenAI
+
+SAMPLE_CORPUS = Path(__file__).parent / "data" / "prompts.jsonl"
+RESULTS_DIR = Path(__file__).parent / "results"
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def load_corpus(path: str) -> List[Tuple[str, str]]:
+    """Lê ``(userId, prompt)`` de um arquivo JSON lines."""
+    corpus_path = Path(path)
+    if not corpus_path.exists():
+        print(f"Corpus {path} não encontrado, usando {SAMPLE_CORPUS}")
+        corpus_path = SAMPLE_CORPUS
+
+    corpus = []
+    with open(corpus_path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            prompt = item.get("prompt") or f"{item.get('title', '')}\n{item.get('body', '')}"
+            user_id = item.get("userId") or item.get("request_id") or "bench-user"
+            corpus.append((user_id, prompt.strip()))
+    return corpus
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def start_mock(args) -> Tuple[MockOpenAI, object]:
+    """Sobe o mock da OpenAI em uma thread com seu próprio event loop."""
+    import uvicorn
+
+    mock = MockOpenAI(args.latency, args.error_rate, args.tokens)
+    config = uvicorn.Config(
+        mock.build_app(), host="127.0.0.1", port=args.mock_port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return mock, server
+
+
+def app_environment(args) -> Dict[str, str]:
+    """Variáveis de ambiente do app sob teste."""
+    return {
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "REDIS_URL": args.redis_url,
+        "MONGODB_URL": args.mongo_url,
+        # O benchmark mede o caminho de chat, não o rate limiter
+        "RATE_LIMIT_BACKEND": "local",
+        "RATE_LIMIT_REQUESTS": str(10**9),
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def use_memory_stand_ins() -> None:
+    """Troca Redis e MongoDB por implementações em memória."""
+    try:
+        import fakeredis
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--stand-ins memory requer: pip install fakeredis[lua] mongomock-motor")
+
+    from app.core.clients import ClientRegistry
+
+    ClientRegistry._create_redis = lambda self: fakeredis.FakeAsyncRedis(
+        decode_responses=True
+    )
+    ClientRegistry._create_mongo = lambda self: AsyncMongoMockClient()
+
+
+class LoadRunner:
+    """Gera a carga e coleta as latências."""
+
+    def __init__(self, client: httpx.AsyncClient, corpus, args):
+        self.client = client
+        self.corpus = corpus
+        self.args = args
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self._items = itertools.cycle(corpus)
+
+    async def _send(self, scheduled_at: float) -> None:
+        user_id, prompt = next(self._items)
+        try:
+            response = await self.client.post(
+                "/api/v1/chat",
+                json={"userId": user_id, "prompt": prompt},
+                headers={"X-User-Id": user_id},
+            )
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        # Latência medida desde a chegada planejada (evita coordinated omission)
+        self.latencies.append(time.perf_counter() - scheduled_at)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def closed_loop(self) -> None:
+        """``concurrency`` clientes enviando em sequência até o total/duração."""
+        deadline = time.perf_counter() + self.args.duration if self.args.duration else None
+        remaining = itertools.count()
+
+        async def worker():
+            while next(remaining) < self.args.requests:
+                if deadline and time.perf_counter() > deadline:
+                    return
+                await self._send(time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def open_loop(self) -> None:
+        """Chegadas Poisson a ``rate`` req/s, limitadas a ``concurrency`` em voo."""
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        duration = self.args.duration or self.args.requests / self.args.rate
+        started = time.perf_counter()
+        next_arrival = started
+        tasks = []
+
+        async def fire(scheduled_at):
+            async with semaphore:
+                await self._send(scheduled_at)
+
+        while next_arrival - started < duration and len(tasks) < self.args.requests:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(next_arrival)))
+            next_arrival += random.expovariate(self.args.rate)
+        await asyncio.gather(*tasks)
+
+
+async def scrape_breaker_opens(client: httpx.AsyncClient) -> float:
+    """Soma das transições para OPEN exportadas em /metrics."""
+    try:
+        text = (await client.get("/metrics")).text
+    except httpx.HTTPError:
+        return 0.0
+    pattern = re.compile(
+        r'^circuit_breaker_transitions_total\{[^}]*state="open"[^}]*\} (\S+)$', re.M
+    )
+    return sum(float(value) for value in pattern.findall(text))
+
+
+async def run_benchmark(args, mock: MockOpenAI) -> dict:
+    corpus = load_corpus(args.corpus)
+    process = None
+
+    if args.mode == "inprocess":
+        os.environ.update(app_environment(args))
+        if args.stand_ins == "memory":
+            use_memory_stand_ins()
+        from app.server import app
+
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120
+        )
+    else:
+        env = {**os.environ, **app_environment(args)}
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.server:app",
+                "--port", str(args.app_port), "--log-level", "warning",
+            ],
+            env=env,
+        )
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.app_port}",
+            timeout=120,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+        for _ in range(100):
+            try:
+                await client.get("/api/v1/health")
+                break
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+
+    try:
+        for _ in range(args.warmup):
+            user_id, prompt = random.choice(corpus)
+            await client.post("/api/v1/chat", json={"userId": user_id, "prompt": prompt})
+
+        opens_before = await scrape_breaker_opens(client)
+        calls_before = mock.calls
+        runner = LoadRunner(client, corpus, args)
+        started = time.perf_counter()
+        if args.rate:
+            await runner.open_loop()
+        else:
+            await runner.closed_loop()
+        elapsed = time.perf_counter() - started
+        upstream_calls = mock.calls - calls_before
+        breaker_opens = await scrape_breaker_opens(client) - opens_before
+    finally:
+        await client.aclose()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        else:
+            await lifespan.__aexit__(None, None, None)
+
+    completed = len(runner.latencies)
+    ok = runner.statuses.get("200", 0)
+    latencies_ms = [latency * 1000 for latency in runner.latencies]
+    return {
+        "requests": completed,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms, default=0.0), 2),
+        "status_codes": runner.statuses,
+        "upstream_calls": upstream_calls,
+        "cache_hit_ratio": round(1 - upstream_calls / ok, 4) if ok else 0.0,
+        "breaker_opens": breaker_opens,
+    }
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """Imprime a comparação com o baseline; False se houve regressão."""
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    ok = True
+    print(f"\n{'métrica':<16}{'baseline':>12}{'atual':>12}{'variação':>10}")
+    for metric in COMPARED_METRICS:
+        before, after = baseline.get(metric), results.get(metric)
+        if not before:
+            continue
+        change = (after - before) / before
+        # Latência maior ou throughput menor são regressões
+        worse = change < -tolerance if metric == "throughput_rps" else change > tolerance
+        flag = "  ❌" if worse else ""
+        print(f"{metric:<16}{before:>12.2f}{after:>12.2f}{change:>+10.1%}{flag}")
+        ok = ok and not worse
+    return ok
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de carga do chat")
+    parser.add_argument("--corpus", default="requests.jsonl")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--stand-ins", choices=["services", "memory"], default="services")
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=None, help="req/s (open loop)")
+    parser.add_argument("--duration", type=float, default=None, help="segundos")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--latency", default="lognormal:0.4:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--mock-port", type=int, default=8090)
+    parser.add_argument("--app-port", type=int, default=8099)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    mock, mock_server = start_mock(args)
+    try:
+        results = asyncio.run(run_benchmark(args, mock))
+    finally:
+        mock_server.should_exit = True
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline")
+        },
+        "results": results,
+    }
+    output = Path(
+        args.output
+        or RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print(json.dumps(results, indent=2))
+    print(f"\nResultado salvo em {output}")
+
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Servidor mock da API de chat da OpenAI para benchmarks.
+
+Responde ``POST /v1/chat/completions`` (com e sem ``stream``) após uma
+latência sorteada de uma distribuição configurável e devolve erros (429/500)
+na taxa informada. Conta as chamadas recebidas em ``GET /stats``.
+
+    uv run python -m benchmarks.mock_openai --port 8090 \\
+        --latency lognormal:0.4:0.5 --error-rate 0.02
+
+Distribuições de ``--latency`` (segundos):
+    fixed:<s>  |  uniform:<min>:<max>  |  exponential:<média>
+    lognormal:<mediana>:<sigma>
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Callable
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Converte a especificação de latência em um sorteador (segundos)."""
+    kind, *params = spec.split(":")
+    values = [float(param) for param in params]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "exponential":
+        return lambda: random.expovariate(1 / values[0])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Distribuição de latência desconhecida: {spec}")
+
+
+class MockOpenAI:
+    """Estado e rotas do servidor mock."""
+
+    def __init__(
+        self,
+        latency: str = "lognormal:0.4:0.5",
+        error_rate: float = 0.0,
+        tokens: int = 60,
+    ):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.tokens = tokens
+        self.calls = 0
+        self.errors = 0
+
+    def build_app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/v1/chat/completions", self.chat_completions, methods=["POST"]),
+                Route("/stats", self.stats, methods=["GET"]),
+            ]
+        )
+
+    async def stats(self, request: Request) -> JSONResponse:
+        return JSONResponse({"calls": self.calls, "errors": self.errors})
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        self.calls += 1
+        model = body.get("model", "gpt-4o-mini")
+        latency = self.sample_latency()
+
+        if random.random() < self.error_rate:
+            self.errors += 1
+            await asyncio.sleep(latency / 4)
+            status = random.choice([429, 500])
+            return JSONResponse(
+                {"error": {"message": "mock error", "type": "server_error"}},
+                status_code=status,
+            )
+
+        prompt = body["messages"][-1]["content"]
+        words = [f"token{i}" for i in range(self.tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if body.get("stream"):
+            return StreamingResponse(
+                self._stream(completion_id, model, words, latency),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(latency)
+        return JSONResponse(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(words)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": self.tokens,
+                    "total_tokens": len(prompt) // 4 + self.tokens,
+                },
+            }
+        )
+
+    async def _stream(self, completion_id: str, model: str, words, latency: float):
+        # Metade da latência até o primeiro token, o resto distribuído
+        await asyncio.sleep(latency / 2)
+        per_token = latency / 2 / max(len(words), 1)
+        for word in words:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": {"content": word + " "}, "finish_reason": None}
+                ],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(per_token)
+        yield "data: [DONE]\n\n"
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock da API de chat da OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:0.4:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    mock = MockOpenAI(args.latency, args.error_rate, args.tokens)
+    uvicorn.run(mock.build_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
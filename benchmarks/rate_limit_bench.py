@@ -0,0 +1,62 @@
+"""
+Benchmark de decisões de rate limit por segundo.
+
+Mede o backend local (token bucket) e, se ``--redis-url`` for informado, o
+backend Redis (GCRA em um EVALSHA) com ``--concurrency`` chamadas simultâneas.
+
+    uv run python -m benchmarks.rate_limit_bench --decisions 200000
+    uv run python -m benchmarks.rate_limit_bench --redis-url redis://localhost:6379
+"""
+
+import argparse
+import asyncio
+import time
+
+import redis.asyncio as redis
+
+from app.middleware.rate_limit import LocalTokenBucket, RedisGCRALimiter
+
+
+def bench_local(decisions: int, users: int) -> float:
+    limiter = LocalTokenBucket()
+    started = time.perf_counter()
+    for i in range(decisions):
+        limiter.hit_sync(f"rate_limit:user-{i % users}:default", 100, 60)
+    return decisions / (time.perf_counter() - started)
+
+
+async def bench_redis(url: str, decisions: int, users: int, concurrency: int) -> float:
+    client = redis.Redis.from_url(url, decode_responses=True)
+    limiter = RedisGCRALimiter(client)
+    per_worker = decisions // concurrency
+
+    async def worker(worker_id: int) -> None:
+        for i in range(per_worker):
+            user = (worker_id * per_worker + i) % users
+            await limiter.hit(f"rate_limit:bench-{user}:default", 100, 60)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return per_worker * concurrency / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--decisions", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    print(f"local token bucket: {bench_local(args.decisions, args.users):,.0f} decisões/s")
+    if args.redis_url:
+        rate = asyncio.run(
+            bench_redis(args.redis_url, args.decisions, args.users, args.concurrency)
+        )
+        print(f"redis GCRA (EVALSHA): {rate:,.0f} decisões/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Custo de serialização por requisição de chat, antes e depois do fast path.
+
+"antes" reproduz o caminho anterior: ``ChatResponse`` montado a partir do
+dict, ``model_dump()`` para o MongoDB, a revalidação do ``response_model``
+que o FastAPI faz (dump, validate, ``jsonable_encoder``) e ``JSONResponse``,
+mais ``json.dumps``/``json.loads`` do valor no cache. "depois" é o caminho
+atual: dict direto, ``FastJSONResponse`` e ``pack``/``unpack`` no cache.
+
+    uv run python -m benchmarks.serialization_bench --iterations 20000
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core import serialization
+from app.core.serialization import FastJSONResponse, pack, unpack
+from app.routers.v1.chat.models import ChatRequest, ChatResponse
+from app.routers.v1.chat.service import build_chat_record
+
+PROMPT = "Explique a diferença entre CDB, LCI e LCA e quando vale a pena cada um."
+CONTENT = "Resposta de exemplo do modelo. " * 40
+
+
+def request_before(chat_request: ChatRequest, llm_response: dict) -> int:
+    chat_response = ChatResponse(
+        id=str(uuid.uuid4()),
+        userId=chat_request.userId,
+        prompt=chat_request.prompt,
+        response=llm_response.get("content", ""),
+        model=llm_response.get("model", ""),
+        timestamp=datetime.now().isoformat(),
+    )
+    chat_response.model_dump()  # documento do MongoDB
+    validated = ChatResponse.model_validate(chat_response.model_dump())
+    body = JSONResponse(jsonable_encoder(validated)).body
+    cached = json.loads(json.dumps(llm_response))
+    return len(body) + len(cached)
+
+
+def request_after(chat_request: ChatRequest, llm_response: dict) -> int:
+    chat_data = build_chat_record(
+        str(uuid.uuid4()), chat_request, llm_response, datetime.now().isoformat()
+    )
+    body = FastJSONResponse(chat_data).body
+    cached = unpack(pack(llm_response))
+    return len(body) + len(cached)
+
+
+def measure(fn, iterations: int, *args) -> float:
+    for _ in range(min(iterations, 1000)):
+        fn(*args)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(*args)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    chat_request = ChatRequest(userId="bench-user", prompt=PROMPT)
+    llm_response = {
+        "content": CONTENT,
+        "model": "gpt-4o-mini",
+        "from_cache": False,
+        "circuit_open": False,
+    }
+
+    print(
+        f"orjson: {'sim' if serialization.orjson else 'não'} | "
+        f"msgpack: {'sim' if serialization.msgpack else 'não'}"
+    )
+    before = measure(request_before, args.iterations, chat_request, llm_response)
+    after = measure(request_after, args.iterations, chat_request, llm_response)
+    print(f"antes:  {before:8.1f} µs/requisição")
+    print(f"depois: {after:8.1f} µs/requisição ({before / after:.1f}x)")
+    print(
+        f"valor no cache: json {len(json.dumps(llm_response))} bytes, "
+        f"pack {len(pack(llm_response))} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
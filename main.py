@@ -1,21 +1,102 @@
+import importlib.util
+import os
+import shutil
+from pathlib import Path
+from typing import Union
+
 import uvicorn
 from loguru import logger
 
-from app.core.config import settings
+from app.core.config import AppEnvs, settings
+
+
+def cgroup_cpu_quota() -> Union[float, None]:
+    """CPUs permitidas pela cota do cgroup (containers), se houver."""
+    try:
+        # cgroup v2: "<quota> <period>" ou "max <period>"
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: quota -1 significa sem limite
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> float:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    return min(cpus, quota) if quota else cpus
+
 
 def calculate_worker_count() -> int:
-    """Calculate optimal worker count: 2 * CPU cores + 1"""
-    return 1
+    """
+    Calculate worker count: ``WORKER_COUNT`` or one worker per available CPU.
+
+    Cada worker roda seu próprio event loop e o trabalho é I/O-bound, então
+    um processo por CPU (respeitando a cota do cgroup) já ocupa as CPUs; a
+    regra 2 * cores + 1 vale para workers síncronos.
+    """
+    if settings.WORKER_COUNT:
+        return settings.WORKER_COUNT
+    return max(1, int(available_cpus()))
+
+
+def configure_multiprocess_metrics() -> None:
+    """Prepara o diretório das métricas compartilhadas entre os workers."""
+    metrics_dir = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR
+    )
+    # Arquivos de uma execução anterior distorceriam contadores e gauges
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def resolve_loop() -> str:
+    if settings.UVICORN_LOOP != "auto":
+        return settings.UVICORN_LOOP
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def resolve_http() -> str:
+    if settings.UVICORN_HTTP != "auto":
+        return settings.UVICORN_HTTP
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
 
 def main():
-    worker_count = calculate_worker_count()
-    logger.info(f"🚀 Starting application with {worker_count} worker(s)")
+    reload = settings.ENVIRONMENT == AppEnvs.DEVELOPMENT
+    # O modo reload do uvicorn não suporta múltiplos workers
+    worker_count = 1 if reload else calculate_worker_count()
+    if worker_count > 1:
+        configure_multiprocess_metrics()
+
+    loop, http = resolve_loop(), resolve_http()
+    logger.info(
+        f"🚀 Starting application with {worker_count} worker(s) (loop={loop}, http={http})"
+    )
+    if worker_count > 1:
+        logger.info("🔄 Envie SIGHUP ao processo principal para reiniciar os workers um a um")
+
     uvicorn.run(
         app="app.server:app",
         host=settings.HOST,
         port=settings.PORT,
         workers=worker_count,
-        reload=settings.ENVIRONMENT == "development",
+        loop=loop,
+        http=http,
+        timeout_keep_alive=settings.UVICORN_TIMEOUT_KEEP_ALIVE,
+        backlog=settings.UVICORN_BACKLOG,
+        limit_concurrency=settings.UVICORN_LIMIT_CONCURRENCY,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+        reload=reload,
     )
 
 
@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+import pytest
+
+
+class FakePipeline:
+    """Pipeline em memória com os comandos usados pelos serviços."""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def hincrby(self, key, field, amount=1):
+        self.commands.append(("hincrby", key, field, amount))
+
+    def hmget(self, key, *fields):
+        self.commands.append(("hmget", key, fields))
+
+    def expire(self, key, seconds):
+        self.commands.append(("expire", key, seconds))
+
+    async def execute(self):
+        if self.redis.fail:
+            raise ConnectionError("redis fora do ar")
+        self.redis.executed.append(self.commands)
+        results = []
+        for command, key, *args in self.commands:
+            hash_ = self.redis.hashes[key]
+            if command == "hincrby":
+                field, amount = args
+                hash_[field] = hash_.get(field, 0) + amount
+                results.append(hash_[field])
+            elif command == "hmget":
+                results.append([hash_.get(field) for field in args[0]])
+            else:
+                results.append(True)
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = defaultdict(dict)
+        self.executed = []
+        self.fail = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
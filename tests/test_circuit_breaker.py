@@ -0,0 +1,126 @@
+import json
+
+from app.services.circuit_breaker import WORKER_ID, CircuitBreaker, CircuitState
+
+
+def make_breaker(**kwargs):
+    options = {"failure_threshold": 3, "recovery_timeout": 60, "half_open_max_calls": 2}
+    options.update(kwargs)
+    return CircuitBreaker("test_api", **options)
+
+
+def expire_recovery(breaker: CircuitBreaker) -> None:
+    breaker.opened_at -= breaker.recovery_timeout
+
+
+async def test_opens_after_consecutive_failures():
+    breaker = make_breaker()
+
+    for _ in range(2):
+        await breaker.record_failure()
+    assert breaker.current_state() == CircuitState.CLOSED
+
+    await breaker.record_failure()
+    assert breaker.current_state() == CircuitState.OPEN
+    assert not breaker.allow_request()
+
+
+async def test_success_resets_consecutive_failures():
+    breaker = make_breaker()
+
+    await breaker.record_failure()
+    await breaker.record_failure()
+    await breaker.record_success()
+    await breaker.record_failure()
+
+    assert breaker.current_state() == CircuitState.CLOSED
+
+
+async def test_opens_on_failure_rate():
+    breaker = make_breaker(
+        failure_threshold=100, minimum_calls=4, failure_rate_threshold=0.5
+    )
+
+    await breaker.record_success()
+    await breaker.record_failure()
+    await breaker.record_success()
+    assert breaker.current_state() == CircuitState.CLOSED
+
+    await breaker.record_failure()
+    assert breaker.failure_rate() == 0.5
+    assert breaker.current_state() == CircuitState.OPEN
+
+
+async def test_half_open_after_recovery_timeout():
+    breaker = make_breaker()
+    for _ in range(3):
+        await breaker.record_failure()
+
+    expire_recovery(breaker)
+
+    assert breaker.current_state() == CircuitState.HALF_OPEN
+
+
+async def test_half_open_limits_trial_calls():
+    breaker = make_breaker()
+    breaker._transition(CircuitState.OPEN)
+    expire_recovery(breaker)
+
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.release()
+    assert breaker._half_open_inflight == 1
+    assert breaker.allow_request()
+
+
+async def test_half_open_closes_after_successes():
+    breaker = make_breaker()
+    breaker._transition(CircuitState.OPEN)
+    expire_recovery(breaker)
+
+    for _ in range(2):
+        assert breaker.allow_request()
+        await breaker.record_success()
+
+    assert breaker.current_state() == CircuitState.CLOSED
+    assert breaker.failure_rate() == 0.0
+
+
+async def test_half_open_failure_reopens():
+    breaker = make_breaker()
+    breaker._transition(CircuitState.OPEN)
+    expire_recovery(breaker)
+
+    assert breaker.allow_request()
+    await breaker.record_failure()
+
+    assert breaker.current_state() == CircuitState.OPEN
+    assert breaker._half_open_inflight == 0
+
+
+def remote_event(state: str, origin: str = "other-worker", service: str = "test_api"):
+    return json.dumps(
+        {"service": service, "state": state, "opened_at": 123.0, "origin": origin}
+    )
+
+
+async def test_remote_events_follow_other_workers():
+    breaker = make_breaker()
+
+    breaker.apply_remote_event(remote_event("open"))
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.opened_at == 123.0
+
+    breaker.apply_remote_event(remote_event("closed"))
+    assert breaker.state == CircuitState.CLOSED
+
+
+async def test_remote_events_ignore_own_and_other_services():
+    breaker = make_breaker()
+
+    breaker.apply_remote_event(remote_event("open", origin=WORKER_ID))
+    breaker.apply_remote_event(remote_event("open", service="other_api"))
+
+    assert breaker.state == CircuitState.CLOSED
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from app.services import llm_dispatcher
+from app.services.llm_dispatcher import (
+    AIMDLimiter,
+    DispatchRejected,
+    LLMDispatcher,
+    Priority,
+    set_deadline,
+)
+from app.services.llm_providers import ProviderError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_dispatcher.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_aimd_additive_increase():
+    limiter = AIMDLimiter(initial=4, max_limit=5)
+
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert limiter.limit == pytest.approx(5.0, abs=0.1)
+
+    for _ in range(10):
+        limiter.on_success(0.1)
+    assert limiter.limit == 5
+
+
+def test_aimd_multiplicative_decrease_once_per_cooldown(clock):
+    limiter = AIMDLimiter(initial=16, min_limit=2)
+
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.limit == 8
+
+    clock[0] += llm_dispatcher.DECREASE_COOLDOWN
+    limiter.on_overload()
+    limiter.on_success(limiter.latency_target + 1)
+    assert limiter.limit == 4
+
+    for _ in range(3):
+        clock[0] += llm_dispatcher.DECREASE_COOLDOWN
+        limiter.on_overload()
+    assert limiter.capacity == 2
+
+
+async def test_slot_429_reduces_limit():
+    dispatcher = LLMDispatcher(initial_limit=8)
+
+    with pytest.raises(ProviderError):
+        async with dispatcher.slot("model"):
+            raise ProviderError("mock", "rate limited", 429)
+
+    lane = dispatcher.lane("model")
+    assert lane.limiter.capacity == 4
+    assert lane.inflight == 0
+
+
+async def test_queue_serves_higher_priority_first():
+    dispatcher = LLMDispatcher(initial_limit=1)
+    order = []
+
+    async def call(name, priority):
+        async with dispatcher.slot("model", priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async with dispatcher.slot("model"):
+        tasks = [
+            asyncio.create_task(call("low", Priority.LOW)),
+            asyncio.create_task(call("normal", Priority.NORMAL)),
+            asyncio.create_task(call("high", Priority.HIGH)),
+        ]
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    assert order == ["high", "normal", "low"]
+
+
+async def test_full_queue_rejects():
+    dispatcher = LLMDispatcher(initial_limit=1, max_queue=1)
+
+    async def call():
+        async with dispatcher.slot("model"):
+            pass
+
+    async with dispatcher.slot("model"):
+        waiting = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        with pytest.raises(DispatchRejected) as error:
+            await call()
+    await waiting
+
+    assert error.value.reason == "queue_full"
+
+
+async def test_expired_deadline_rejects_while_queued():
+    dispatcher = LLMDispatcher(initial_limit=1)
+
+    async def call():
+        set_deadline(0.01)
+        async with dispatcher.slot("model"):
+            pass
+
+    async with dispatcher.slot("model"):
+        with pytest.raises(DispatchRejected) as error:
+            await call()
+
+    assert error.value.reason == "deadline"
+    assert dispatcher.lane("model").inflight == 0
@@ -0,0 +1,123 @@
+import pytest
+
+from app.services.circuit_breaker import CircuitBreaker, CircuitState
+from app.services.llm_dispatcher import LLMDispatcher
+from app.services.llm_providers import MockProvider, ProviderError
+from app.services.llm_router import LLMRouter, ProviderUnavailable
+
+MESSAGES = [{"role": "user", "content": "olá"}]
+
+
+def make_router(*providers, **kwargs):
+    breakers = {
+        provider.name: CircuitBreaker(f"{provider.name}_api", failure_threshold=3)
+        for provider in providers
+    }
+    return LLMRouter(list(providers), breakers, LLMDispatcher(), **kwargs)
+
+
+def half_open(breaker: CircuitBreaker) -> None:
+    breaker._transition(CircuitState.OPEN)
+    breaker.opened_at -= breaker.recovery_timeout
+    assert breaker.current_state() == CircuitState.HALF_OPEN
+
+
+async def test_complete_uses_first_provider():
+    primary = MockProvider(name="primary", latency=0)
+    secondary = MockProvider(name="secondary", latency=0)
+    router = make_router(primary, secondary)
+
+    result = await router.complete(MESSAGES)
+
+    assert result["provider"] == "primary"
+    assert result["content"] == "[primary] olá"
+    assert (primary.calls, secondary.calls) == (1, 0)
+
+
+async def test_failover_to_next_provider_on_error():
+    primary = MockProvider(name="primary", latency=0, error_rate=1.0)
+    secondary = MockProvider(name="secondary", latency=0)
+    router = make_router(primary, secondary)
+
+    result = await router.complete(MESSAGES)
+
+    assert result["provider"] == "secondary"
+    assert router.breakers["primary"].consecutive_failures == 1
+    assert router.stats["primary"].error_rate > 0
+    assert router.stats["secondary"].latency is not None
+
+
+async def test_all_providers_failing_raises_provider_error():
+    router = make_router(
+        MockProvider(name="primary", latency=0, error_rate=1.0),
+        MockProvider(name="secondary", latency=0, error_rate=1.0),
+    )
+
+    with pytest.raises(ProviderError):
+        await router.complete(MESSAGES)
+
+
+async def test_open_breakers_are_skipped():
+    primary = MockProvider(name="primary", latency=0)
+    secondary = MockProvider(name="secondary", latency=0)
+    router = make_router(primary, secondary)
+    router.breakers["primary"]._transition(CircuitState.OPEN)
+
+    assert router.ranked() == [secondary]
+    assert (await router.complete(MESSAGES))["provider"] == "secondary"
+    assert primary.calls == 0
+
+    router.breakers["secondary"]._transition(CircuitState.OPEN)
+    with pytest.raises(ProviderUnavailable):
+        await router.complete(MESSAGES)
+
+
+async def test_ranked_prefers_lower_score():
+    primary = MockProvider(name="primary")
+    secondary = MockProvider(name="secondary")
+    router = make_router(primary, secondary)
+    router.stats["primary"].record_success(2.0)
+    router.stats["secondary"].record_success(0.5)
+
+    assert router.ranked() == [secondary, primary]
+
+
+async def test_hedge_fires_backup_and_cancels_slow_primary():
+    primary = MockProvider(name="primary", latency=5.0)
+    secondary = MockProvider(name="secondary", latency=0)
+    router = make_router(primary, secondary, hedge=True, hedge_min_delay=0.05)
+    breaker = router.breakers["primary"]
+    half_open(breaker)
+
+    result = await router.complete(MESSAGES)
+
+    assert result["provider"] == "secondary"
+    assert (primary.calls, secondary.calls) == (1, 1)
+    # A chamada cancelada devolve a vaga de teste e conta como lenta, sem falha
+    assert breaker._half_open_inflight == 0
+    assert breaker.current_state() == CircuitState.HALF_OPEN
+    assert router.stats["primary"].latency >= 0.05
+    assert router.stats["primary"].error_rate == 0
+
+
+async def test_hedge_not_fired_when_primary_is_fast():
+    primary = MockProvider(name="primary", latency=0)
+    secondary = MockProvider(name="secondary", latency=0)
+    router = make_router(primary, secondary, hedge=True, hedge_min_delay=0.5)
+
+    result = await router.complete(MESSAGES)
+
+    assert result["provider"] == "primary"
+    assert secondary.calls == 0
+
+
+async def test_stream_fails_over_before_first_token():
+    router = make_router(
+        MockProvider(name="primary", latency=0, error_rate=1.0),
+        MockProvider(name="secondary", latency=0),
+    )
+
+    events = [event async for event in router.stream(MESSAGES)]
+
+    assert {event["provider"] for event in events} == {"secondary"}
+    assert "".join(event["content"] for event in events).strip() == "[secondary] olá"
@@ -0,0 +1,174 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.quota_service import (
+    QuotaExceeded,
+    QuotaService,
+    Usage,
+    period_keys,
+    seconds_until_reset,
+)
+
+MESSAGES = [{"role": "user", "content": "quanto custa?"}]
+PRICING = {"gpt-4o": [2.5, 10.0], "gpt-4o-mini": [0.15, 0.6]}
+
+
+def make_quota(redis_client=None, **kwargs):
+    options = {"pricing": PRICING, "completion_estimate": 100}
+    options.update(kwargs)
+    return QuotaService(redis_client, **options)
+
+
+def today_keys():
+    return period_keys(datetime.now(timezone.utc))
+
+
+def test_cost_uses_longest_prefix():
+    quota = make_quota()
+    usage = Usage(1000, 100)
+
+    assert quota.cost_micros("gpt-4o-mini-2024-07-18", usage) == 1000 * 0.15 + 100 * 0.6
+    assert quota.cost_micros("gpt-4o-2024-08-06", usage) == 1000 * 2.5 + 100 * 10.0
+    assert quota.cost_micros("claude-3-5-haiku", usage) == 0
+
+
+def test_period_keys_and_reset():
+    now = datetime(2026, 1, 31, 23, 59, tzinfo=timezone.utc)
+
+    assert period_keys(now) == {"daily": "20260131", "monthly": "202601"}
+    assert seconds_until_reset("daily", now) == 60
+    assert seconds_until_reset("monthly", now) == 60
+
+
+def test_check_rejects_estimate_over_token_limit():
+    quota = make_quota()
+    estimate = quota.estimate("gpt-4o-mini", MESSAGES).total
+    quota.limits = {"daily": {"tokens": estimate}}
+
+    quota.check("alice", "gpt-4o-mini", MESSAGES)
+
+    quota.record("alice", "gpt-4o-mini", Usage(1, 0))
+    with pytest.raises(QuotaExceeded) as error:
+        quota.check("alice", "gpt-4o-mini", MESSAGES)
+    assert error.value.period == "daily"
+    assert error.value.retry_after >= 1
+
+
+def test_check_rejects_over_cost_limit():
+    quota = make_quota(limits={"monthly": {"cost_usd": 0.01}})
+    quota.record("alice", "gpt-4o", Usage(4000, 0))
+
+    with pytest.raises(QuotaExceeded) as error:
+        quota.check("alice", "gpt-4o", MESSAGES)
+    assert error.value.period == "monthly"
+
+
+def test_override_replaces_default_limit():
+    quota = make_quota(
+        limits={"daily": {"tokens": 10}},
+        overrides={"vip": {"daily": {"tokens": 1_000_000}}},
+    )
+
+    quota.check("vip", "gpt-4o-mini", MESSAGES)
+    with pytest.raises(QuotaExceeded):
+        quota.check("alice", "gpt-4o-mini", MESSAGES)
+
+
+def test_check_is_noop_without_limits_or_account():
+    quota = make_quota()
+    quota.record("alice", "gpt-4o", Usage(10**9, 10**9))
+
+    quota.check("alice", "gpt-4o", MESSAGES)
+    make_quota(limits={"daily": {"tokens": 1}}).check("", "gpt-4o", MESSAGES)
+
+
+async def test_flush_writes_deltas_and_known_totals(fake_redis):
+    quota = make_quota(fake_redis)
+    quota.record("alice", "gpt-4o", Usage(1000, 100))
+    quota.record("alice", "gpt-4o-mini", Usage(2000, 200))
+    quota.record("alice", "gpt-4o-mini", Usage(10, 5))
+    quota.record("bob", "gpt-4o-mini", Usage(300, 30))
+
+    await quota.flush()
+
+    keys = today_keys()
+    for key in keys.values():
+        alice = fake_redis.hashes[f"usage:alice:{key}"]
+        assert alice["gpt-4o-mini:prompt_tokens"] == 2010
+        assert alice["gpt-4o-mini:completion_tokens"] == 205
+        assert alice["gpt-4o-mini:requests"] == 2
+        assert alice["gpt-4o:requests"] == 1
+        assert alice["tokens"] == 3315
+        # O custo é arredondado por chamada, antes da soma
+        assert alice["cost_micros"] == 3500 + 420 + 4
+        assert quota._known[("alice", key)] == {
+            "tokens": 3315,
+            "cost": alice["cost_micros"],
+        }
+        assert quota._known[("bob", key)]["tokens"] == 330
+    assert not quota._unflushed
+    assert not quota._pending
+
+
+async def test_flush_accumulates_known_totals(fake_redis):
+    quota = make_quota(fake_redis)
+    quota.record("alice", "gpt-4o-mini", Usage(100, 10))
+    await quota.flush()
+    quota.record("alice", "gpt-4o-mini", Usage(50, 5))
+
+    await quota.flush()
+
+    daily = today_keys()["daily"]
+    assert quota._known[("alice", daily)]["tokens"] == 165
+    assert fake_redis.hashes[f"usage:alice:{daily}"]["gpt-4o-mini:requests"] == 2
+
+
+async def test_flush_failure_requeues_deltas(fake_redis):
+    quota = make_quota(fake_redis)
+    quota.record("alice", "gpt-4o-mini", Usage(100, 10))
+    fake_redis.fail = True
+
+    await quota.flush()
+
+    assert quota._pending[("alice", "gpt-4o-mini")]["prompt_tokens"] == 100
+    assert quota._unflushed["alice"][0] == 110
+
+    fake_redis.fail = False
+    await quota.flush()
+
+    daily = today_keys()["daily"]
+    assert fake_redis.hashes[f"usage:alice:{daily}"]["tokens"] == 110
+    assert not quota._unflushed
+
+
+async def test_check_counts_known_and_unflushed_usage(fake_redis):
+    quota = make_quota(fake_redis)
+    estimate = quota.estimate("gpt-4o-mini", MESSAGES).total
+    quota.limits = {"daily": {"tokens": estimate + 150}}
+    quota.record("alice", "gpt-4o-mini", Usage(100, 0))
+    await quota.flush()
+    quota.record("alice", "gpt-4o-mini", Usage(50, 0))
+
+    quota.check("alice", "gpt-4o-mini", MESSAGES)
+
+    quota.record("alice", "gpt-4o-mini", Usage(1, 0))
+    with pytest.raises(QuotaExceeded):
+        quota.check("alice", "gpt-4o-mini", MESSAGES)
+
+
+async def test_flush_prunes_expired_syncs(fake_redis, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.quota_service.time.monotonic", lambda: now[0])
+    quota = make_quota(fake_redis, limits={"daily": {"tokens": 10**6}})
+    quota.check("alice", "gpt-4o-mini", MESSAGES)
+    await quota._syncing["alice"]
+    now[0] += 20
+    quota.check("bob", "gpt-4o-mini", MESSAGES)
+    await quota._syncing["bob"]
+
+    now[0] += 15
+    await quota.flush()
+
+    assert list(quota._synced_at) == ["bob"]
+    assert ("alice", today_keys()["daily"]) in quota._known
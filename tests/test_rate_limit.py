@@ -0,0 +1,165 @@
+import json
+
+import pytest
+
+from app.core.config import RateLimitBackend, settings
+from app.middleware.rate_limit import LocalTokenBucket, RateLimitMiddleware, parse_limit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio monotônico controlado pelo teste."""
+    now = [1000.0]
+    monkeypatch.setattr("app.middleware.rate_limit.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_burst_then_rejects(clock):
+    bucket = LocalTokenBucket()
+
+    decisions = [bucket.hit_sync("alice", 3, 60) for _ in range(4)]
+
+    assert [decision.allowed for decision in decisions] == [True, True, True, False]
+    assert decisions[2].remaining == 0
+    assert decisions[3].retry_after == pytest.approx(20.0)
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = LocalTokenBucket()
+    for _ in range(3):
+        bucket.hit_sync("alice", 3, 60)
+
+    clock[0] += 20
+    assert bucket.hit_sync("alice", 3, 60).allowed
+    assert not bucket.hit_sync("alice", 3, 60).allowed
+
+
+def test_bucket_charges_cost(clock):
+    bucket = LocalTokenBucket()
+
+    assert bucket.hit_sync("alice", 10, 60, cost=8).remaining == 2
+    decision = bucket.hit_sync("alice", 10, 60, cost=3)
+    assert not decision.allowed
+    assert decision.retry_after == pytest.approx(6.0)
+
+
+def test_bucket_keeps_at_most_max_keys(clock):
+    bucket = LocalTokenBucket(max_keys=2)
+    for key in ("a", "b", "c"):
+        bucket.hit_sync(key, 1, 60)
+
+    assert list(bucket._buckets) == ["b", "c"]
+    assert bucket.hit_sync("a", 1, 60).allowed
+
+
+def test_parse_limit():
+    assert parse_limit("100/3600") == (100, 3600)
+    assert parse_limit("5") == (5, 60)
+
+
+def make_middleware(**overrides):
+    config = settings.model_copy(
+        update={
+            "RATE_LIMIT_BACKEND": RateLimitBackend.LOCAL,
+            "RATE_LIMIT_REQUESTS": 2,
+            "RATE_LIMIT_WINDOW": 60,
+            "RATE_LIMIT_RULES": {},
+            "RATE_LIMIT_USER_OVERRIDES": {},
+            **overrides,
+        }
+    )
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return RateLimitMiddleware(app, config=config)
+
+
+async def call(middleware, method, path, headers=(), client="10.0.0.1", body=b""):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": list(headers),
+        "client": (client, 1234),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    return messages[0]["status"]
+
+
+async def test_default_limit_only_on_default_paths():
+    middleware = make_middleware()
+
+    statuses = [await call(middleware, "POST", "/api/v1/chat") for _ in range(3)]
+
+    assert statuses == [200, 200, 429]
+    assert await call(middleware, "GET", "/api/v1/chat/history") == 200
+    assert await call(middleware, "POST", "/api/v1/chat", client="10.0.0.2") == 200
+
+
+async def test_rule_takes_precedence_over_default():
+    middleware = make_middleware(RATE_LIMIT_RULES={"GET /api/v1/chat": "1/60"})
+
+    assert await call(middleware, "GET", "/api/v1/chat/history") == 200
+    assert await call(middleware, "GET", "/api/v1/chat/history") == 429
+
+
+async def test_user_header_ignored_unless_trusted():
+    headers = [(b"x-user-id", b"vip")]
+    overrides = {"RATE_LIMIT_USER_OVERRIDES": {"vip": "100/60"}}
+
+    untrusted = make_middleware(**overrides)
+    statuses = [
+        await call(untrusted, "POST", "/api/v1/chat", headers) for _ in range(3)
+    ]
+    assert statuses[-1] == 429
+
+    trusted = make_middleware(RATE_LIMIT_TRUST_USER_HEADER=True, **overrides)
+    statuses = [await call(trusted, "POST", "/api/v1/chat", headers) for _ in range(3)]
+    assert statuses == [200, 200, 200]
+
+
+def batch_body(size):
+    return json.dumps({"userId": "alice", "prompts": ["oi"] * size}).encode()
+
+
+async def test_batch_is_charged_per_prompt():
+    middleware = make_middleware(RATE_LIMIT_REQUESTS=5)
+
+    assert await call(middleware, "POST", "/api/v1/chat/batch", body=batch_body(3)) == 200
+    assert await call(middleware, "POST", "/api/v1/chat/batch", body=batch_body(3)) == 429
+    assert await call(middleware, "POST", "/api/v1/chat") == 200
+    assert await call(middleware, "POST", "/api/v1/chat") == 200
+    assert await call(middleware, "POST", "/api/v1/chat") == 429
+
+
+async def test_batch_larger_than_limit_takes_whole_budget():
+    middleware = make_middleware(RATE_LIMIT_REQUESTS=5)
+
+    assert await call(middleware, "POST", "/api/v1/chat/batch", body=batch_body(50)) == 200
+    assert await call(middleware, "POST", "/api/v1/chat") == 429
+
+
+async def test_batch_body_is_replayed_to_the_route():
+    received = []
+
+    async def app(scope, receive, send):
+        received.append(await receive())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = make_middleware()
+    middleware.app = app
+    body = batch_body(1)
+
+    assert await call(middleware, "POST", "/api/v1/chat/batch", body=body) == 200
+    assert received[0]["body"] == body
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from app.services import local_cache
+from app.services.local_cache import LocalCache
+from app.services.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "resposta"
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    assert results == ["resposta"] * 5
+    assert calls == 1
+    assert len(flight) == 0
+
+
+async def test_exception_reaches_every_caller():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("falhou")
+
+    results = await asyncio.gather(
+        flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
+
+
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "resposta"
+
+    leader = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "resposta"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(local_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = LocalCache(max_items=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, ttl=60)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_lru_respects_byte_limit(clock):
+    cache = LocalCache(max_bytes=20)
+    cache.set("a", "x" * 10, ttl=60)
+    cache.set("b", "y" * 10, ttl=60)
+
+    assert len(cache) == 1
+    assert cache.get("b") == "y" * 10
+    assert cache.size_bytes <= 20
+
+
+def test_lru_expires_entries(clock):
+    cache = LocalCache()
+    cache.set("a", 1, ttl=10)
+
+    clock[0] += 10
+
+    assert not cache.contains("a")
+    assert cache.get("a") is None
+    assert len(cache) == 0
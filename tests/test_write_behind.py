@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+from pymongo.errors import AutoReconnect
+
+from app.services.write_behind import WriteBehindQueue
+
+
+class FakeCollection:
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.documents = []
+        self.batches = 0
+
+    async def insert_many(self, documents, ordered=True):
+        self.batches += 1
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("mongo fora do ar")
+        self.documents.extend(documents)
+
+
+def make_queue(collection, tmp_path, **kwargs):
+    options = {"batch_size": 3, "flush_interval": 0.01, "max_retries": 1}
+    options.update(kwargs)
+    return WriteBehindQueue(
+        collection, dead_letter_path=str(tmp_path / "dead.jsonl"), **options
+    )
+
+
+def read_dead_letters(tmp_path):
+    path = tmp_path / "dead.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line)["id"] for line in path.read_text().splitlines()]
+
+
+async def test_batches_and_drains_on_stop(tmp_path):
+    collection = FakeCollection()
+    queue = make_queue(collection, tmp_path)
+    queue.start()
+
+    for index in range(7):
+        assert await queue.enqueue({"id": index})
+    await queue.stop()
+
+    assert [document["id"] for document in collection.documents] == list(range(7))
+    assert collection.batches >= 3
+    assert read_dead_letters(tmp_path) == []
+
+
+async def test_retries_then_succeeds(tmp_path):
+    collection = FakeCollection(failures=1)
+    queue = make_queue(collection, tmp_path)
+    queue.start()
+
+    await queue.enqueue({"id": 1})
+    await queue.stop()
+
+    assert [document["id"] for document in collection.documents] == [1]
+    assert read_dead_letters(tmp_path) == []
+
+
+async def test_exhausted_retries_go_to_dead_letter(tmp_path):
+    collection = FakeCollection(failures=10)
+    queue = make_queue(collection, tmp_path, max_retries=0)
+    queue.start()
+
+    await queue.enqueue({"id": 1})
+    await queue.stop()
+
+    assert collection.documents == []
+    assert read_dead_letters(tmp_path) == [1]
+
+
+async def test_stop_timeout_dead_letters_in_flight_batch(tmp_path):
+    collection = FakeCollection(delay=10)
+    queue = make_queue(collection, tmp_path, batch_size=2)
+    queue.start()
+
+    for index in range(3):
+        await queue.enqueue({"id": index})
+    await asyncio.sleep(0.05)
+    await queue.stop(timeout=0.05)
+
+    assert sorted(read_dead_letters(tmp_path)) == [0, 1, 2]
+    assert queue._in_flight == []
+